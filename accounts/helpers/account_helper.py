@@ -1,40 +1,642 @@
-from ..models import Account
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db.models import Count, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from utils.caching import Caching
+from ..models import Account, DeletedAccount
+from ..serializers import AccountSerializer, FlatAccountSerializer
+from .count_helper import CountHelper
+from .type_helper import TypeHelper
+import base64
+import datetime
+import hashlib
 
 
 class AccountHelper:
 
     # Database methods
 
-    @staticmethod
-    def select_related_fields(queryset):
-        return queryset.select_related('type')
-
     @staticmethod
     def get_all_accounts():
         return Account.objects.all()
 
+    @staticmethod
+    def get_owner_accounts(owner_id):
+        '''
+        Accounts of one user, read through the (owner_id, id) index.
+        '''
+
+        return Account.objects.filter(owner_id=owner_id)
+
+    @staticmethod
+    def get_owner_ids(type_id=None):
+        '''
+        Ids of the users owning accounts, of one type if type_id is given.
+        '''
+
+        accounts = Account.objects.exclude(owner_id=None)
+        if type_id is not None:
+            accounts = accounts.filter(type_id=type_id)
+
+        return list(
+            accounts.order_by(
+                'owner_id'
+            ).values_list('owner_id', flat=True).distinct()
+        )
+
+    @staticmethod
+    def get_largest_owner_id():
+        '''
+        Id of the user owning the most accounts, None if no account has
+        an owner.
+        '''
+
+        return Account.objects.exclude(owner_id=None).values(
+            'owner_id'
+        ).annotate(count=Count('id')).order_by(
+            '-count',
+            'owner_id'
+        ).values_list('owner_id', flat=True).first()
+
+    @staticmethod
+    def get_user_id(username):
+        try:
+            return User.objects.get(username=username).id
+        except User.DoesNotExist:
+            raise ValueError("unknown user: " + username)
+
+    @staticmethod
+    def assign_owner(owner_id):
+        '''
+        Gives accounts and tombstones without an owner to owner_id.
+        Returns the number of accounts claimed. date_updated is left
+        alone, clients synced before ownership already hold these rows.
+        '''
+
+        claimed = Account.objects.filter(owner_id=None).update(
+            owner_id=owner_id
+        )
+        DeletedAccount.objects.filter(owner_id=None).update(owner_id=owner_id)
+
+        if claimed:
+            CountHelper.reconcile(owner_id)
+            AccountHelper.invalidate_caches(owner_id)
+        return claimed
+
     @staticmethod
     def get_account_instance_by_id(account_id):
         return Account.objects.get(id=account_id)
 
     @staticmethod
-    def get_account_qs_by_id(account_id):
-        return Account.objects.filter(id=account_id)
+    def get_account_qs_by_id(owner_id, account_id):
+        return AccountHelper.get_owner_accounts(owner_id).filter(id=account_id)
+
+    @staticmethod
+    def get_accounts_after_id(owner_id, after_id, limit, filters=()):
+        '''
+        Indexed range scan on (owner_id, id), one page at a time.
+        '''
+
+        return AccountHelper.apply_filters(
+            AccountHelper.get_owner_accounts(owner_id).filter(id__gt=after_id),
+            filters
+        ).order_by('id')[:limit]
+
+    @staticmethod
+    def get_account_password(owner_id, account_id):
+        '''
+        Loads and decrypts the password of a single account.
+        '''
+
+        return AccountHelper.get_owner_accounts(owner_id).only(
+            'password'
+        ).get(id=account_id).password
 
     @staticmethod
     def get_account_instance_by_email(email):
         return Account.objects.get(email=email)
 
     @staticmethod
-    def get_account_qs_by_email(email):
-        return Account.objects.filter(email=email)
+    def get_account_qs_by_email(owner_id, email):
+        return AccountHelper.get_owner_accounts(owner_id).filter(email=email)
+
+    # Cache build methods
+
+    @staticmethod
+    def build_cached_accounts(owner_id):
+        serializer = AccountHelper.get_flat_serializer(None)
+        rows = AccountHelper.get_owner_accounts(owner_id).order_by(
+            'id'
+        ).values_list(*serializer.columns)
+        return AccountHelper.build_account_index(
+            serializer.to_representation_many(rows)
+        )
+
+    @staticmethod
+    def build_projected_accounts(owner_id, fields):
+        serializer = AccountHelper.get_flat_serializer(fields)
+        rows = AccountHelper.get_owner_accounts(owner_id).order_by(
+            'id'
+        ).values_list(*serializer.columns)
+        return serializer.to_representation_many(rows)
+
+    @staticmethod
+    def iterate_accounts(
+        owner_id,
+        chunk_size,
+        fields=None,
+        filters=(),
+        ordering=None
+    ):
+        '''
+        Yields serialized accounts one at a time, read in keyset batches
+        of chunk_size rows, on (field, id) when ordered by a field. One
+        query per batch rather than one open cursor, MySQL clients
+        buffer a whole result set even under .iterator().
+        '''
+
+        serializer = AccountHelper.get_flat_serializer(fields)
+        ordering = ordering or ('id',)
+        field_name = ordering[0].lstrip('-')
+        descending = ordering[0].startswith('-')
+
+        # The ordering field is read for the keyset even when not output
+        columns = list(serializer.columns)
+        if field_name not in columns:
+            columns.append(field_name)
+        field_index = columns.index(field_name)
+
+        rows = AccountHelper.apply_filters(
+            AccountHelper.get_owner_accounts(owner_id),
+            filters
+        ).order_by(*ordering).values_list(*columns)
+
+        after = None
+        while True:
+            batch_rows = rows
+            if after is not None:
+                batch_rows = rows.filter(AccountHelper.get_keyset_filter(
+                    field_name,
+                    descending,
+                    *after
+                ))
+            batch = list(batch_rows[:chunk_size])
+
+            for values in batch:
+                yield serializer.to_representation(values)
+
+            if len(batch) < chunk_size:
+                return
+            # Flat serializer columns always start with id
+            after = (batch[-1][field_index], batch[-1][0])
+
+    @staticmethod
+    def get_keyset_filter(field_name, descending, value, id):
+        '''
+        Rows after (value, id) in order of field_name, ties by id.
+        '''
+
+        lookup = "__lt" if descending else "__gt"
+        if field_name == "id":
+            return Q(**{"id" + lookup: id})
+        return Q(**{field_name + lookup: value}) | Q(
+            **{field_name: value, "id__gt": id}
+        )
+
+    @staticmethod
+    def build_accounts_page(
+        owner_id,
+        after_id,
+        limit,
+        fields=None,
+        filters=()
+    ):
+        serializer = AccountHelper.get_flat_serializer(fields)
+        # Fetch one extra row to know whether there is a next page
+        rows = list(AccountHelper.get_accounts_after_id(
+            owner_id,
+            after_id,
+            limit + 1,
+            filters
+        ).values_list(*serializer.columns))
+
+        next_cursor = None
+        if len(rows) > limit:
+            # Flat serializer columns always start with id
+            next_cursor = AccountHelper.encode_cursor(rows[limit - 1][0])
+
+        return {
+            "results": serializer.to_representation_many(rows[:limit]),
+            "next_cursor": next_cursor,
+        }
+
+    @staticmethod
+    def build_accounts_by_ids(owner_id, ids):
+        '''
+        Serialized accounts in the order of ids.
+        '''
+
+        serializer = AccountHelper.get_flat_serializer(None)
+        rows = AccountHelper.get_owner_accounts(owner_id).filter(
+            id__in=ids
+        ).values_list(*serializer.columns)
+
+        # Flat serializer columns always start with id
+        by_id = {values[0]: values for values in rows}
+        return [
+            serializer.to_representation(by_id[id])
+            for id in ids if id in by_id
+        ]
+
+    @staticmethod
+    def get_flat_serializer(fields):
+        '''
+        FlatAccountSerializer for a projection, loading the type names
+        only when they are part of it.
+        '''
+
+        fields = fields or AccountHelper.get_field_names()
+        type_names = None
+        if "type_name" in fields:
+            type_names = TypeHelper.get_type_names()
+
+        return FlatAccountSerializer(fields, type_names)
+
+    # Projection methods
+    #
+    # A projection is a tuple of AccountSerializer field names in
+    # serializer order, or None for all fields. Keeping the order fixed
+    # gives every projection a single cache key.
+
+    @staticmethod
+    def get_field_names():
+        return tuple(AccountSerializer().fields)
+
+    @staticmethod
+    def parse_projection(fields, exclude):
+        '''
+        Builds a projection from the comma separated fields= and
+        exclude= query parameters.
+        '''
+
+        if fields is None and exclude is None:
+            return None
+
+        field_names = AccountHelper.get_field_names()
+        selected = set(field_names)
+        if fields is not None:
+            selected = AccountHelper._split_field_names(fields, field_names)
+        if exclude is not None:
+            selected -= AccountHelper._split_field_names(exclude, field_names)
+
+        if not selected:
+            raise ValueError("no fields selected")
+
+        return tuple(name for name in field_names if name in selected)
+
+    @staticmethod
+    def _split_field_names(value, field_names):
+        names = {name.strip() for name in value.split(",") if name.strip()}
+        unknown = names - set(field_names)
+        if unknown:
+            raise ValueError("unknown fields: " + ", ".join(sorted(unknown)))
+
+        return names
+
+    @staticmethod
+    def apply_projection(queryset, fields):
+        '''
+        Loads only the columns the projection needs. Type names come
+        from TypeRegistry rather than a join, and the encrypted password
+        is never loaded since serializers output a mask.
+        '''
+
+        if fields is None:
+            return queryset.defer('password')
+
+        columns = {"id"}
+        for name in fields:
+            if name == "type_name":
+                columns.add("type")
+            elif name != "password":
+                columns.add(name)
+
+        return queryset.only(*sorted(columns))
+
+    @staticmethod
+    def project_rows(rows, fields):
+        if fields is None:
+            return list(rows)
+
+        return [{name: row[name] for name in fields} for row in rows]
+
+    # Filter methods
+    #
+    # Each ListAccounts filter parameter maps to one lookup backed by an
+    # index on Account. Date ranges include the "after" bound and exclude
+    # the "before" bound. Filters are kept as sorted (param, lookup,
+    # value) tuples so equal filter sets share a cache key.
+
+    FILTERS = {
+        "type": "type_id",
+        "company": "company",
+        "email_domain": "email_domain",
+        "created_after": "date_created__gte",
+        "created_before": "date_created__lt",
+        "updated_after": "date_updated__gte",
+        "updated_before": "date_updated__lt",
+    }
+
+    ORDERINGS = (
+        "id",
+        "company",
+        "email",
+        "date_created",
+        "date_updated",
+    )
+
+    @staticmethod
+    def parse_filters(query_params):
+        filters = []
+        for param, lookup in AccountHelper.FILTERS.items():
+            value = query_params.get(param)
+            if value is None:
+                continue
+
+            if param == "type":
+                try:
+                    value = int(value)
+                except ValueError:
+                    raise ValueError("type must be an integer")
+            elif param == "email_domain":
+                value = value.lower()
+            elif lookup.startswith("date_"):
+                value = AccountHelper.parse_filter_date(param, value)
+
+            filters.append((param, lookup, value))
+
+        return tuple(filters)
+
+    @staticmethod
+    def parse_filter_date(param, value):
+        '''
+        Accepts an ISO 8601 date or datetime, naive values are UTC.
+        '''
+
+        try:
+            parsed = parse_datetime(value)
+            if parsed is None:
+                date = parse_date(value)
+                if date is not None:
+                    parsed = datetime.datetime.combine(date, datetime.time())
+        except ValueError:
+            parsed = None
+
+        if parsed is None:
+            raise ValueError(param + " must be an ISO 8601 date or datetime")
+
+        if timezone.is_naive(parsed):
+            parsed = timezone.make_aware(parsed, datetime.timezone.utc)
+        return parsed
+
+    @staticmethod
+    def parse_ordering(ordering):
+        '''
+        Returns order_by arguments for ordering=[-]<field>, ties broken
+        by id. None when no ordering is given.
+        '''
+
+        if ordering is None:
+            return None
+
+        field_name = ordering[1:] if ordering.startswith("-") else ordering
+        if field_name not in AccountHelper.ORDERINGS:
+            raise ValueError(
+                "ordering must be one of: " + ", ".join(AccountHelper.ORDERINGS)
+            )
+
+        if field_name == "id":
+            return (ordering,)
+        return (ordering, "id")
+
+    @staticmethod
+    def apply_filters(queryset, filters):
+        return queryset.filter(
+            **{lookup: value for param, lookup, value in filters}
+        )
+
+    @staticmethod
+    def build_filtered_accounts(owner_id, filters, ordering, fields):
+        serializer = AccountHelper.get_flat_serializer(fields)
+        rows = AccountHelper.apply_filters(
+            AccountHelper.get_owner_accounts(owner_id),
+            filters
+        ).order_by(*(ordering or ("id",))).values_list(*serializer.columns)
+
+        return serializer.to_representation_many(rows)
+
+    @staticmethod
+    def get_email_domain(email):
+        if not email or "@" not in email:
+            return ""
+        return email.rpartition("@")[2].lower()
+
+    # Pagination methods
+
+    @staticmethod
+    def parse_page_limit(limit):
+        if limit is None:
+            return settings.ACCOUNTS_PAGE_DEFAULT_LIMIT
+
+        try:
+            limit = int(limit)
+        except ValueError:
+            raise ValueError("limit must be an integer")
+
+        if limit < 1 or limit > settings.ACCOUNTS_PAGE_MAX_LIMIT:
+            raise ValueError(
+                "limit must be between 1 and "
+                + str(settings.ACCOUNTS_PAGE_MAX_LIMIT)
+            )
+
+        return limit
+
+    @staticmethod
+    def encode_cursor(last_id):
+        return base64.urlsafe_b64encode(
+            ("id:" + str(last_id)).encode()
+        ).decode().rstrip("=")
+
+    @staticmethod
+    def decode_cursor(cursor):
+        '''
+        Returns the id to continue after, 0 for the first page.
+        '''
+
+        if not cursor:
+            return 0
+
+        try:
+            padded = cursor + "=" * (-len(cursor) % 4)
+            prefix, last_id = base64.urlsafe_b64decode(
+                padded.encode()
+            ).decode().split(":")
+            if prefix != "id":
+                raise ValueError()
+            return int(last_id)
+        except (ValueError, UnicodeDecodeError):
+            raise ValueError("invalid cursor")
+
+    # Cache key methods
+    #
+    # Account caches are partitioned per owner ("accounts@<owner_id>"),
+    # so a write only drops the caches of the user who made it.
+
+    @staticmethod
+    def get_cache_key(owner_id, key="accounts"):
+        return Caching.partition_key(key, owner_id)
+
+    @staticmethod
+    def invalidate_caches(owner_id):
+        Caching.delete_cache_value(AccountHelper.get_cache_key(owner_id))
+
+    @staticmethod
+    def invalidate_all_caches(owner_ids=None):
+        '''
+        Drops the account caches of owner_ids, every owner by default,
+        for changes shared by several of them such as a type rename.
+        '''
+
+        if owner_ids is None:
+            owner_ids = AccountHelper.get_owner_ids()
+        for owner_id in owner_ids:
+            AccountHelper.invalidate_caches(owner_id)
+
+    @staticmethod
+    def get_filter_cache_key(key, filters, ordering):
+        if not filters and ordering is None:
+            return key
+
+        source = repr((
+            [(param, str(value)) for param, lookup, value in filters],
+            ordering,
+        ))
+        return key + ":filter:" + hashlib.sha1(source.encode()).hexdigest()
+
+    @staticmethod
+    def get_projection_cache_key(key, fields):
+        if fields is None:
+            return key
+
+        return key + ":fields:" + ",".join(fields)
+
+    @staticmethod
+    def get_email_miss_cache_key(owner_id, email):
+        '''
+        Key of the negative entry recorded when no account has email.
+        Lives in the owner's accounts namespace so any of their account
+        writes drops it. Hashed since emails may contain characters
+        invalid in keys.
+        '''
+
+        return AccountHelper.get_cache_key(
+            owner_id,
+            "accounts:no-email:" + hashlib.sha1(email.encode()).hexdigest()
+        )
 
     # In memory data methods
+    #
+    # The cached "accounts" value is an index over the serialized rows:
+    #   rows:     serialized accounts in id order
+    #   by_id:    id -> row
+    #   by_email: email -> rows with that email, in id order
+    # by_email covers every row, so an email missing from it has no match.
+    # Patching returns a new index and never modifies the cached one.
 
     @staticmethod
-    def filter_accounts_by_email(data, email):
-        return [item for item in data if item.get("email") == email]
+    def build_account_index(data):
+        rows = list(data)
+        by_id = {}
+        by_email = {}
+        for row in rows:
+            by_id[row.get("id")] = row
+            by_email.setdefault(row.get("email"), []).append(row)
+
+        return {
+            "rows": rows,
+            "by_id": by_id,
+            "by_email": by_email,
+        }
+
+    @staticmethod
+    def filter_accounts_by_email(index, email):
+        return list(index["by_email"].get(email, []))
+
+    @staticmethod
+    def filter_accounts_by_id(index, id):
+        row = index["by_id"].get(id)
+        return [row] if row is not None else []
+
+    @staticmethod
+    def upsert_account_data(index, account):
+        '''
+        Returns a copy of index with the serialized account replacing
+        the row with the same id, or appended if it is new.
+        '''
+
+        account_id = account.get("id")
+        previous = index["by_id"].get(account_id)
+
+        rows = list(index["rows"])
+        if previous is None:
+            rows.append(account)
+        else:
+            rows[rows.index(previous)] = account
+
+        by_id = dict(index["by_id"])
+        by_id[account_id] = account
+
+        by_email = dict(index["by_email"])
+        if previous is not None:
+            AccountHelper._remove_email_row(by_email, previous)
+        by_email[account.get("email")] = sorted(
+            by_email.get(account.get("email"), []) + [account],
+            key=lambda row: row.get("id")
+        )
+
+        return {
+            "rows": rows,
+            "by_id": by_id,
+            "by_email": by_email,
+        }
+
+    @staticmethod
+    def remove_account_data(index, id):
+        previous = index["by_id"].get(id)
+        if previous is None:
+            return index
+
+        by_id = dict(index["by_id"])
+        del by_id[id]
+
+        by_email = dict(index["by_email"])
+        AccountHelper._remove_email_row(by_email, previous)
+
+        return {
+            "rows": [row for row in index["rows"] if row is not previous],
+            "by_id": by_id,
+            "by_email": by_email,
+        }
 
     @staticmethod
-    def filter_accounts_by_id(data, id):
-        return [item for item in data if item.get("id") == id]
+    def _remove_email_row(by_email, row):
+        email = row.get("email")
+        remaining = [
+            item for item in by_email.get(email, [])
+            if item.get("id") != row.get("id")
+        ]
+        if remaining:
+            by_email[email] = remaining
+        else:
+            by_email.pop(email, None)
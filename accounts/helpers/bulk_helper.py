@@ -0,0 +1,288 @@
+from django.conf import settings
+from django.db import DatabaseError, connections, router, transaction
+from django.utils import timezone
+from ..models import Account
+from ..serializers import AccountSerializer, AccountUpdateSerializer
+from .account_helper import AccountHelper
+from .count_helper import CountHelper
+from .search_helper import SearchHelper
+from .sync_helper import SyncHelper
+
+# Bulk writes
+#
+# Items are validated one by one and invalid items are reported by their
+# position in the request instead of failing the whole request. Valid
+# items are written ACCOUNTS_BULK_BATCH_SIZE at a time, each batch in
+# its own transaction. bulk_create and bulk_update skip model signals
+# and auto_now, so email domains, search tokens, date_updated, account
+# counts and deletion tombstones are written here directly. Every method acts on
+# the accounts of one owner, and invalidates the owner's account cache
+# once, after the last batch or after a failed batch if earlier ones
+# were written.
+
+
+class BulkHelper:
+
+    # Fields an inserted account is matched on when reading its id back
+    # (see set_inserted_ids)
+    INSERT_KEY_FIELDS = (
+        'owner_id',
+        'email',
+        'username',
+        'company',
+        'website',
+    )
+
+    @staticmethod
+    def get_db_alias():
+        return router.db_for_write(Account)
+
+    @staticmethod
+    def get_batches(items):
+        batch_size = settings.ACCOUNTS_BULK_BATCH_SIZE
+        for start in range(0, len(items), batch_size):
+            yield items[start:start + batch_size]
+
+    @staticmethod
+    def validate_items(items):
+        if not isinstance(items, list):
+            raise ValueError("expected a list")
+
+        if len(items) > settings.ACCOUNTS_BULK_MAX_ITEMS:
+            raise ValueError(
+                "at most " + str(settings.ACCOUNTS_BULK_MAX_ITEMS)
+                + " items per request"
+            )
+
+    # Write methods
+
+    @staticmethod
+    def create_accounts(owner_id, items, invalidate=True):
+        '''
+        invalidate: False when the caller invalidates once after several
+        calls (see ImportHelper)
+        '''
+
+        BulkHelper.validate_items(items)
+
+        valid = []
+        errors = []
+        for index, item in enumerate(items):
+            serializer = AccountSerializer(data=item)
+            if serializer.is_valid():
+                valid.append((index, Account(
+                    owner_id=owner_id,
+                    **serializer.validated_data
+                )))
+            else:
+                errors.append({"index": index, "errors": serializer.errors})
+
+        created = []
+        try:
+            for batch in BulkHelper.get_batches(valid):
+                accounts = [account for index, account in batch]
+                for account in accounts:
+                    account.email_domain = AccountHelper.get_email_domain(
+                        account.email
+                    )
+
+                with transaction.atomic(using=BulkHelper.get_db_alias()):
+                    BulkHelper.insert_accounts(accounts)
+
+                created += [
+                    {"index": index, "id": account.id}
+                    for index, account in batch
+                ]
+
+        finally:
+            if created and invalidate:
+                AccountHelper.invalidate_caches(owner_id)
+
+        return {"created": created, "errors": errors}
+
+    @staticmethod
+    def insert_accounts(accounts):
+        '''
+        Inserts and indexes accounts and sets their ids.
+        '''
+
+        connection = connections[BulkHelper.get_db_alias()]
+        Account.objects.bulk_create(accounts)
+        if not connection.features.can_return_rows_from_bulk_insert:
+            BulkHelper.set_inserted_ids(connection, accounts)
+
+        SearchHelper.index_accounts(accounts)
+        CountHelper.record_creations(accounts)
+
+    @staticmethod
+    def set_inserted_ids(connection, accounts):
+        '''
+        Sets the ids of a bulk insert on backends that return none
+        (MySQL). LAST_INSERT_ID() is the id of the first row and the
+        others are larger, but not necessarily consecutive: with
+        innodb_autoinc_lock_mode 2, the MySQL 8 default, concurrent
+        inserts interleave. The owner's rows from the first id on are
+        read back in one query and matched to the accounts in insert
+        order, skipping rows committed by other writers meanwhile.
+        '''
+
+        first_id = BulkHelper.get_first_inserted_id(connection)
+        rows = Account.objects.filter(
+            owner_id=accounts[0].owner_id,
+            id__gte=first_id
+        ).order_by('id').values_list('id', *BulkHelper.INSERT_KEY_FIELDS)
+
+        pending = iter(accounts)
+        account = next(pending)
+        for id, *key in rows:
+            if tuple(key) == BulkHelper.get_insert_key(account):
+                account.id = id
+                account = next(pending, None)
+                if account is None:
+                    return
+
+        raise DatabaseError("inserted accounts not found after insert")
+
+    @staticmethod
+    def get_first_inserted_id(connection):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT LAST_INSERT_ID()")
+            return cursor.fetchone()[0]
+
+    @staticmethod
+    def get_insert_key(account):
+        return tuple(
+            getattr(account, field_name)
+            for field_name in BulkHelper.INSERT_KEY_FIELDS
+        )
+
+    @staticmethod
+    def update_accounts(owner_id, items):
+        BulkHelper.validate_items(items)
+
+        errors = []
+        updates = []
+        for index, item in enumerate(items):
+            account_id = item.get("id") if isinstance(item, dict) else None
+            if not isinstance(account_id, int):
+                errors.append({"index": index, "errors": {"id": ["required"]}})
+            else:
+                updates.append((index, account_id, item))
+
+        updated = []
+        try:
+            for batch in BulkHelper.get_batches(updates):
+                batch_updated, batch_errors = BulkHelper.update_batch(
+                    owner_id,
+                    batch
+                )
+                updated += batch_updated
+                errors += batch_errors
+
+        finally:
+            if updated:
+                AccountHelper.invalidate_caches(owner_id)
+
+        return {
+            "updated": updated,
+            "errors": sorted(errors, key=lambda error: error["index"]),
+        }
+
+    @staticmethod
+    def update_batch(owner_id, batch):
+        updated = []
+        errors = []
+        field_names = {
+            field_name
+            for index, account_id, item in batch
+            for field_name in item
+        } & set(AccountUpdateSerializer.Meta.fields)
+
+        # Only load and decrypt passwords when some item changes one
+        accounts = AccountHelper.get_owner_accounts(owner_id).filter(
+            id__in=[account_id for index, account_id, item in batch]
+        )
+        if "password" not in field_names:
+            accounts = accounts.defer("password")
+
+        with transaction.atomic(using=BulkHelper.get_db_alias()):
+            accounts = accounts.select_for_update().in_bulk()
+            previous_types = {
+                account_id: account.type_id
+                for account_id, account in accounts.items()
+            }
+
+            changed = {}
+            for index, account_id, item in batch:
+                account = changed.get(account_id) or accounts.get(account_id)
+                if account is None:
+                    errors.append({
+                        "index": index,
+                        "errors": {"id": ["Account not found"]},
+                    })
+                    continue
+
+                serializer = AccountUpdateSerializer(
+                    account,
+                    data=item,
+                    partial=True
+                )
+                if not serializer.is_valid():
+                    errors.append({"index": index, "errors": serializer.errors})
+                    continue
+
+                for attr, value in serializer.validated_data.items():
+                    setattr(account, attr, value)
+                changed[account_id] = account
+                updated.append(account_id)
+
+            if changed:
+                now = timezone.now()
+                for account in changed.values():
+                    account.email_domain = AccountHelper.get_email_domain(
+                        account.email
+                    )
+                    account.date_updated = now
+
+                Account.objects.bulk_update(
+                    list(changed.values()),
+                    sorted(field_names | {"email_domain", "date_updated"})
+                )
+                SearchHelper.index_accounts(list(changed.values()))
+                CountHelper.record_type_changes(
+                    previous_types,
+                    changed.values()
+                )
+
+        return updated, errors
+
+    @staticmethod
+    def delete_accounts(owner_id, ids):
+        BulkHelper.validate_items(ids)
+        if not all(isinstance(account_id, int) for account_id in ids):
+            raise ValueError("ids must be integers")
+
+        deleted = []
+        try:
+            for batch in BulkHelper.get_batches(sorted(set(ids))):
+                with transaction.atomic(using=BulkHelper.get_db_alias()):
+                    accounts = AccountHelper.get_owner_accounts(
+                        owner_id
+                    ).filter(id__in=batch)
+                    batch_deleted = list(
+                        accounts.values_list('id', flat=True)
+                    )
+                    CountHelper.record_deletions(accounts)
+                    accounts.delete()
+                    SyncHelper.record_deletions(owner_id, batch_deleted)
+
+                deleted += batch_deleted
+
+        finally:
+            if deleted:
+                AccountHelper.invalidate_caches(owner_id)
+
+        return {
+            "deleted": deleted,
+            "not_found": sorted(set(ids) - set(deleted)),
+        }
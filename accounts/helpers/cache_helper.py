@@ -0,0 +1,155 @@
+from utils.caching import Caching
+from utils.responses import RenderedResponse
+from .account_helper import AccountHelper
+from .search_helper import SearchHelper
+from .type_helper import TypeHelper
+import functools
+import time
+
+
+class CacheHelper:
+
+    # Cached values, rebuilt from the db when missing
+
+    @staticmethod
+    def get_accounts(owner_id):
+        return Caching.get_or_build_cache_value(
+            key=AccountHelper.get_cache_key(owner_id),
+            build=lambda: AccountHelper.build_cached_accounts(owner_id)
+        )
+
+    @staticmethod
+    def get_account_rows(owner_id, fields=None):
+        if fields is None:
+            return CacheHelper.get_accounts(owner_id)["rows"]
+
+        return Caching.get_or_build_cache_value(
+            key=AccountHelper.get_projection_cache_key(
+                AccountHelper.get_cache_key(owner_id, "accounts:rows"),
+                fields
+            ),
+            build=lambda: AccountHelper.build_projected_accounts(
+                owner_id,
+                fields
+            )
+        )
+
+    @staticmethod
+    def get_rendered_accounts(owner_id, fields=None):
+        return Caching.get_or_build_cache_value(
+            key=AccountHelper.get_projection_cache_key(
+                AccountHelper.get_cache_key(owner_id, "accounts:rendered"),
+                fields
+            ),
+            build=lambda: RenderedResponse.render(
+                CacheHelper.get_account_rows(owner_id, fields)
+            )
+        )
+
+    @staticmethod
+    def get_filtered_accounts(owner_id, filters, ordering, fields=None):
+        return Caching.get_or_build_cache_value(
+            key=AccountHelper.get_projection_cache_key(
+                AccountHelper.get_filter_cache_key(
+                    AccountHelper.get_cache_key(owner_id, "accounts:rows"),
+                    filters,
+                    ordering
+                ),
+                fields
+            ),
+            build=lambda: AccountHelper.build_filtered_accounts(
+                owner_id,
+                filters,
+                ordering,
+                fields
+            )
+        )
+
+    @staticmethod
+    def get_accounts_page(owner_id, after_id, limit, fields=None, filters=()):
+        return Caching.get_or_build_cache_value(
+            key=AccountHelper.get_projection_cache_key(
+                AccountHelper.get_filter_cache_key(
+                    AccountHelper.get_cache_key(
+                        owner_id,
+                        "accounts:page:" + str(after_id) + ":" + str(limit)
+                    ),
+                    filters,
+                    None
+                ),
+                fields
+            ),
+            build=lambda: AccountHelper.build_accounts_page(
+                owner_id,
+                after_id,
+                limit,
+                fields,
+                filters
+            )
+        )
+
+    @staticmethod
+    def get_search_results(owner_id, query, limit):
+        return Caching.get_or_build_cache_value(
+            key=SearchHelper.get_search_cache_key(owner_id, query, limit),
+            build=lambda: SearchHelper.build_search_results(
+                owner_id,
+                query,
+                limit
+            )
+        )
+
+    @staticmethod
+    def get_types():
+        return Caching.get_or_build_cache_value(
+            key="types",
+            build=TypeHelper.build_cached_types
+        )
+
+    @staticmethod
+    def get_rendered_types():
+        return Caching.get_or_build_cache_value(
+            key="types:rendered",
+            build=lambda: RenderedResponse.render(CacheHelper.get_types())
+        )
+
+    # Warm up
+
+    @staticmethod
+    def warm_caches(force=False):
+        '''
+        Populates the type caches and the account caches of every owner.
+        Returns a list of (key, seconds taken) in the order they were
+        warmed.
+        '''
+
+        if force:
+            AccountHelper.invalidate_all_caches()
+            Caching.delete_cache_value("types")
+
+        values = [
+            ("types", CacheHelper.get_types),
+            ("types:rendered", CacheHelper.get_rendered_types),
+        ]
+        for owner_id in AccountHelper.get_owner_ids():
+            values += [
+                (
+                    AccountHelper.get_cache_key(owner_id),
+                    functools.partial(CacheHelper.get_accounts, owner_id)
+                ),
+                (
+                    AccountHelper.get_cache_key(owner_id, "accounts:rendered"),
+                    functools.partial(
+                        CacheHelper.get_rendered_accounts,
+                        owner_id
+                    )
+                ),
+            ]
+
+        timings = []
+        for key, get_value in values:
+            start = time.perf_counter()
+            get_value()
+            timings.append((key, time.perf_counter() - start))
+
+        return timings
@@ -0,0 +1,219 @@
+from collections import Counter
+from django.db import IntegrityError, router, transaction
+from django.db.models import Count, F
+from ..models import Account, AccountCount
+from .type_helper import TypeHelper
+
+# Materialized account counts
+#
+# AccountCount holds the number of accounts per (owner, type), so stats
+# are read from a handful of rows instead of counting the accounts.
+# Counts change by deltas applied with atomic increments: single saves
+# through the post_save signal, bulk writes, deletes and type deletes
+# where they happen. Accounts without an owner are not counted.
+# reconcile() recomputes every count from the accounts.
+
+
+class CountHelper:
+
+    # AccountCount.type_id of accounts without a type
+    NO_TYPE = 0
+
+    @staticmethod
+    def get_db_alias():
+        return router.db_for_write(AccountCount)
+
+    @staticmethod
+    def get_count_key(owner_id, type_id):
+        return (owner_id, type_id or CountHelper.NO_TYPE)
+
+    # Delta methods
+
+    @staticmethod
+    def apply_deltas(deltas):
+        '''
+        Adds deltas, (owner_id, type_id) -> change, to the counts.
+        Applied in key order so concurrent writers lock rows in the
+        same order.
+        '''
+
+        changes = Counter()
+        for (owner_id, type_id), delta in deltas.items():
+            if owner_id is not None:
+                changes[CountHelper.get_count_key(owner_id, type_id)] += delta
+
+        for key, delta in sorted(changes.items()):
+            if not delta or CountHelper.increment(key, delta):
+                continue
+
+            try:
+                with transaction.atomic(using=CountHelper.get_db_alias()):
+                    AccountCount.objects.create(
+                        owner_id=key[0],
+                        type_id=key[1],
+                        count=delta
+                    )
+            except IntegrityError:
+                # Created by a concurrent writer meanwhile
+                CountHelper.increment(key, delta)
+
+    @staticmethod
+    def increment(key, delta):
+        return AccountCount.objects.filter(
+            owner_id=key[0],
+            type_id=key[1]
+        ).update(count=F('count') + delta)
+
+    @staticmethod
+    def record_change(previous, current):
+        '''
+        Moves one account from the (owner_id, type_id) previous to
+        current. Either is None for a create or a delete.
+        '''
+
+        deltas = Counter()
+        if previous is not None:
+            deltas[CountHelper.get_count_key(*previous)] -= 1
+        if current is not None:
+            deltas[CountHelper.get_count_key(*current)] += 1
+        CountHelper.apply_deltas(deltas)
+
+    @staticmethod
+    def record_deletion(account):
+        CountHelper.record_change((account.owner_id, account.type_id), None)
+
+    @staticmethod
+    def record_creations(accounts):
+        CountHelper.apply_deltas(Counter(
+            CountHelper.get_count_key(account.owner_id, account.type_id)
+            for account in accounts
+        ))
+
+    @staticmethod
+    def record_deletions(accounts):
+        '''
+        accounts: queryset of the accounts about to be deleted
+        '''
+
+        CountHelper.apply_deltas(Counter({
+            CountHelper.get_count_key(owner_id, type_id): -count
+            for owner_id, type_id, count in CountHelper.count_accounts(accounts)
+        }))
+
+    @staticmethod
+    def record_type_changes(previous_types, accounts):
+        '''
+        previous_types: account id -> type_id before accounts changed
+        '''
+
+        deltas = Counter()
+        for account in accounts:
+            previous_type = previous_types[account.id]
+            if previous_type != account.type_id:
+                deltas[(account.owner_id, previous_type)] -= 1
+                deltas[(account.owner_id, account.type_id)] += 1
+        CountHelper.apply_deltas(deltas)
+
+    @staticmethod
+    def clear_type(type_id):
+        '''
+        Moves the counts of a type being deleted to no type, as its
+        accounts are set to null.
+        '''
+
+        deltas = Counter()
+        for owner_id, count in AccountCount.objects.filter(
+            type_id=type_id
+        ).values_list('owner_id', 'count'):
+            deltas[(owner_id, type_id)] -= count
+            deltas[(owner_id, CountHelper.NO_TYPE)] += count
+
+        CountHelper.apply_deltas(deltas)
+        AccountCount.objects.filter(type_id=type_id, count=0).delete()
+
+    # Read methods
+
+    @staticmethod
+    def get_stats(owner_id):
+        '''
+        Account totals of one owner, overall and per type, biggest
+        first. Accounts without a type have a type of None.
+        '''
+
+        counts = AccountCount.objects.filter(
+            owner_id=owner_id,
+            count__gt=0
+        ).order_by('-count', 'type_id').values_list('type_id', 'count')
+
+        type_names = TypeHelper.get_type_names()
+        types = []
+        for type_id, count in counts:
+            type_id = type_id or None
+            types.append({
+                "type": type_id,
+                "type_name": type_names.get(type_id),
+                "count": count,
+            })
+
+        return {
+            "total": sum(item["count"] for item in types),
+            "types": types,
+        }
+
+    # Reconcile methods
+
+    @staticmethod
+    def count_accounts(accounts):
+        '''
+        Returns (owner_id, type_id, count) for the owned accounts of a
+        queryset, one grouped query.
+        '''
+
+        return accounts.exclude(owner_id=None).values(
+            'owner_id',
+            'type_id'
+        ).annotate(count=Count('id')).order_by().values_list(
+            'owner_id',
+            'type_id',
+            'count'
+        )
+
+    @staticmethod
+    def reconcile(owner_id=None):
+        '''
+        Recomputes the counts of owner_id, or of every owner, from the
+        accounts. Returns the number of counts that were wrong.
+        '''
+
+        accounts = Account.objects.all()
+        stored = AccountCount.objects.all()
+        if owner_id is not None:
+            accounts = accounts.filter(owner_id=owner_id)
+            stored = stored.filter(owner_id=owner_id)
+
+        with transaction.atomic(using=CountHelper.get_db_alias()):
+            expected = {
+                CountHelper.get_count_key(owner, type_id): count
+                for owner, type_id, count
+                in CountHelper.count_accounts(accounts)
+            }
+            actual = {
+                (owner, type_id): count
+                for owner, type_id, count
+                in stored.select_for_update().values_list(
+                    'owner_id',
+                    'type_id',
+                    'count'
+                )
+            }
+
+            stored.delete()
+            AccountCount.objects.bulk_create([
+                AccountCount(owner_id=key[0], type_id=key[1], count=count)
+                for key, count in sorted(expected.items())
+            ])
+
+        return sum(
+            1 for key in set(expected) | set(actual)
+            if expected.get(key, 0) != actual.get(key, 0)
+        )
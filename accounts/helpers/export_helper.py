@@ -0,0 +1,183 @@
+from django.conf import settings
+from django.db.models import BinaryField, ExpressionWrapper, F
+from utils.decryption import Decryption
+from utils.formatting import Formatting
+from utils.writers import Writers
+from ..models import Account
+from .type_helper import TypeHelper
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# Full exports of the vault, plaintext passwords included
+#
+# Accounts are read in id order, ACCOUNTS_EXPORT_CHUNK_SIZE rows per
+# query (keyset batches rather than one open cursor, MySQL clients
+# buffer whole result sets), and each batch is decrypted and written
+# before the next is read, so memory stays flat whatever the vault size.
+# Column names are ones ImportHelper reads, an export imports back as is.
+# An owner_id limits the export to that user's accounts, without one
+# every account is exported (the management command's default).
+
+
+class ExportHelper:
+
+    FORMATS = {
+        "csv": "text/csv",
+        "ndjson": "application/x-ndjson",
+    }
+
+    COLUMNS = (
+        "id",
+        "type_name",
+        "email",
+        "username",
+        "password",
+        "company",
+        "website",
+        "description",
+        "date_created",
+        "date_updated",
+    )
+
+    @staticmethod
+    def get_format(format):
+        if format not in ExportHelper.FORMATS:
+            raise ValueError(
+                "format must be one of: " + ", ".join(ExportHelper.FORMATS)
+            )
+        return format
+
+    # Database methods
+
+    @staticmethod
+    def get_encrypted_batch(after_id, limit, owner_id=None):
+        '''
+        Returns up to limit account rows with ids above after_id. The
+        password column is left encrypted, read as plain bytes.
+        '''
+
+        accounts = Account.objects.filter(id__gt=after_id)
+        if owner_id is not None:
+            accounts = accounts.filter(owner_id=owner_id)
+
+        return list(
+            accounts.order_by('id').values_list(
+                'id',
+                'type_id',
+                'email',
+                'username',
+                ExpressionWrapper(F('password'), output_field=BinaryField()),
+                'company',
+                'website',
+                'description',
+                'date_created',
+                'date_updated',
+            )[:limit]
+        )
+
+    @staticmethod
+    def decrypt_passwords(ciphertexts):
+        '''
+        Decrypts a batch of password column values, in order, across
+        the decryption pool when the batch is large enough.
+        '''
+
+        return Decryption.decrypt_values(
+            Account._meta.get_field('password'),
+            ciphertexts
+        )
+
+    # Build methods
+
+    @staticmethod
+    def iterate_batches(chunk_size, owner_id=None):
+        '''
+        Yields lists of export rows (tuples in COLUMNS order).
+        '''
+
+        type_names = TypeHelper.get_type_names()
+        after_id = 0
+        while True:
+            batch = ExportHelper.get_encrypted_batch(
+                after_id,
+                chunk_size,
+                owner_id
+            )
+            if not batch:
+                return
+
+            passwords = ExportHelper.decrypt_passwords(
+                [values[4] for values in batch]
+            )
+            yield [
+                ExportHelper.build_row(values, password, type_names)
+                for values, password in zip(batch, passwords)
+            ]
+
+            if len(batch) < chunk_size:
+                return
+            after_id = batch[-1][0]
+
+    @staticmethod
+    def build_row(values, password, type_names):
+        (id, type_id, email, username, _, company, website, description,
+         date_created, date_updated) = values
+
+        return (
+            id,
+            type_names.get(type_id),
+            email,
+            username,
+            password,
+            company,
+            website,
+            description,
+            Formatting.format_date_fast(date_created),
+            Formatting.format_date_fast(date_updated),
+        )
+
+    # Export methods
+
+    @staticmethod
+    def export_accounts(
+        format,
+        owner_id=None,
+        chunk_size=None,
+        on_progress=None
+    ):
+        '''
+        Yields the export as encoded chunks. on_progress is called with
+        a summary of rows exported and seconds taken after every batch.
+        '''
+
+        chunk_size = chunk_size or settings.ACCOUNTS_EXPORT_CHUNK_SIZE
+        summary = {"exported": 0, "seconds": 0.0}
+        start = time.perf_counter()
+
+        def iterate_rows():
+            for batch in ExportHelper.iterate_batches(chunk_size, owner_id):
+                yield from batch
+                summary["exported"] += len(batch)
+                summary["seconds"] = time.perf_counter() - start
+                if on_progress is not None:
+                    on_progress(summary)
+
+        if format == "csv":
+            write = Writers.iter_csv
+        else:
+            write = Writers.iter_ndjson
+
+        yield from write(iterate_rows(), ExportHelper.COLUMNS, chunk_size)
+
+        seconds = time.perf_counter() - start
+        logger.info("Export finished: %d rows in %.1fs (%d rows/s)" % (
+            summary["exported"],
+            seconds,
+            ExportHelper.get_rate(summary["exported"], seconds),
+        ))
+
+    @staticmethod
+    def get_rate(rows, seconds):
+        return rows / seconds if seconds > 0 else 0
@@ -0,0 +1,200 @@
+from django.conf import settings
+from utils.caching import Caching
+from utils.readers import Readers
+from ..models import Type
+from .account_helper import AccountHelper
+from .bulk_helper import BulkHelper
+from .type_helper import TypeHelper
+import csv
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Imports of password manager exports
+#
+# Records are read incrementally and written through BulkHelper in
+# batches of ACCOUNTS_IMPORT_BATCH_SIZE, so memory stays flat whatever
+# the file size. Rows are numbered from 1 (the first data row) in error
+# reports. A read error stops the import, batches written before it
+# stay. Accounts are created for one owner, whose account cache is
+# invalidated once, at the end.
+
+
+class ImportHelper:
+
+    FORMATS = ("csv", "json", "ndjson")
+
+    # Account field -> lowercased column names used by common exporters
+    COLUMNS = {
+        "email": ("email", "login_email"),
+        "username": ("username", "login_username", "login", "user"),
+        "password": ("password", "login_password"),
+        "company": ("company", "name", "title"),
+        "website": ("website", "url", "login_uri", "uri"),
+        "description": ("description", "notes", "note", "extra", "comments"),
+        "type": ("type", "type_name", "folder", "category", "grouping"),
+    }
+
+    @staticmethod
+    def get_format(format, file_name=None):
+        if format is None and file_name:
+            format = file_name.rpartition(".")[2].lower()
+
+        if format not in ImportHelper.FORMATS:
+            raise ValueError(
+                "format must be one of: " + ", ".join(ImportHelper.FORMATS)
+            )
+        return format
+
+    @staticmethod
+    def read_records(binary_stream, format):
+        if format == "csv":
+            return Readers.iter_csv(binary_stream)
+        if format == "ndjson":
+            return Readers.iter_ndjson(binary_stream)
+        return Readers.iter_json_array(
+            binary_stream,
+            max_item_size=settings.ACCOUNTS_IMPORT_MAX_ITEM_SIZE
+        )
+
+    # Mapping methods
+
+    @staticmethod
+    def map_record(record):
+        '''
+        Returns the account data of a record and its type name.
+        '''
+
+        if not isinstance(record, dict):
+            raise ValueError("expected an object")
+
+        values = {
+            str(column).strip().lower(): value
+            for column, value in record.items()
+        }
+
+        data = {}
+        for field_name, columns in ImportHelper.COLUMNS.items():
+            for column in columns:
+                value = values.get(column)
+                if value is not None:
+                    data[field_name] = str(value).strip()
+                    break
+
+        return data, data.pop("type", "")
+
+    @staticmethod
+    def resolve_type(type_name, type_ids, summary):
+        '''
+        Returns the id of the named type, creating it when missing.
+        type_ids caches name -> id for the whole import.
+        '''
+
+        if not type_name:
+            return None
+
+        if type_name not in type_ids:
+            type_inst, created = Type.objects.get_or_create(name=type_name)
+            type_ids[type_name] = type_inst.id
+            if created:
+                summary["types_created"] += 1
+
+        return type_ids[type_name]
+
+    # Import methods
+
+    @staticmethod
+    def import_accounts(owner_id, records, batch_size=None, on_progress=None):
+        '''
+        Imports accounts owned by owner_id from an iterator of records.
+        on_progress is called with the summary after every batch.
+        '''
+
+        batch_size = min(
+            batch_size or settings.ACCOUNTS_IMPORT_BATCH_SIZE,
+            settings.ACCOUNTS_BULK_MAX_ITEMS
+        )
+        summary = {
+            "imported": 0,
+            "failed": 0,
+            "types_created": 0,
+            "errors": [],
+        }
+        type_ids = {
+            name: id for id, name in TypeHelper.get_type_names().items()
+        }
+
+        row = 0
+        batch = []
+        read_error = None
+        try:
+            try:
+                for row, record in enumerate(records, start=1):
+                    batch.append((row, record))
+                    if len(batch) >= batch_size:
+                        ImportHelper.import_batch(
+                            owner_id,
+                            batch,
+                            type_ids,
+                            summary
+                        )
+                        batch = []
+                        if on_progress is not None:
+                            on_progress(summary)
+
+            except (ValueError, csv.Error) as e:
+                # Unreadable input, keep what was read before it
+                read_error = str(e)
+
+            if batch:
+                ImportHelper.import_batch(owner_id, batch, type_ids, summary)
+                if on_progress is not None:
+                    on_progress(summary)
+
+            if read_error is not None:
+                ImportHelper.add_error(summary, row + 1, read_error)
+
+        finally:
+            if summary["imported"]:
+                AccountHelper.invalidate_caches(owner_id)
+            if summary["types_created"]:
+                Caching.delete_cache_value("types")
+
+        return summary
+
+    @staticmethod
+    def import_batch(owner_id, batch, type_ids, summary):
+        items = []
+        rows = []
+        for row, record in batch:
+            try:
+                data, type_name = ImportHelper.map_record(record)
+                data["type"] = ImportHelper.resolve_type(
+                    type_name,
+                    type_ids,
+                    summary
+                )
+            except ValueError as e:
+                ImportHelper.add_error(summary, row, str(e))
+                continue
+
+            items.append(data)
+            rows.append(row)
+
+        # Invalidated once by import_accounts, not per batch
+        result = BulkHelper.create_accounts(owner_id, items, invalidate=False)
+        summary["imported"] += len(result["created"])
+        for error in result["errors"]:
+            ImportHelper.add_error(summary, rows[error["index"]], error["errors"])
+
+        logger.info(
+            "Import progress: %d imported, %d failed"
+            % (summary["imported"], summary["failed"])
+        )
+
+    @staticmethod
+    def add_error(summary, row, errors):
+        summary["failed"] += 1
+        # Report a bounded number of errors for huge bad files
+        if len(summary["errors"]) < settings.ACCOUNTS_IMPORT_MAX_ERRORS:
+            summary["errors"].append({"row": row, "errors": errors})
@@ -0,0 +1,248 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from django.core.signing import BadSignature
+from django.db import connections, router, transaction
+from django.db.models import (
+    BinaryField,
+    Case,
+    ExpressionWrapper,
+    F,
+    Max,
+    Min,
+    Value,
+    When,
+)
+from django.utils.encoding import force_bytes
+from django_cryptography.utils.crypto import InvalidToken
+from utils.decryption import Decryption, init_worker
+from utils.keyring import AmbiguousToken, KeyRing
+from ..models import Account
+import json
+import os
+
+# Re-encryption of Account.password from CRYPTOGRAPHY_OLD_KEYS to
+# CRYPTOGRAPHY_KEY
+#
+# Work is split in id ranges aligned to the batch size, so ranges stay
+# the same between runs whatever rows were added or deleted meanwhile.
+# Each range is rotated in its own transaction, rows already on the
+# current key are left alone, so re-running a range is harmless. The
+# checkpoint records finished ranges for the current key. Rows that
+# more than one key decrypts are reported as ambiguous and left alone.
+
+
+def _run_range(method_name, start, end):
+    return getattr(KeyRotationHelper, method_name)(start, end)
+
+
+class KeyRotationHelper:
+
+    @staticmethod
+    def get_db_alias():
+        return router.db_for_write(Account)
+
+    @staticmethod
+    def get_id_ranges(batch_size):
+        bounds = Account.objects.aggregate(Min('id'), Max('id'))
+        if bounds['id__min'] is None:
+            return []
+
+        first = bounds['id__min'] - bounds['id__min'] % batch_size
+        return [
+            (start, start + batch_size)
+            for start in range(first, bounds['id__max'] + 1, batch_size)
+        ]
+
+    @staticmethod
+    def get_encrypted_passwords(start, end, for_update=False):
+        accounts = Account.objects.using(KeyRotationHelper.get_db_alias())
+        if for_update:
+            accounts = accounts.select_for_update()
+
+        return [
+            (id, force_bytes(ciphertext))
+            for id, ciphertext in accounts.filter(
+                id__gte=start,
+                id__lt=end
+            ).order_by('id').values_list(
+                'id',
+                ExpressionWrapper(F('password'), output_field=BinaryField())
+            )
+        ]
+
+    @staticmethod
+    def get_write_workers(workers):
+        # SQLite takes one writer at a time, parallel batches only fail
+        if connections[KeyRotationHelper.get_db_alias()].vendor == "sqlite":
+            return 1
+        return workers
+
+    # Range methods, run in worker processes
+
+    @staticmethod
+    def rotate_range(start, end):
+        '''
+        Re-encrypts passwords in [start, end) that are still on an old
+        key with the current key.
+        '''
+
+        keyring = KeyRing.from_settings()
+        result = {
+            "start": start,
+            "rotated": 0,
+            "current": 0,
+            "failed": [],
+            "ambiguous": [],
+        }
+        alias = KeyRotationHelper.get_db_alias()
+
+        with transaction.atomic(using=alias):
+            rotated = {}
+            for id, ciphertext in KeyRotationHelper.get_encrypted_passwords(
+                start,
+                end,
+                for_update=True
+            ):
+                try:
+                    index, plaintext = keyring.decrypt_with_index(ciphertext)
+                except AmbiguousToken:
+                    result["ambiguous"].append(id)
+                    continue
+                except (InvalidToken, BadSignature):
+                    result["failed"].append(id)
+                    continue
+
+                if index == 0:
+                    result["current"] += 1
+                else:
+                    rotated[id] = keyring.encrypt(plaintext)
+
+            if rotated:
+                # Raw ciphertext, bypassing the field's own encryption.
+                # Not a change to the account, date_updated stays.
+                Account.objects.using(alias).filter(id__in=rotated).update(
+                    password=Case(
+                        *[
+                            When(id=id, then=Value(
+                                ciphertext,
+                                output_field=BinaryField()
+                            ))
+                            for id, ciphertext in rotated.items()
+                        ],
+                        output_field=BinaryField()
+                    )
+                )
+            result["rotated"] = len(rotated)
+
+        return result
+
+    @staticmethod
+    def verify_range(start, end):
+        '''
+        Counts passwords in [start, end) by the key they decrypt with.
+        '''
+
+        keyring = KeyRing.from_settings()
+        result = {
+            "start": start,
+            "current": 0,
+            "old": 0,
+            "failed": [],
+            "ambiguous": [],
+        }
+
+        for id, ciphertext in KeyRotationHelper.get_encrypted_passwords(
+            start,
+            end
+        ):
+            try:
+                index = keyring.decrypt_with_index(ciphertext)[0]
+            except AmbiguousToken:
+                result["ambiguous"].append(id)
+                continue
+            except (InvalidToken, BadSignature):
+                result["failed"].append(id)
+                continue
+
+            if index == 0:
+                result["current"] += 1
+            else:
+                result["old"] += 1
+
+        return result
+
+    @staticmethod
+    def run_ranges(method_name, ranges, workers):
+        '''
+        Yields the result of method_name for every range, in order of
+        completion, across workers processes.
+        '''
+
+        if workers < 2 or len(ranges) < 2:
+            for start, end in ranges:
+                yield _run_range(method_name, start, end)
+            return
+
+        # Started like the decryption pool, never forked from this
+        # process and its open connections
+        executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=Decryption.get_mp_context(),
+            initializer=init_worker
+        )
+        futures = []
+        try:
+            futures = [
+                executor.submit(_run_range, method_name, start, end)
+                for start, end in ranges
+            ]
+            for future in as_completed(futures):
+                yield future.result()
+        finally:
+            # Ranges not started yet are picked up on resume
+            for future in futures:
+                future.cancel()
+            executor.shutdown()
+
+    # Checkpoint methods
+
+    @staticmethod
+    def load_checkpoint(path):
+        '''
+        Returns the checkpoint of a rotation to the current key, or None.
+        '''
+
+        try:
+            with open(path) as checkpoint_file:
+                checkpoint = json.load(checkpoint_file)
+        except FileNotFoundError:
+            return None
+
+        if checkpoint.get("key") != KeyRing.get_fingerprint(
+            KeyRing.get_current_key()
+        ):
+            return None
+        return checkpoint
+
+    @staticmethod
+    def new_checkpoint(batch_size):
+        return {
+            "key": KeyRing.get_fingerprint(KeyRing.get_current_key()),
+            "batch_size": batch_size,
+            "done": [],
+        }
+
+    @staticmethod
+    def save_checkpoint(path, checkpoint):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # Write then rename, an interruption never leaves half a file
+        temp_path = path + ".tmp"
+        with open(temp_path, "w") as checkpoint_file:
+            json.dump(checkpoint, checkpoint_file)
+        os.replace(temp_path, path)
+
+    @staticmethod
+    def delete_checkpoint(path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,174 @@
+from django.conf import settings
+from utils.search import Search
+from ..models import Account, AccountToken
+from .account_helper import AccountHelper
+import hashlib
+
+
+class SearchHelper:
+
+    # Weight of a token per field it appears in
+    FIELD_WEIGHTS = {
+        "company": 3,
+        "username": 3,
+        "email": 3,
+        "website": 2,
+        "description": 1,
+    }
+
+    # Query terms that are only a prefix of a token score this share
+    PREFIX_MATCH_FACTOR = 0.5
+
+    # Shorter terms only match whole tokens, a one letter prefix would
+    # scan a large share of the index
+    MIN_PREFIX_LENGTH = 2
+
+    # Index methods
+
+    @staticmethod
+    def build_account_tokens(account):
+        token_weights = Search.get_weighted_tokens(
+            {
+                field_name: getattr(account, field_name)
+                for field_name in SearchHelper.FIELD_WEIGHTS
+            },
+            SearchHelper.FIELD_WEIGHTS
+        )
+        return [
+            AccountToken(account_id=account.id, token=token, weight=weight)
+            for token, weight in token_weights.items()
+        ]
+
+    @staticmethod
+    def index_account(account, using=None):
+        AccountToken.objects.using(using).filter(account_id=account.id).delete()
+        AccountToken.objects.using(using).bulk_create(
+            SearchHelper.build_account_tokens(account)
+        )
+
+    @staticmethod
+    def index_accounts(accounts):
+        '''
+        Re-indexes many accounts in two queries, for bulk writes that
+        skip the post_save signal.
+        '''
+
+        AccountToken.objects.filter(
+            account_id__in=[account.id for account in accounts]
+        ).delete()
+        AccountToken.objects.bulk_create([
+            token
+            for account in accounts
+            for token in SearchHelper.build_account_tokens(account)
+        ])
+
+    @staticmethod
+    def rebuild_index(batch_size=1000):
+        '''
+        Re-indexes every account, returns the number of accounts.
+        '''
+
+        AccountToken.objects.all().delete()
+
+        count = 0
+        accounts = Account.objects.only(*SearchHelper.FIELD_WEIGHTS)
+        batch = []
+        for account in accounts.iterator(chunk_size=batch_size):
+            batch += SearchHelper.build_account_tokens(account)
+            count += 1
+            if len(batch) >= batch_size:
+                AccountToken.objects.bulk_create(batch)
+                batch = []
+
+        AccountToken.objects.bulk_create(batch)
+        return count
+
+    # Search methods
+
+    @staticmethod
+    def parse_search_limit(limit):
+        if limit is None:
+            return settings.ACCOUNTS_SEARCH_DEFAULT_LIMIT
+
+        try:
+            limit = int(limit)
+        except ValueError:
+            raise ValueError("limit must be an integer")
+
+        if limit < 1 or limit > settings.ACCOUNTS_PAGE_MAX_LIMIT:
+            raise ValueError(
+                "limit must be between 1 and "
+                + str(settings.ACCOUNTS_PAGE_MAX_LIMIT)
+            )
+
+        return limit
+
+    @staticmethod
+    def get_term_matches(owner_id, term):
+        '''
+        Returns account id -> score for the owner's tokens starting with
+        term, or equal to it below MIN_PREFIX_LENGTH. One range scan on
+        the (token, account) index, joined to the account for its owner.
+        '''
+
+        if len(term) < SearchHelper.MIN_PREFIX_LENGTH:
+            tokens = AccountToken.objects.filter(token=term)
+        else:
+            tokens = AccountToken.objects.filter(token__startswith=term)
+
+        matches = {}
+        rows = tokens.filter(
+            account__owner_id=owner_id
+        ).values_list('account_id', 'token', 'weight')
+
+        for account_id, token, weight in rows:
+            score = weight if token == term else (
+                weight * SearchHelper.PREFIX_MATCH_FACTOR
+            )
+            if score > matches.get(account_id, 0):
+                matches[account_id] = score
+
+        return matches
+
+    @staticmethod
+    def search_account_ids(owner_id, query):
+        '''
+        Returns the ids of accounts matching every term of query, best
+        match first. Terms match whole tokens or their prefixes.
+        '''
+
+        terms = sorted(set(Search.tokenize(query)))
+        if not terms:
+            return []
+
+        return Search.rank([
+            SearchHelper.get_term_matches(owner_id, term) for term in terms
+        ])
+
+    @staticmethod
+    def build_search_results(owner_id, query, limit):
+        ids = SearchHelper.search_account_ids(owner_id, query)
+        return {
+            "count": len(ids),
+            "results": AccountHelper.build_accounts_by_ids(
+                owner_id,
+                ids[:limit]
+            ),
+        }
+
+    # Cache key methods
+
+    @staticmethod
+    def get_search_cache_key(owner_id, query, limit):
+        '''
+        Queries with the same terms share a key. Lives in the owner's
+        accounts namespace so any of their account writes drops it.
+        '''
+
+        terms = " ".join(sorted(set(Search.tokenize(query))))
+        return AccountHelper.get_cache_key(
+            owner_id,
+            "accounts:search:"
+            + hashlib.sha1(terms.encode()).hexdigest()
+            + ":" + str(limit)
+        )
@@ -0,0 +1,143 @@
+from django.conf import settings
+from django.utils import timezone
+from ..models import Account, DeletedAccount
+from .account_helper import AccountHelper
+import base64
+import datetime
+
+# Delta sync
+#
+# A sync returns the accounts updated since a cursor, the ids deleted
+# since it and a new cursor. The cursor is the server time the sync
+# started at, and the next sync re-reads ACCOUNTS_SYNC_OVERLAP seconds
+# before it, so writes committed just after a sync started are not
+# missed (clients apply changes as idempotent upserts). A sync without
+# a cursor, or with one older than the tombstone retention, is a reset:
+# changes holds every account and the client replaces its copy.
+
+
+class SyncHelper:
+
+    # Database methods
+
+    @staticmethod
+    def get_accounts_updated_since(owner_id, since):
+        return AccountHelper.get_owner_accounts(owner_id).filter(
+            date_updated__gte=since
+        )
+
+    @staticmethod
+    def get_deleted_ids_since(owner_id, since):
+        return list(
+            DeletedAccount.objects.filter(
+                owner_id=owner_id,
+                date_deleted__gte=since
+            ).order_by('account_id').values_list(
+                'account_id',
+                flat=True
+            ).distinct()
+        )
+
+    @staticmethod
+    def record_deletion(owner_id, account_id):
+        SyncHelper.record_deletions(owner_id, [account_id])
+
+    @staticmethod
+    def record_deletions(owner_id, account_ids):
+        DeletedAccount.objects.bulk_create([
+            DeletedAccount(account_id=account_id, owner_id=owner_id)
+            for account_id in account_ids
+        ])
+
+        # Tombstones past the retention can no longer be asked for
+        DeletedAccount.objects.filter(
+            date_deleted__lt=SyncHelper.get_retention_start()
+        ).delete()
+
+    @staticmethod
+    def touch_accounts_of_type(type_id):
+        '''
+        Marks the accounts of a type as updated, for changes to the type
+        that alter their serialized type_name or type. Queryset updates
+        skip auto_now, so the timestamp is set explicitly.
+        '''
+
+        Account.objects.filter(type_id=type_id).update(
+            date_updated=timezone.now()
+        )
+
+    @staticmethod
+    def get_retention_start():
+        return timezone.now() - datetime.timedelta(
+            seconds=settings.ACCOUNTS_SYNC_TOMBSTONE_RETENTION
+        )
+
+    # Sync methods
+
+    @staticmethod
+    def get_changes(owner_id, since):
+        '''
+        Changes to the accounts of owner_id.
+        since: datetime from decode_cursor, None for a full sync
+        '''
+
+        started = timezone.now()
+        if since is not None and since < SyncHelper.get_retention_start():
+            since = None
+
+        if since is None:
+            accounts = AccountHelper.get_owner_accounts(owner_id)
+            deleted = []
+        else:
+            window_start = since - datetime.timedelta(
+                seconds=settings.ACCOUNTS_SYNC_OVERLAP
+            )
+            accounts = SyncHelper.get_accounts_updated_since(
+                owner_id,
+                window_start
+            )
+            deleted = SyncHelper.get_deleted_ids_since(owner_id, window_start)
+
+        serializer = AccountHelper.get_flat_serializer(None)
+        rows = accounts.order_by('date_updated', 'id').values_list(
+            *serializer.columns
+        )
+
+        return {
+            "changes": serializer.to_representation_many(rows),
+            "deleted": deleted,
+            "cursor": SyncHelper.encode_cursor(started),
+            "reset": since is None,
+        }
+
+    # Cursor methods
+
+    @staticmethod
+    def encode_cursor(timestamp):
+        microseconds = int(timestamp.timestamp() * 1000000)
+        return base64.urlsafe_b64encode(
+            ("ts:" + str(microseconds)).encode()
+        ).decode().rstrip("=")
+
+    @staticmethod
+    def decode_cursor(cursor):
+        '''
+        Returns the aware datetime of a cursor, None for a full sync.
+        '''
+
+        if not cursor:
+            return None
+
+        try:
+            padded = cursor + "=" * (-len(cursor) % 4)
+            prefix, microseconds = base64.urlsafe_b64decode(
+                padded.encode()
+            ).decode().split(":")
+            if prefix != "ts":
+                raise ValueError()
+            return datetime.datetime.fromtimestamp(
+                int(microseconds) / 1000000,
+                tz=datetime.timezone.utc
+            )
+        except (ValueError, UnicodeDecodeError, OverflowError, OSError):
+            raise ValueError("invalid cursor")
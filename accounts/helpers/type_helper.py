@@ -1,4 +1,6 @@
 from ..models import Type
+from ..serializers import TypeSerializer
+from ..type_registry import TypeRegistry
 
 
 class TypeHelper:
@@ -22,3 +24,22 @@ class TypeHelper:
     @staticmethod
     def get_type_qs_by_id(type_id):
         return Type.objects.filter(id=type_id)
+
+    @staticmethod
+    def get_type_names():
+        '''
+        Returns type id -> name for all types, shared with TypeRegistry
+        and not to be modified.
+        '''
+
+        return TypeRegistry.get_names()
+
+    # Cache build methods
+
+    @staticmethod
+    def build_cached_types():
+        serializer = TypeSerializer(
+            TypeHelper.get_all_types(),
+            many=True,
+        )
+        return list(serializer.data)
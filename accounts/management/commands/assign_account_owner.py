@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+from ...helpers.account_helper import AccountHelper
+
+# NOTE: To give accounts created before per-user ownership to a user:
+#       python manage.py assign_account_owner <username>
+# NOTE: Accounts without an owner are not visible through the API
+
+
+class Command(BaseCommand):
+    help = 'Assign accounts without an owner to a user'
+
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+
+    def handle(self, *args, **options):
+        try:
+            owner_id = AccountHelper.get_user_id(options['username'])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        claimed = AccountHelper.assign_owner(owner_id)
+
+        self.stdout.write(self.style.SUCCESS(
+            "Assigned %d accounts to %s" % (claimed, options['username'])
+        ))
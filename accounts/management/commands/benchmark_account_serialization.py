@@ -0,0 +1,92 @@
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+from ...helpers.account_helper import AccountHelper
+from ...serializers import AccountSerializer
+import time
+
+# NOTE: To benchmark: python manage.py benchmark_account_serialization
+# NOTE: Runs against the accounts already in the database, use --repeat
+#       to get stable numbers on small tables. Serializes the accounts of
+#       --owner, by default the user with the most accounts
+
+
+class Command(BaseCommand):
+    help = 'Compare AccountSerializer with the flat serialization path'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=10,
+            help='Times to serialize the full table with each path',
+        )
+        parser.add_argument(
+            '--fields',
+            help='Comma separated projection to serialize',
+        )
+        parser.add_argument(
+            '--owner',
+            help='Username whose accounts are serialized',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            fields = AccountHelper.parse_projection(options['fields'], None)
+            if options['owner'] is not None:
+                owner_id = AccountHelper.get_user_id(options['owner'])
+            else:
+                owner_id = AccountHelper.get_largest_owner_id()
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        repeat = max(options['repeat'], 1)
+
+        def serialize_model():
+            accounts = AccountHelper.apply_projection(
+                AccountHelper.get_owner_accounts(owner_id),
+                fields
+            ).order_by('id')
+            return AccountSerializer(accounts, many=True, fields=fields).data
+
+        def serialize_flat():
+            return list(AccountHelper.iterate_accounts(
+                owner_id,
+                chunk_size=2000,
+                fields=fields
+            ))
+
+        # Both paths must produce the same bytes before timing means anything
+        model_rows = serialize_model()
+        if JSONRenderer().render(model_rows) != JSONRenderer().render(
+            serialize_flat()
+        ):
+            raise CommandError("Flat serialization output differs")
+
+        row_count = len(model_rows)
+        if not row_count:
+            raise CommandError("No accounts to serialize")
+
+        results = {}
+        for name, serialize in (
+            ("AccountSerializer", serialize_model),
+            ("Flat", serialize_flat),
+        ):
+            start = time.perf_counter()
+            for _ in range(repeat):
+                serialize()
+            seconds = time.perf_counter() - start
+            results[name] = seconds
+
+            self.stdout.write("%-18s %8.3fs %12.0f rows/s" % (
+                name,
+                seconds,
+                row_count * repeat / seconds,
+            ))
+
+        self.stdout.write(self.style.SUCCESS(
+            "Flat path is %.1fx faster over %d rows x %d" % (
+                results["AccountSerializer"] / results["Flat"],
+                row_count,
+                repeat,
+            )
+        ))
@@ -0,0 +1,93 @@
+from django.core.management.base import BaseCommand, CommandError
+from utils.decryption import Decryption
+from ...helpers.export_helper import ExportHelper
+from ...models import Account
+import itertools
+import os
+import time
+
+# NOTE: To benchmark: python manage.py benchmark_decryption
+# NOTE: Decrypts the passwords already in the database, repeated up to
+#       --rows, with each worker count in --workers
+
+
+class Command(BaseCommand):
+    help = 'Measure password decryption throughput by worker process count'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rows',
+            type=int,
+            default=20000,
+            help='Passwords to decrypt per run',
+        )
+        parser.add_argument(
+            '--workers',
+            help='Comma separated worker counts, defaults to 1 up to one per core',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            workers_list = self.parse_workers(options['workers'])
+        except ValueError:
+            raise CommandError("--workers must be comma separated integers")
+
+        Decryption.allow_pool()
+        rows = max(options['rows'], 1)
+        stored = [
+            values[4] for values in ExportHelper.get_encrypted_batch(0, rows)
+        ]
+        if not stored:
+            raise CommandError("No accounts to decrypt")
+        ciphertexts = list(itertools.islice(itertools.cycle(stored), rows))
+
+        field = Account._meta.get_field('password')
+        expected = Decryption.decrypt_serial(field, ciphertexts)
+
+        results = {}
+        try:
+            for workers in workers_list:
+                # Start every worker outside the timed run
+                if workers > 1:
+                    Decryption.start_workers(workers)
+
+                start = time.perf_counter()
+                values = Decryption.decrypt_values(field, ciphertexts, workers, 0)
+                seconds = time.perf_counter() - start
+
+                if values != expected:
+                    raise CommandError(
+                        "Decryption with %d workers differs" % workers
+                    )
+                results[workers] = seconds
+
+                self.stdout.write("%3d workers %8.3fs %12.0f rows/s %6.1fx" % (
+                    workers,
+                    seconds,
+                    rows / seconds,
+                    results[workers_list[0]] / seconds,
+                ))
+        finally:
+            Decryption.shutdown()
+
+        fastest = min(results, key=results.get)
+        self.stdout.write(self.style.SUCCESS(
+            "Fastest with %d workers over %d rows (%d cores)" % (
+                fastest,
+                rows,
+                os.cpu_count() or 1,
+            )
+        ))
+
+    @staticmethod
+    def parse_workers(workers):
+        if not workers:
+            cores = os.cpu_count() or 1
+            counts = [1]
+            while counts[-1] * 2 <= cores:
+                counts.append(counts[-1] * 2)
+            if counts[-1] != cores:
+                counts.append(cores)
+            return counts
+
+        return [max(int(count), 1) for count in workers.split(",")]
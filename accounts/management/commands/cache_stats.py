@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+from utils.caching import Caching
+
+# NOTE: To show cache stats: python manage.py cache_stats
+# NOTE: Totals are kept in the shared cache backend, in dev mode (DEV_CACHE)
+#       they only cover the process running this command
+
+
+class Command(BaseCommand):
+    help = 'Show cache hit/miss, rebuild and size counters per namespace'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reset',
+            action='store_true',
+            help='Clear all counters after printing them',
+        )
+
+    def handle(self, *args, **options):
+        stats = Caching.get_stats()
+        totals = stats.get_totals()
+
+        if not totals:
+            self.stdout.write("No cache activity recorded")
+
+        for namespace, namespace_stats in totals.items():
+            self.stdout.write(self.style.MIGRATE_HEADING(namespace))
+            for name, value in namespace_stats.items():
+                self.stdout.write("  %-16s %s" % (name, value))
+
+        if options['reset']:
+            stats.reset()
+            self.stdout.write(self.style.SUCCESS("Cache stats reset"))
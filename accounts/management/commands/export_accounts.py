@@ -0,0 +1,86 @@
+from django.core.management.base import BaseCommand, CommandError
+from utils.decryption import Decryption
+from ...helpers.account_helper import AccountHelper
+from ...helpers.export_helper import ExportHelper
+import time
+
+# NOTE: To export all accounts: python manage.py export_accounts <path>
+# NOTE: The export holds plaintext passwords. Without a path it is
+#       written to stdout and progress goes to stderr
+# NOTE: --owner <username> limits the export to one user's accounts
+
+
+class Command(BaseCommand):
+    help = 'Export all accounts, passwords decrypted, as CSV or NDJSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?')
+        parser.add_argument(
+            '--format',
+            choices=tuple(ExportHelper.FORMATS),
+            help='Format of the export, defaults to the path extension or csv',
+        )
+        parser.add_argument(
+            '--owner',
+            help='Username to export the accounts of, defaults to all users',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            help='Accounts read and decrypted per query',
+        )
+
+    def handle(self, *args, **options):
+        Decryption.allow_pool()
+        path = options['path']
+        format = options['format']
+        if format is None:
+            format = path.rpartition(".")[2].lower() if path else "csv"
+        owner_id = None
+        try:
+            format = ExportHelper.get_format(format)
+            if options['owner'] is not None:
+                owner_id = AccountHelper.get_user_id(options['owner'])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        # Keep progress out of an export written to stdout
+        messages = self.stdout if path else self.stderr
+
+        exported = {"count": 0}
+
+        def on_progress(summary):
+            exported["count"] = summary["exported"]
+            messages.write("Exported %d (%.1fs, %d rows/s)" % (
+                summary["exported"],
+                summary["seconds"],
+                ExportHelper.get_rate(summary["exported"], summary["seconds"]),
+            ))
+
+        start = time.perf_counter()
+        chunks = ExportHelper.export_accounts(
+            format,
+            owner_id,
+            chunk_size=options['chunk_size'],
+            on_progress=on_progress
+        )
+
+        try:
+            if path:
+                with open(path, 'wb') as export_file:
+                    for chunk in chunks:
+                        export_file.write(chunk)
+            else:
+                for chunk in chunks:
+                    self.stdout.write(chunk.decode(), ending="")
+        except OSError as e:
+            raise CommandError(str(e))
+
+        seconds = time.perf_counter() - start
+        messages.write(self.style.SUCCESS(
+            "Exported %d accounts in %.1fs (%d rows/s)" % (
+                exported["count"],
+                seconds,
+                ExportHelper.get_rate(exported["count"], seconds),
+            )
+        ))
@@ -0,0 +1,72 @@
+from django.core.management.base import BaseCommand, CommandError
+from ...helpers.account_helper import AccountHelper
+from ...helpers.import_helper import ImportHelper
+import time
+
+# NOTE: To import an export:
+#       python manage.py import_accounts <path> --owner <username>
+# NOTE: The format is taken from the file extension unless --format is
+#       given (csv, json or ndjson)
+
+
+class Command(BaseCommand):
+    help = 'Import accounts from a CSV, JSON or NDJSON export'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument(
+            '--owner',
+            required=True,
+            help='Username of the user the accounts are imported for',
+        )
+        parser.add_argument(
+            '--format',
+            choices=ImportHelper.FORMATS,
+            help='Format of the file, defaults to its extension',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            help='Accounts written per transaction',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            format = ImportHelper.get_format(
+                options['format'],
+                options['path']
+            )
+            owner_id = AccountHelper.get_user_id(options['owner'])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        start = time.perf_counter()
+
+        def on_progress(summary):
+            self.stdout.write("Imported %d, failed %d (%.1fs)" % (
+                summary["imported"],
+                summary["failed"],
+                time.perf_counter() - start,
+            ))
+
+        try:
+            with open(options['path'], 'rb') as import_file:
+                summary = ImportHelper.import_accounts(
+                    owner_id,
+                    ImportHelper.read_records(import_file, format),
+                    batch_size=options['batch_size'],
+                    on_progress=on_progress
+                )
+        except OSError as e:
+            raise CommandError(str(e))
+
+        for error in summary["errors"]:
+            self.stderr.write("Row %d: %s" % (error["row"], error["errors"]))
+
+        self.stdout.write(self.style.SUCCESS(
+            "Imported %d accounts, %d failed, %d types created" % (
+                summary["imported"],
+                summary["failed"],
+                summary["types_created"],
+            )
+        ))
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+from ...helpers.account_helper import AccountHelper
+from ...helpers.search_helper import SearchHelper
+import time
+
+# NOTE: To rebuild the account search index: python manage.py rebuild_search_index
+# NOTE: Only needed after changing SearchHelper.FIELD_WEIGHTS or the
+#       tokenizer, saves keep the index current otherwise
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the account search token index'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Tokens written per insert',
+        )
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        count = SearchHelper.rebuild_index(batch_size=options['batch_size'])
+        # Cached search results may rank differently now
+        AccountHelper.invalidate_all_caches()
+
+        self.stdout.write(self.style.SUCCESS(
+            "Indexed %d accounts in %.3fs" % (
+                count,
+                time.perf_counter() - start,
+            )
+        ))
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+from ...helpers.account_helper import AccountHelper
+from ...helpers.count_helper import CountHelper
+import time
+
+# NOTE: To recompute the account counts behind the stats endpoint:
+#       python manage.py reconcile_account_counts
+# NOTE: Counts are kept current on every write, this is only needed
+#       after writes that bypass the helpers (raw SQL, restored dumps)
+
+
+class Command(BaseCommand):
+    help = 'Recompute the per type account counts from the accounts'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--owner',
+            help='Username to reconcile the counts of, defaults to all users',
+        )
+
+    def handle(self, *args, **options):
+        owner_id = None
+        if options['owner'] is not None:
+            try:
+                owner_id = AccountHelper.get_user_id(options['owner'])
+            except ValueError as e:
+                raise CommandError(str(e))
+
+        start = time.perf_counter()
+        corrected = CountHelper.reconcile(owner_id)
+
+        self.stdout.write(self.style.SUCCESS(
+            "Reconciled account counts in %.3fs, %d corrected" % (
+                time.perf_counter() - start,
+                corrected,
+            )
+        ))
@@ -0,0 +1,162 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from ...helpers.key_rotation_helper import KeyRotationHelper
+import os
+import time
+
+# NOTE: To rotate keys: deploy with CRYPTOGRAPHY_KEY set to the new key
+#       and CRYPTOGRAPHY_OLD_KEYS to the old one, then run
+#       python manage.py rotate_encryption_key
+# NOTE: Re-running resumes from the checkpoint. Once
+#       python manage.py rotate_encryption_key --verify reports no old,
+#       unreadable or ambiguous rows, CRYPTOGRAPHY_OLD_KEYS can be removed
+# NOTE: Ambiguous rows decrypt with more than one configured key and are
+#       never rotated, check for duplicate keys in CRYPTOGRAPHY_OLD_KEYS
+
+
+class Command(BaseCommand):
+    help = 'Re-encrypt account passwords with the current encryption key'
+
+    # Unreadable and ambiguous ids listed in the output
+    MAX_LISTED_IDS = 100
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify',
+            action='store_true',
+            help='Only report the key each password decrypts with',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            help='Account ids per transaction',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Worker processes, defaults to one per core',
+        )
+        parser.add_argument(
+            '--checkpoint',
+            default=settings.CRYPTOGRAPHY_ROTATION_CHECKPOINT,
+            help='File recording finished batches',
+        )
+        parser.add_argument(
+            '--restart',
+            action='store_true',
+            help='Ignore the checkpoint and rotate every batch',
+        )
+
+    def handle(self, *args, **options):
+        if options['verify']:
+            return self.verify(options)
+
+        if not settings.CRYPTOGRAPHY_OLD_KEYS:
+            raise CommandError(
+                "Set CRYPTOGRAPHY_OLD_KEYS to the keys being rotated out"
+            )
+
+        path = options['checkpoint']
+        checkpoint = None
+        if not options['restart']:
+            checkpoint = KeyRotationHelper.load_checkpoint(path)
+        if checkpoint is None:
+            checkpoint = KeyRotationHelper.new_checkpoint(
+                options['batch_size']
+                or settings.CRYPTOGRAPHY_ROTATION_BATCH_SIZE
+            )
+        elif checkpoint["done"]:
+            self.stdout.write(
+                "Resuming, %d batches already rotated" % len(checkpoint["done"])
+            )
+
+        done = set(checkpoint["done"])
+        ranges = [
+            id_range
+            for id_range in KeyRotationHelper.get_id_ranges(
+                checkpoint["batch_size"]
+            )
+            if id_range[0] not in done
+        ]
+
+        totals = {"rotated": 0, "current": 0, "failed": [], "ambiguous": []}
+        start = time.perf_counter()
+        for result in KeyRotationHelper.run_ranges(
+            "rotate_range",
+            ranges,
+            KeyRotationHelper.get_write_workers(options['workers'])
+        ):
+            totals["rotated"] += result["rotated"]
+            totals["current"] += result["current"]
+            totals["failed"] += result["failed"]
+            totals["ambiguous"] += result["ambiguous"]
+
+            # Ranges with unreadable rows are retried on the next run
+            if not result["failed"] and not result["ambiguous"]:
+                checkpoint["done"].append(result["start"])
+                KeyRotationHelper.save_checkpoint(path, checkpoint)
+
+            self.stdout.write("Rotated %d, already current %d (%.1fs)" % (
+                totals["rotated"],
+                totals["current"],
+                time.perf_counter() - start,
+            ))
+
+        self.report_failed(totals["failed"], totals["ambiguous"])
+        if totals["failed"] or totals["ambiguous"]:
+            raise CommandError(
+                "%d passwords could not be decrypted with any key, %d with"
+                " more than one" % (
+                    len(totals["failed"]),
+                    len(totals["ambiguous"]),
+                )
+            )
+
+        KeyRotationHelper.delete_checkpoint(path)
+        self.stdout.write(self.style.SUCCESS(
+            "Rotated %d passwords, %d already current (%.1fs)" % (
+                totals["rotated"],
+                totals["current"],
+                time.perf_counter() - start,
+            )
+        ))
+
+    def verify(self, options):
+        totals = {"current": 0, "old": 0, "failed": [], "ambiguous": []}
+        start = time.perf_counter()
+        for result in KeyRotationHelper.run_ranges(
+            "verify_range",
+            KeyRotationHelper.get_id_ranges(
+                options['batch_size']
+                or settings.CRYPTOGRAPHY_ROTATION_BATCH_SIZE
+            ),
+            options['workers']
+        ):
+            totals["current"] += result["current"]
+            totals["old"] += result["old"]
+            totals["failed"] += result["failed"]
+            totals["ambiguous"] += result["ambiguous"]
+
+        self.report_failed(totals["failed"], totals["ambiguous"])
+        summary = (
+            "%d on the current key, %d on old keys, %d unreadable,"
+            " %d ambiguous (%.1fs)" % (
+                totals["current"],
+                totals["old"],
+                len(totals["failed"]),
+                len(totals["ambiguous"]),
+                time.perf_counter() - start,
+            )
+        )
+        if totals["failed"] or totals["ambiguous"]:
+            raise CommandError(summary)
+        self.stdout.write(self.style.SUCCESS(summary))
+
+    def report_failed(self, failed_ids, ambiguous_ids):
+        for id in sorted(failed_ids)[:self.MAX_LISTED_IDS]:
+            self.stderr.write("Account %d: password does not decrypt" % id)
+        for id in sorted(ambiguous_ids)[:self.MAX_LISTED_IDS]:
+            self.stderr.write(
+                "Account %d: password decrypts with more than one key" % id
+            )
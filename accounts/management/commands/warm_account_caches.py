@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+from ...helpers.cache_helper import CacheHelper
+import logging
+
+logger = logging.getLogger(__name__)
+
+# NOTE: To warm caches: python manage.py warm_account_caches
+# NOTE: Only useful across processes when DEV_CACHE is disabled, the dev
+#       cache lives in each process's memory
+
+
+class Command(BaseCommand):
+    help = 'Pre-populate the account and type caches'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Rebuild entries even if they are already cached',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            timings = CacheHelper.warm_caches(force=options['force'])
+        except Exception as e:
+            logger.error(str(e))
+            raise CommandError("Cache warm-up failed: " + str(e))
+
+        for key, seconds in timings:
+            self.stdout.write("Warmed %s in %.3fs" % (key, seconds))
+
+        total = sum(seconds for key, seconds in timings)
+        logger.info("Cache warm-up finished in %.3fs" % total)
+        self.stdout.write(
+            self.style.SUCCESS("Cache warm-up finished in %.3fs" % total)
+        )
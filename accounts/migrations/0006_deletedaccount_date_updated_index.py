@@ -0,0 +1,26 @@
+# Generated by Django 4.2.5 on 2026-10-18 12:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0005_alter_type_name'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeletedAccount',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('account_id', models.IntegerField()),
+                ('date_deleted', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='account',
+            name='date_updated',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+    ]
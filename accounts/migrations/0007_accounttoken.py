@@ -0,0 +1,83 @@
+# Generated by Django 4.2.5 on 2026-10-18 12:26
+
+from django.db import migrations, models
+import django.db.models.deletion
+import re
+
+# Weights and tokenizer at the time of this migration, see
+# SearchHelper.FIELD_WEIGHTS and utils/search.py
+FIELD_WEIGHTS = {
+    "company": 3,
+    "username": 3,
+    "email": 3,
+    "website": 2,
+    "description": 1,
+}
+
+MAX_TOKEN_LENGTH = 64
+
+re_token = re.compile(r"[^\W_]+")
+
+
+def tokenize(text):
+    if not text:
+        return []
+
+    return [
+        token[:MAX_TOKEN_LENGTH] for token in re_token.findall(text.lower())
+    ]
+
+
+def get_weighted_tokens(values, weights):
+    token_weights = {}
+    for field_name, weight in weights.items():
+        for token in set(tokenize(values.get(field_name))):
+            token_weights[token] = token_weights.get(token, 0) + weight
+
+    return token_weights
+
+
+def index_accounts(apps, schema_editor):
+    Account = apps.get_model('accounts', 'Account')
+    AccountToken = apps.get_model('accounts', 'AccountToken')
+    db_alias = schema_editor.connection.alias
+
+    batch = []
+    accounts = Account.objects.using(db_alias).only(*FIELD_WEIGHTS)
+    for account in accounts.iterator(chunk_size=1000):
+        token_weights = get_weighted_tokens(
+            {name: getattr(account, name) for name in FIELD_WEIGHTS},
+            FIELD_WEIGHTS
+        )
+        batch += [
+            AccountToken(account_id=account.id, token=token, weight=weight)
+            for token, weight in token_weights.items()
+        ]
+        if len(batch) >= 1000:
+            AccountToken.objects.using(db_alias).bulk_create(batch)
+            batch = []
+
+    AccountToken.objects.using(db_alias).bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0006_deletedaccount_date_updated_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AccountToken',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(max_length=64)),
+                ('weight', models.PositiveSmallIntegerField()),
+                ('account', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tokens', to='accounts.account')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['token', 'account'], name='accounts_ac_token_fd6386_idx')],
+            },
+        ),
+        migrations.RunPython(index_accounts, migrations.RunPython.noop),
+    ]
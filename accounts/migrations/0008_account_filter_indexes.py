@@ -0,0 +1,54 @@
+# Generated by Django 4.2.5 on 2026-10-18 12:28
+
+from django.db import migrations, models
+
+
+def set_email_domains(apps, schema_editor):
+    Account = apps.get_model('accounts', 'Account')
+    db_alias = schema_editor.connection.alias
+
+    accounts = Account.objects.using(db_alias).filter(
+        email__contains='@'
+    ).only('email')
+    batch = []
+    for account in accounts.iterator(chunk_size=1000):
+        account.email_domain = account.email.rpartition('@')[2].lower()
+        batch.append(account)
+        if len(batch) >= 1000:
+            Account.objects.using(db_alias).bulk_update(batch, ['email_domain'])
+            batch = []
+
+    Account.objects.using(db_alias).bulk_update(batch, ['email_domain'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0007_accounttoken'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='account',
+            name='email_domain',
+            field=models.CharField(blank=True, db_index=True, max_length=254),
+        ),
+        migrations.AlterField(
+            model_name='account',
+            name='date_created',
+            field=models.DateTimeField(auto_now_add=True, db_index=True),
+        ),
+        migrations.AddIndex(
+            model_name='account',
+            index=models.Index(fields=['email'], name='accounts_ac_email_b00920_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='account',
+            index=models.Index(fields=['company'], name='accounts_ac_company_500810_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='account',
+            index=models.Index(fields=['type', 'date_updated'], name='accounts_ac_type_id_c5c130_idx'),
+        ),
+        migrations.RunPython(set_email_domains, migrations.RunPython.noop),
+    ]
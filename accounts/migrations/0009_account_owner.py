@@ -0,0 +1,31 @@
+# Generated by Django 4.2.5 on 2026-10-18 12:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0008_account_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='account',
+            name='owner_id',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='deletedaccount',
+            name='owner_id',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='account',
+            index=models.Index(fields=['owner_id', 'id'], name='accounts_ac_owner_i_8dda71_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='deletedaccount',
+            index=models.Index(fields=['owner_id', 'date_deleted'], name='accounts_de_owner_i_e19500_idx'),
+        ),
+    ]
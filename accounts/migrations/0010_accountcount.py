@@ -0,0 +1,26 @@
+# Generated by Django 4.2.5 on 2026-10-18 12:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0009_account_owner'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AccountCount',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('owner_id', models.IntegerField()),
+                ('type_id', models.IntegerField()),
+                ('count', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='accountcount',
+            constraint=models.UniqueConstraint(fields=('owner_id', 'type_id'), name='unique_account_count'),
+        ),
+    ]
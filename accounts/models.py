@@ -17,7 +17,75 @@ class Account(models.Model):
     description = models.TextField(blank=True)
     type = models.ForeignKey(Type, null=True, on_delete=models.SET_NULL)
 
-    date_created = models.DateTimeField(auto_now_add=True)
-    date_updated = models.DateTimeField(auto_now=True)
+    # Id of the owning auth User. Users live in auth_db, so this cannot
+    # be a foreign key. Null for accounts created before ownership (see
+    # manage.py assign_account_owner).
+    owner_id = models.IntegerField(null=True, blank=True)
+
+    # Domain part of email, kept by a pre_save signal for filtering
+    email_domain = models.CharField(max_length=254, blank=True, db_index=True)
+
+    date_created = models.DateTimeField(auto_now_add=True, db_index=True)
+    date_updated = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['owner_id', 'id']),
+            models.Index(fields=['email']),
+            models.Index(fields=['company']),
+            models.Index(fields=['type', 'date_updated']),
+        ]
+
+# -------------------------------------------------------------------------------
+
+
+# Tombstone of a deleted account, read by delta sync clients
+class DeletedAccount(models.Model):
+    account_id = models.IntegerField()
+    owner_id = models.IntegerField(null=True, blank=True)
+    date_deleted = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['owner_id', 'date_deleted']),
+        ]
+
+# -------------------------------------------------------------------------------
+
+
+# Search index, one row per distinct token of an account's searchable
+# fields (see SearchHelper)
+class AccountToken(models.Model):
+    account = models.ForeignKey(
+        Account,
+        on_delete=models.CASCADE,
+        related_name='tokens'
+    )
+    token = models.CharField(max_length=64)
+    weight = models.PositiveSmallIntegerField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['token', 'account']),
+        ]
+
+# -------------------------------------------------------------------------------
+
+
+# Number of accounts an owner has of a type, kept up to date on account
+# writes (see CountHelper). type_id is 0 for accounts without a type,
+# since unique constraints treat nulls as distinct.
+class AccountCount(models.Model):
+    owner_id = models.IntegerField()
+    type_id = models.IntegerField()
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['owner_id', 'type_id'],
+                name='unique_account_count'
+            ),
+        ]
 
 # -------------------------------------------------------------------------------
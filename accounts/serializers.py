@@ -4,29 +4,160 @@ from .models import (
     Account,
     Type
 )
+from .type_registry import TypeRegistry
 
 # -------------------------------------------------------------------------------
 
 
+class MaskedPasswordField(serializers.CharField):
+    '''
+    Writable password that is never read back. Outputs a fixed mask
+    without touching the instance, so the encrypted column does not
+    need to be loaded or decrypted. See RevealAccountPassword.
+    '''
+
+    MASK = "********"
+
+    def get_attribute(self, instance):
+        return self.MASK
+
+    def to_representation(self, value):
+        return self.MASK
+
+
+class TypeField(serializers.Field):
+    '''
+    Account type, written as a type id or name and read as the id.
+    Both resolve through TypeRegistry, so neither loads the type.
+    Strings of digits are taken as ids.
+    '''
+
+    default_error_messages = {
+        'does_not_exist': 'Invalid pk "{pk_value}" - object does not exist.',
+        'name_does_not_exist': (
+            'Invalid type name "{name}" - object does not exist.'
+        ),
+        'incorrect_type': (
+            'Incorrect type. Expected pk value or name, received {data_type}.'
+        ),
+    }
+
+    def get_attribute(self, instance):
+        return instance.type_id
+
+    def to_representation(self, value):
+        return value
+
+    def run_validation(self, data=serializers.empty):
+        # As RelatedField, form data sends no type as an empty string
+        if data == '':
+            data = None
+        return super().run_validation(data)
+
+    def to_internal_value(self, data):
+        if isinstance(data, str) and not data.strip().isdigit():
+            type_id = TypeRegistry.get_id(data)
+            if type_id is None:
+                self.fail('name_does_not_exist', name=data)
+            return TypeRegistry.get_instance(type_id)
+
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            type_id = int(data)
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+
+        instance = TypeRegistry.get_instance(type_id)
+        if instance is None:
+            self.fail('does_not_exist', pk_value=data)
+        return instance
+
+
+class TypeNameField(serializers.Field):
+    '''
+    Read-only name of the account type, from TypeRegistry. Looked up in
+    type_names when set, which AccountListSerializer does once for all
+    rows.
+    '''
+
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+        self.type_names = None
+
+    def get_attribute(self, instance):
+        return instance.type_id
+
+    def to_representation(self, value):
+        if self.type_names is None or value is None:
+            return TypeRegistry.get_name(value)
+
+        name = self.type_names.get(value)
+        if name is None:
+            # Type created since, reload the registry once
+            name = TypeRegistry.get_name(value)
+            self.type_names = TypeRegistry.get_names()
+        return name
+
+# -------------------------------------------------------------------------------
+
+
+class AccountListSerializer(serializers.ListSerializer):
+    '''
+    Resolves the type names once for the whole list instead of once per
+    row.
+    '''
+
+    def to_representation(self, data):
+        type_name_field = self.child.fields.get('type_name')
+        if type_name_field is None:
+            return super().to_representation(data)
+
+        type_name_field.type_names = TypeRegistry.get_names()
+        try:
+            return super().to_representation(data)
+        finally:
+            type_name_field.type_names = None
+
+
 class AccountSerializer(serializers.ModelSerializer):
-    type_name = serializers.SlugRelatedField(
-        source='type',
-        slug_field='name',
-        read_only=True
-    )
+    type_name = TypeNameField()
 
     class Meta:
         model = Account
-        fields = '__all__'
+        exclude = ('email_domain', 'owner_id')
+        list_serializer_class = AccountListSerializer
+
+    def __init__(self, *args, **kwargs):
+        # Optional subset of fields to output, None for all
+        fields = kwargs.pop('fields', None)
+        super().__init__(*args, **kwargs)
+
+        if fields is not None:
+            for field_name in set(self.fields) - set(fields):
+                self.fields.pop(field_name)
+
+    def get_fields(self):
+        fields = super().get_fields()
+        # Replaced in place to keep the field order
+        fields['password'] = MaskedPasswordField(max_length=254)
+        fields['type'] = TypeField(required=False, allow_null=True)
+        return fields
 
     def to_representation(self, instance):
         representation = super().to_representation(instance)
-        representation['date_created'] = Formatting.format_date(instance.date_created)
-        representation['date_updated'] = Formatting.format_date(instance.date_updated)
+        for field_name in ('date_created', 'date_updated'):
+            if field_name in representation:
+                representation[field_name] = Formatting.format_date(
+                    getattr(instance, field_name)
+                )
         return representation
 
 
 class AccountUpdateSerializer(serializers.ModelSerializer):
+    type = TypeField(required=False, allow_null=True)
+
     class Meta:
         model = Account
         fields = (
@@ -39,6 +170,84 @@ class AccountUpdateSerializer(serializers.ModelSerializer):
             'type',
         )
 
+    def get_fields(self):
+        fields = super().get_fields()
+        # Update responses mask the password like every other read
+        fields['password'] = MaskedPasswordField(
+            max_length=254,
+            required=False
+        )
+        return fields
+
+
+class FlatAccountSerializer():
+    '''
+    Read-only fast path producing the same rows as AccountSerializer
+    from .values_list() tuples. Each output field is a column index plus
+    an optional conversion worked out once, so no field objects run per
+    row, type names come from a type id -> name map and dates skip
+    strftime. Any change to AccountSerializer output must be mirrored
+    here (see test_serializers).
+    '''
+
+    # Output field -> model column read for it
+    COLUMNS = {
+        'id': 'id',
+        'type_name': 'type_id',
+        'email': 'email',
+        'username': 'username',
+        'password': None,
+        'company': 'company',
+        'website': 'website',
+        'description': 'description',
+        'date_created': 'date_created',
+        'date_updated': 'date_updated',
+        'type': 'type_id',
+    }
+
+    def __init__(self, fields, type_names=None):
+        '''
+        fields: output fields in AccountSerializer order
+        type_names: type id -> name, needed when type_name is output
+        '''
+
+        self.fields = fields
+        self.type_names = type_names or {}
+
+        # id first so callers can always find the row id
+        self.columns = ['id']
+        self._plan = []
+        for field_name in fields:
+            column = self.COLUMNS[field_name]
+            if column is not None and column not in self.columns:
+                self.columns.append(column)
+
+            index = self.columns.index(column) if column else None
+            self._plan.append(
+                (field_name, index, self._get_conversion(field_name))
+            )
+
+    def _get_conversion(self, field_name):
+        if field_name == 'type_name':
+            return self.type_names.get
+        if field_name == 'password':
+            return lambda value: MaskedPasswordField.MASK
+        if field_name in ('date_created', 'date_updated'):
+            return Formatting.format_date_fast
+        return None
+
+    def to_representation(self, values):
+        representation = {}
+        for field_name, index, convert in self._plan:
+            value = values[index] if index is not None else None
+            if convert is not None and (value is not None or index is None):
+                value = convert(value)
+            representation[field_name] = value
+        return representation
+
+    def to_representation_many(self, rows):
+        return [self.to_representation(values) for values in rows]
+
 # -------------------------------------------------------------------------------
 
 
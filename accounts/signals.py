@@ -0,0 +1,72 @@
+from django.db.models.signals import (
+    post_delete,
+    post_save,
+    pre_delete,
+    pre_save,
+)
+from django.dispatch import receiver
+from .helpers.account_helper import AccountHelper
+from .helpers.count_helper import CountHelper
+from .helpers.search_helper import SearchHelper
+from .models import Account, Type
+from .type_registry import TypeRegistry
+
+# -------------------------------------------------------------------------------
+
+
+@receiver(pre_save, sender=Account)
+def set_email_domain(sender, instance, **kwargs):
+    # Also runs for raw saves (loaddata), unlike Account.save()
+    instance.email_domain = AccountHelper.get_email_domain(instance.email)
+
+
+@receiver(post_save, sender=Account)
+def index_account(sender, instance, using, update_fields=None, **kwargs):
+    # Keep the search index in step with every saved account. Deleted
+    # accounts lose their tokens through the cascade.
+    if update_fields is not None and not (
+        set(update_fields) & set(SearchHelper.FIELD_WEIGHTS)
+    ):
+        return
+
+    SearchHelper.index_account(instance, using=using)
+
+
+@receiver(pre_save, sender=Account)
+def load_count_key(sender, instance, using, update_fields=None, **kwargs):
+    # The stored owner and type, to move an updated account between
+    # counts. Skipped for saves that cannot change either.
+    instance._stored_count_key = None
+    if instance.pk is None or (
+        update_fields is not None
+        and not set(update_fields) & {'owner_id', 'type', 'type_id'}
+    ):
+        return
+
+    instance._stored_count_key = Account.objects.using(using).filter(
+        pk=instance.pk
+    ).values_list('owner_id', 'type_id').first()
+
+
+@receiver(post_save, sender=Account)
+def update_counts(sender, instance, created, **kwargs):
+    # Bulk writes and deletes update counts through CountHelper directly
+    current = (instance.owner_id, instance.type_id)
+    if created:
+        CountHelper.record_change(None, current)
+    elif instance._stored_count_key not in (None, current):
+        CountHelper.record_change(instance._stored_count_key, current)
+
+
+@receiver(pre_delete, sender=Type)
+def clear_type_counts(sender, instance, **kwargs):
+    # Runs in the delete's transaction, before accounts of the type are
+    # set to null
+    CountHelper.clear_type(instance.id)
+
+
+@receiver(post_save, sender=Type)
+@receiver(post_delete, sender=Type)
+def clear_type_registry(sender, using, **kwargs):
+    # Other processes reload once the commit bumps the types generation
+    TypeRegistry.clear(using=using)
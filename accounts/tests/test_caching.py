@@ -0,0 +1,349 @@
+from django.test import SimpleTestCase, override_settings
+from utils.broadcast import InvalidationBroadcast
+from utils.caching import Caching, LocalCache
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+# NOTE: Test command: python manage.py test accounts.tests.test_caching
+# NOTE: To run all test modules: python manage.py run_accounts_tests
+
+PROD_CACHE_SETTINGS = {
+    "DEV_CACHE": False,
+    "SHARED_CACHE_ALIAS": "shared",
+    "LOCAL_CACHE_MAX_ENTRIES": 4,
+    "LOCAL_CACHE_MAX_BYTES": 1024 * 1024,
+    "LOCAL_CACHE_TIMEOUT": 60,
+    "CACHE_BROADCAST_DIR": None,
+    "LOCAL_GENERATION_TIMEOUT": 5,
+    "CACHE_STALE_TIMEOUT": 60,
+    "CACHE_REBUILD_LOCK_TIMEOUT": 30,
+    "CACHE_REBUILD_WAIT_TIMEOUT": 0.2,
+    "CACHE_REBUILD_POLL_INTERVAL": 0.01,
+    "CACHES": {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "test-default",
+        },
+        "shared": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "test-shared",
+        },
+    },
+}
+
+
+class LocalCacheTests(SimpleTestCase):
+
+    def test_evicts_least_recently_used_entry(self):
+        local_cache = LocalCache(max_entries=2, max_bytes=1024, timeout=60)
+        local_cache.set("a", 1, size=1)
+        local_cache.set("b", 2, size=1)
+        local_cache.get("a")
+        local_cache.set("c", 3, size=1)
+
+        self.assertEqual(local_cache.get("a"), 1)
+        self.assertIsNone(local_cache.get("b"))
+        self.assertEqual(local_cache.get("c"), 3)
+
+    def test_evicts_when_byte_limit_exceeded(self):
+        local_cache = LocalCache(max_entries=10, max_bytes=10, timeout=60)
+        local_cache.set("a", 1, size=6)
+        local_cache.set("b", 2, size=6)
+
+        self.assertIsNone(local_cache.get("a"))
+        self.assertEqual(local_cache.get("b"), 2)
+        self.assertFalse(local_cache.set("c", 3, size=11))
+
+    def test_delete_prefix(self):
+        local_cache = LocalCache(max_entries=10, max_bytes=1024, timeout=60)
+        local_cache.set("accounts:g1", 1, size=1)
+        local_cache.set("types:g1", 2, size=1)
+        local_cache.delete_prefix("accounts:")
+
+        self.assertIsNone(local_cache.get("accounts:g1"))
+        self.assertEqual(local_cache.get("types:g1"), 2)
+
+    def test_expired_entry_is_dropped(self):
+        local_cache = LocalCache(max_entries=10, max_bytes=1024, timeout=60)
+        local_cache.set("a", 1, size=1, timeout=-1)
+
+        self.assertIsNone(local_cache.get("a"))
+
+# -------------------------------------------------------------------------------
+
+
+@override_settings(**PROD_CACHE_SETTINGS)
+class ProdCachingTests(SimpleTestCase):
+
+    def setUp(self):
+        Caching.reset_local_cache()
+        Caching.get_shared_cache().clear()
+
+    def tearDown(self):
+        Caching.reset_local_cache()
+
+    # ----------------------------------------------------------------------------
+
+    def test_set_and_get_value(self):
+        self.assertTrue(Caching.set_cache_value("accounts", [{"id": 1}]))
+        self.assertEqual(Caching.get_cache_value("accounts"), [{"id": 1}])
+
+    def test_get_falls_back_to_shared_tier(self):
+        Caching.set_cache_value("accounts", [{"id": 1}])
+        Caching.reset_local_cache()
+
+        stored_key = "accounts:g" + str(Caching.get_cache_generation("accounts"))
+
+        self.assertEqual(Caching.get_cache_value("accounts"), [{"id": 1}])
+        self.assertEqual(
+            Caching.get_local_cache().get(stored_key),
+            [{"id": 1}]
+        )
+
+    def test_delete_value_keeps_previous_value_only(self):
+        Caching.set_cache_value("accounts", [{"id": 1}])
+        Caching.delete_cache_value("accounts")
+
+        self.assertIsNone(Caching.get_cache_value("accounts"))
+        self.assertEqual(
+            Caching.get_previous_cache_value("accounts"),
+            [{"id": 1}]
+        )
+
+    def test_other_process_invalidation_is_seen(self):
+        Caching.set_cache_value("accounts", [{"id": 1}])
+        # Another process bumps the shared generation counter
+        Caching.get_shared_cache().incr("generation:accounts")
+
+        self.assertIsNone(Caching.get_cache_value("accounts"))
+
+    def test_delete_value_invalidates_namespace(self):
+        Caching.set_cache_value("accounts:no-email:abc", True)
+        Caching.set_cache_value("types", [{"id": 1}])
+        Caching.delete_cache_value("accounts")
+
+        self.assertIsNone(Caching.get_cache_value("accounts:no-email:abc"))
+        self.assertEqual(Caching.get_cache_value("types"), [{"id": 1}])
+
+    def test_delete_value_keeps_other_partitions(self):
+        first_key = Caching.partition_key("accounts:rows", 1)
+        second_key = Caching.partition_key("accounts:rows", 2)
+        Caching.set_cache_value(first_key, [{"id": 1}])
+        Caching.set_cache_value(second_key, [{"id": 2}])
+        Caching.delete_cache_value(Caching.partition_key("accounts", 1))
+
+        self.assertEqual(first_key, "accounts@1:rows")
+        self.assertIsNone(Caching.get_cache_value(first_key))
+        self.assertEqual(Caching.get_cache_value(second_key), [{"id": 2}])
+        self.assertEqual(Caching.get_stats_namespace(second_key), "accounts")
+
+    # ----------------------------------------------------------------------------
+
+    def test_patch_value_updates_cached_copy(self):
+        Caching.set_cache_value("accounts", [{"id": 1}])
+
+        patched = Caching.patch_cache_value(
+            "accounts",
+            lambda data: data + [{"id": 2}]
+        )
+
+        self.assertTrue(patched)
+        self.assertEqual(
+            Caching.get_cache_value("accounts"),
+            [{"id": 1}, {"id": 2}]
+        )
+
+    def test_patch_without_cached_value_is_noop(self):
+        patched = Caching.patch_cache_value(
+            "accounts",
+            lambda data: data + [{"id": 2}]
+        )
+
+        self.assertFalse(patched)
+        self.assertIsNone(Caching.get_cache_value("accounts"))
+
+    def test_stale_rebuild_is_not_served(self):
+        generation = Caching.get_cache_generation("accounts")
+        Caching.delete_cache_value("accounts")
+
+        Caching.set_cache_value(
+            "accounts",
+            [{"id": 1}],
+            generation=generation
+        )
+
+        self.assertIsNone(Caching.get_cache_value("accounts"))
+
+    def test_concurrent_patch_falls_back_to_invalidation(self):
+        Caching.set_cache_value("accounts", [{"id": 1}])
+
+        def concurrent_patch(data):
+            # Another writer bumps the generation while this patch runs
+            Caching.delete_cache_value("accounts")
+            return data + [{"id": 2}]
+
+        Caching.patch_cache_value("accounts", concurrent_patch)
+
+        self.assertIsNone(Caching.get_cache_value("accounts"))
+
+    def test_patch_invalidates_when_increment_fails(self):
+        Caching.set_cache_value("accounts", [{"id": 1}])
+
+        with mock.patch.object(Caching, "_incr_counter", return_value=None):
+            patched = Caching.patch_cache_value(
+                "accounts",
+                lambda data: data + [{"id": 2}]
+            )
+
+        self.assertFalse(patched)
+        self.assertNotEqual(
+            Caching.get_cache_value("accounts"),
+            [{"id": 1}, {"id": 2}]
+        )
+
+    def test_patch_invalidates_without_atomic_increment(self):
+        with tempfile.TemporaryDirectory() as location:
+            file_caches = dict(PROD_CACHE_SETTINGS["CACHES"])
+            file_caches["shared"] = {
+                "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+                "LOCATION": location,
+            }
+            with override_settings(CACHES=file_caches):
+                Caching.reset_local_cache()
+                Caching.set_cache_value("accounts", [{"id": 1}])
+
+                patched = Caching.patch_cache_value(
+                    "accounts",
+                    lambda data: data + [{"id": 2}]
+                )
+
+                self.assertFalse(Caching.has_atomic_incr())
+                self.assertFalse(patched)
+                self.assertIsNone(Caching.get_cache_value("accounts"))
+
+    # ----------------------------------------------------------------------------
+
+    def test_concurrent_rebuilds_run_once(self):
+        builds = []
+
+        def build():
+            builds.append(1)
+            time.sleep(0.05)
+            return [{"id": 1}]
+
+        results = []
+        threads = [
+            threading.Thread(
+                target=lambda: results.append(
+                    Caching.get_or_build_cache_value("accounts", build)
+                )
+            )
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(builds), 1)
+        self.assertEqual(results, [[{"id": 1}]] * 5)
+
+    @override_settings(CACHE_REBUILD_WAIT_TIMEOUT=5)
+    def test_rebuild_of_new_generation_is_not_locked_out(self):
+        Caching.get_or_build_cache_value("accounts", lambda: [{"id": 1}])
+        Caching.delete_cache_value("accounts")
+
+        start = time.monotonic()
+        value = Caching.get_or_build_cache_value(
+            "accounts",
+            lambda: [{"id": 2}]
+        )
+
+        self.assertEqual(value, [{"id": 2}])
+        self.assertLess(time.monotonic() - start, 1)
+
+    def test_waiter_is_served_previous_value(self):
+        Caching.set_cache_value("accounts", [{"id": 1}])
+        Caching.delete_cache_value("accounts")
+        # Simulate another worker holding the rebuild lock
+        Caching._acquire_lock(
+            "accounts",
+            Caching.get_cache_generation("accounts")
+        )
+
+        value = Caching.get_or_build_cache_value(
+            "accounts",
+            lambda: [{"id": 2}]
+        )
+
+        self.assertEqual(value, [{"id": 1}])
+
+    def test_waiter_rebuilds_without_previous_value(self):
+        Caching._acquire_lock(
+            "accounts",
+            Caching.get_cache_generation("accounts")
+        )
+
+        value = Caching.get_or_build_cache_value(
+            "accounts",
+            lambda: [{"id": 2}]
+        )
+
+        self.assertEqual(value, [{"id": 2}])
+
+# -------------------------------------------------------------------------------
+
+
+@unittest.skipUnless(
+    InvalidationBroadcast.is_supported(),
+    "unix sockets not available"
+)
+class InvalidationBroadcastTests(SimpleTestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.received = threading.Event()
+        self.messages = []
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def on_message(self, message):
+        self.messages.append(message)
+        self.received.set()
+
+    # ----------------------------------------------------------------------------
+
+    def test_message_reaches_other_listener(self):
+        sender = InvalidationBroadcast(
+            self.directory.name, lambda message: None, name="sender"
+        )
+        receiver = InvalidationBroadcast(
+            self.directory.name, self.on_message, name="receiver"
+        )
+        receiver.start()
+
+        sender.publish("accounts")
+
+        self.assertTrue(self.received.wait(timeout=5))
+        self.assertEqual(self.messages, ["accounts"])
+
+    def test_received_invalidation_drops_local_generation(self):
+        with override_settings(**{
+            **PROD_CACHE_SETTINGS,
+            "CACHE_BROADCAST_DIR": self.directory.name,
+        }):
+            Caching.reset_local_cache()
+            Caching.get_shared_cache().clear()
+            Caching.set_cache_value("accounts", [{"id": 1}])
+
+            # Another process bumps the generation and announces it
+            Caching.get_shared_cache().incr("generation:accounts")
+            self.assertEqual(Caching.get_cache_value("accounts"), [{"id": 1}])
+            Caching._receive_invalidation("accounts")
+
+            self.assertIsNone(Caching.get_cache_value("accounts"))
+            Caching.reset_local_cache()
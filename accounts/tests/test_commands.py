@@ -0,0 +1,280 @@
+from django.test import TestCase
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db.models import BinaryField, Value
+from io import StringIO
+from utils.keyring import KeyRing
+from ..helpers.account_helper import AccountHelper
+from ..helpers.cache_helper import CacheHelper
+from ..helpers.key_rotation_helper import KeyRotationHelper
+from ..helpers.search_helper import SearchHelper
+from ..models import Account, AccountCount
+import json
+import os
+import pickle
+import tempfile
+
+# NOTE: Test command: python manage.py test accounts.tests.test_commands
+# NOTE: To run all test modules: python manage.py run_accounts_tests
+
+
+class CommandTests(TestCase):
+    databases = "__all__"
+    fixtures = [
+        "accounts/tests/fixtures/types.json",
+        "accounts/tests/fixtures/accounts.json"
+    ]
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username="testuser",
+            password="testpassword"
+        )
+        AccountHelper.assign_owner(self.user.id)
+
+    # ----------------------------------------------------------------------------
+
+    def test_warm_account_caches(self):
+        out = StringIO()
+        call_command("warm_account_caches", stdout=out)
+
+        self.assertIn(
+            "Warmed accounts@" + str(self.user.id) + " in",
+            out.getvalue()
+        )
+        self.assertIn("Warmed types:rendered in", out.getvalue())
+        with self.assertNumQueries(0, using="account_information"):
+            CacheHelper.get_rendered_accounts(self.user.id)
+            CacheHelper.get_types()
+
+    # ----------------------------------------------------------------------------
+
+    def test_cache_stats(self):
+        CacheHelper.get_accounts(self.user.id)
+        CacheHelper.get_accounts(self.user.id)
+        out = StringIO()
+
+        call_command("cache_stats", "--reset", stdout=out)
+
+        self.assertIn("accounts", out.getvalue())
+        self.assertIn("hit_ratio", out.getvalue())
+        self.assertIn("Cache stats reset", out.getvalue())
+
+    # ----------------------------------------------------------------------------
+
+    def test_benchmark_account_serialization(self):
+        out = StringIO()
+        call_command(
+            "benchmark_account_serialization",
+            "--repeat=1",
+            stdout=out
+        )
+
+        self.assertIn("AccountSerializer", out.getvalue())
+        self.assertIn("Flat path is", out.getvalue())
+
+    # ----------------------------------------------------------------------------
+
+    def test_benchmark_decryption(self):
+        out = StringIO()
+        call_command(
+            "benchmark_decryption",
+            "--rows=100",
+            "--workers=1,2",
+            stdout=out
+        )
+
+        self.assertIn("  2 workers", out.getvalue())
+        self.assertIn("Fastest with", out.getvalue())
+
+    # ----------------------------------------------------------------------------
+
+    def test_assign_account_owner(self):
+        Account.objects.filter(id__in=[5, 6]).update(owner_id=None)
+        out = StringIO()
+
+        call_command("assign_account_owner", "testuser", stdout=out)
+
+        self.assertIn("Assigned 2 accounts to testuser", out.getvalue())
+        self.assertEqual(
+            Account.objects.filter(owner_id=self.user.id).count(),
+            6
+        )
+        with self.assertRaisesMessage(CommandError, "unknown user: nobody"):
+            call_command("assign_account_owner", "nobody")
+
+    # ----------------------------------------------------------------------------
+
+    def test_reconcile_account_counts(self):
+        AccountCount.objects.filter(type_id=1).update(count=10)
+        AccountCount.objects.create(owner_id=self.user.id, type_id=4, count=1)
+        out = StringIO()
+
+        call_command("reconcile_account_counts", stdout=out)
+
+        self.assertIn("2 corrected", out.getvalue())
+        self.assertEqual(
+            dict(AccountCount.objects.values_list('type_id', 'count')),
+            {0: 3, 1: 2, 2: 1}
+        )
+
+    # ----------------------------------------------------------------------------
+
+    def test_rebuild_search_index(self):
+        out = StringIO()
+        call_command("rebuild_search_index", stdout=out)
+
+        self.assertIn("Indexed 6 accounts", out.getvalue())
+        self.assertEqual(
+            SearchHelper.search_account_ids(self.user.id, "slav"),
+            [1, 2, 3, 4, 5, 6]
+        )
+
+    # ----------------------------------------------------------------------------
+
+    def test_import_accounts(self):
+        with tempfile.NamedTemporaryFile(suffix=".ndjson") as import_file:
+            for index in range(5):
+                import_file.write(json.dumps({
+                    "name": "Command Co " + str(index),
+                    "password": "pw",
+                    "category": "work",
+                }).encode() + b"\n")
+            import_file.flush()
+
+            out = StringIO()
+            call_command(
+                "import_accounts",
+                import_file.name,
+                "--owner=testuser",
+                "--batch-size=2",
+                stdout=out
+            )
+
+        self.assertEqual(out.getvalue().count("Imported "), 4)
+        self.assertIn("Imported 5 accounts, 0 failed", out.getvalue())
+        self.assertEqual(
+            Account.objects.filter(company__startswith="Command Co").count(),
+            5
+        )
+
+    # ----------------------------------------------------------------------------
+
+    def test_export_accounts(self):
+        with tempfile.NamedTemporaryFile(suffix=".ndjson") as export_file:
+            out = StringIO()
+            call_command(
+                "export_accounts",
+                export_file.name,
+                "--chunk-size=4",
+                stdout=out
+            )
+            records = [
+                json.loads(line) for line in export_file.read().splitlines()
+            ]
+
+        self.assertEqual(out.getvalue().count("Exported "), 3)
+        self.assertIn("Exported 6 accounts", out.getvalue())
+        self.assertEqual([record["id"] for record in records], [1, 2, 3, 4, 5, 6])
+        self.assertEqual(records[0]["password"], "testpass")
+
+    def test_export_accounts_to_stdout(self):
+        out = StringIO()
+        err = StringIO()
+        call_command("export_accounts", stdout=out, stderr=err)
+
+        self.assertTrue(out.getvalue().startswith("id,type_name,email,"))
+        self.assertEqual(len(out.getvalue().splitlines()), 7)
+        self.assertIn("Exported 6 accounts", err.getvalue())
+
+    # ----------------------------------------------------------------------------
+
+    def test_rotate_encryption_key(self):
+        self.set_raw_password(1, KeyRing.from_keys(["oldkey"]).encrypt(pickle.dumps("old-1")))
+        self.set_raw_password(4, KeyRing.from_keys(["oldkey"]).encrypt(pickle.dumps("old-4")))
+
+        with tempfile.TemporaryDirectory() as directory:
+            checkpoint = os.path.join(directory, "rotation.json")
+            # Batch [0, 2) is already done, account 1 is left for resume
+            with self.settings(CRYPTOGRAPHY_OLD_KEYS=["oldkey"]):
+                done = KeyRotationHelper.new_checkpoint(2)
+                done["done"] = [0]
+                KeyRotationHelper.save_checkpoint(checkpoint, done)
+
+                out = StringIO()
+                call_command(
+                    "rotate_encryption_key",
+                    "--workers=1",
+                    "--checkpoint=" + checkpoint,
+                    stdout=out
+                )
+                self.assertIn("Resuming, 1 batches", out.getvalue())
+                self.assertIn("Rotated 1 passwords, 4 already current", out.getvalue())
+                self.assertFalse(os.path.exists(checkpoint))
+
+                out = StringIO()
+                call_command("rotate_encryption_key", "--verify", stdout=out)
+                self.assertIn(
+                    "5 on the current key, 1 on old keys, 0 unreadable,"
+                    " 0 ambiguous",
+                    out.getvalue()
+                )
+
+        # Rotated values read with the current key alone
+        self.assertEqual(
+            AccountHelper.get_account_password(self.user.id, 4),
+            "old-4"
+        )
+
+    def test_rotate_encryption_key_verify_unreadable(self):
+        self.set_raw_password(3, KeyRing.from_keys(["unknown"]).encrypt(pickle.dumps("x")))
+
+        err = StringIO()
+        with self.assertRaisesMessage(CommandError, "1 unreadable"):
+            call_command(
+                "rotate_encryption_key",
+                "--verify",
+                "--workers=1",
+                stderr=err
+            )
+        self.assertIn("Account 3:", err.getvalue())
+
+    def test_rotate_encryption_key_ambiguous(self):
+        self.set_raw_password(2, KeyRing.from_keys(["oldkey"]).encrypt(pickle.dumps("x")))
+
+        # The same key twice reads the row with both
+        with self.settings(CRYPTOGRAPHY_OLD_KEYS=["oldkey", "oldkey"]):
+            err = StringIO()
+            with self.assertRaisesMessage(CommandError, "1 ambiguous"):
+                call_command(
+                    "rotate_encryption_key",
+                    "--verify",
+                    "--workers=1",
+                    stderr=err
+                )
+            self.assertIn("Account 2: password decrypts with more", err.getvalue())
+
+            with tempfile.TemporaryDirectory() as directory:
+                with self.assertRaisesMessage(CommandError, "1 with more"):
+                    call_command(
+                        "rotate_encryption_key",
+                        "--workers=1",
+                        "--checkpoint=" + os.path.join(directory, "r.json"),
+                        stdout=StringIO(),
+                        stderr=StringIO()
+                    )
+
+        # Left on the old key
+        ciphertext = KeyRotationHelper.get_encrypted_passwords(2, 3)[0][1]
+        self.assertEqual(
+            KeyRing.from_keys(["oldkey"]).decrypt(ciphertext),
+            pickle.dumps("x")
+        )
+
+    def set_raw_password(self, account_id, ciphertext):
+        Account.objects.filter(id=account_id).update(
+            password=Value(ciphertext, output_field=BinaryField())
+        )
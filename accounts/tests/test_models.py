@@ -1,5 +1,12 @@
+from django.db import connections
+from django.db.models import BinaryField, Value
 from django.test import TestCase
+from utils.decryption import Decryption
+from utils.keyring import AmbiguousToken, KeyRing
+from ..helpers.account_helper import AccountHelper
+from ..helpers.export_helper import ExportHelper
 from ..helpers.type_helper import TypeHelper
+import pickle
 from ..models import (
     Account,
     Type,
@@ -57,3 +64,132 @@ class ModelTests(TestCase):
         self.assertEqual(saved_instance.name, 'test')
 
     # ----------------------------------------------------------------------------
+
+    def test_account_email_domain(self):
+        instance = Account.objects.create(
+            email='test@Example.COM',
+            password='testpassword',
+        )
+
+        self.assertEqual(instance.email_domain, 'example.com')
+
+    # ----------------------------------------------------------------------------
+
+    def test_account_filters_use_indexes(self):
+        filters = AccountHelper.parse_filters({
+            "type": "1",
+            "company": "testcompany",
+            "email_domain": "example.com",
+            "created_after": "2023-01-01",
+            "created_before": "2023-01-01",
+            "updated_after": "2023-01-01",
+            "updated_before": "2023-01-01",
+        })
+
+        for filter in filters:
+            plan = AccountHelper.apply_filters(
+                Account.objects.all(),
+                (filter,)
+            ).explain()
+            self.assertUsesIndex(plan, filter[0])
+
+        # Type filter ordered by date_updated reads the composite index
+        plan = AccountHelper.apply_filters(
+            Account.objects.all(),
+            AccountHelper.parse_filters({"type": "1"})
+        ).order_by('date_updated').explain()
+        self.assertUsesIndex(plan, "type by date_updated")
+        self.assertNotIn("TEMP B-TREE", plan)
+
+    def assertUsesIndex(self, plan, name):
+        vendor = connections["account_information"].vendor
+        if vendor == "sqlite":
+            self.assertNotIn("SCAN accounts_account", plan, name)
+            self.assertIn("USING INDEX", plan, name)
+        elif vendor == "mysql":
+            # Full scans show up as access type ALL
+            self.assertNotRegex(plan, r"\bALL\b", name)
+        else:
+            self.skipTest("No plan check for " + vendor)
+
+    # ----------------------------------------------------------------------------
+
+    def test_decrypt_values(self):
+        for index in range(5):
+            Account.objects.create(password="password-" + str(index))
+        ciphertexts = [
+            values[4] for values in ExportHelper.get_encrypted_batch(0, 10)
+        ]
+        expected = ["password-" + str(index) for index in range(5)]
+        field = Account._meta.get_field('password')
+
+        # Below the threshold values never leave the process
+        self.assertEqual(Decryption.decrypt_values(field, ciphertexts, 2), expected)
+        self.assertIsNone(Decryption._executor)
+
+        # Web processes stay in process unless opted in (export commands
+        # run by other tests allow the pool)
+        Decryption._pool_allowed = False
+        self.assertEqual(
+            Decryption.decrypt_values(field, ciphertexts, 2, 0),
+            expected
+        )
+        self.assertIsNone(Decryption._executor)
+
+        try:
+            with self.settings(DECRYPTION_TASK_SIZE=2, DECRYPTION_WEB_POOL=True):
+                self.assertEqual(
+                    Decryption.decrypt_values(field, ciphertexts, 2, 0),
+                    expected
+                )
+            self.assertIsNotNone(Decryption._executor)
+
+            Decryption.start_workers(2)
+            self.assertEqual(len(Decryption._executor._processes), 2)
+        finally:
+            Decryption.shutdown()
+
+    # ----------------------------------------------------------------------------
+
+    def test_keyring_reads_old_keys(self):
+        instance = Account.objects.create(password="current", owner_id=1)
+        Account.objects.filter(id=instance.id).update(password=Value(
+            KeyRing.from_keys(["oldkey"]).encrypt(pickle.dumps("rotated-out")),
+            output_field=BinaryField()
+        ))
+        field = Account._meta.get_field('password')
+        fernet = field._fernet
+
+        try:
+            with self.settings(CRYPTOGRAPHY_OLD_KEYS=["oldkey"]):
+                KeyRing.install(field)
+            self.assertEqual(
+                AccountHelper.get_account_password(1, instance.id),
+                "rotated-out"
+            )
+
+            # New values are written with the current key
+            Account.objects.filter(id=instance.id).update(password="new")
+            field._fernet = fernet
+            self.assertEqual(
+                AccountHelper.get_account_password(1, instance.id),
+                "new"
+            )
+        finally:
+            field._fernet = fernet
+
+    def test_keyring_accepts_only_one_key(self):
+        token = KeyRing.from_keys(["oldkey"]).encrypt(pickle.dumps("value"))
+
+        self.assertEqual(
+            KeyRing.from_keys(["newkey", "oldkey"]).decrypt_with_index(token),
+            (1, pickle.dumps("value"))
+        )
+        with self.assertRaises(AmbiguousToken):
+            KeyRing.from_keys(["oldkey", "oldkey"]).decrypt_with_index(token)
+
+        # Only pickled strings are field values
+        self.assertFalse(KeyRing.is_field_value(pickle.dumps(1)))
+        self.assertFalse(KeyRing.is_field_value(pickle.dumps("value") + b"."))
+
+    # ----------------------------------------------------------------------------
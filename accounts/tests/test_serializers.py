@@ -1,2 +1,148 @@
+from django.db import transaction
+from django.test import TestCase, override_settings
+from rest_framework.renderers import JSONRenderer
+from utils.caching import Caching
+from utils.formatting import Formatting
+from ..helpers.account_helper import AccountHelper
+from ..models import Account, Type
+from ..serializers import AccountSerializer, AccountUpdateSerializer
+from ..type_registry import TypeRegistry
+from unittest import mock
+import datetime
+
 # NOTE: Test command: python manage.py test accounts.tests.test_serliazers
 # NOTE: To run all test modules: python manage.py run_accounts_tests
+
+
+class SerializerTests(TestCase):
+    databases = "__all__"
+    fixtures = [
+        "accounts/tests/fixtures/types.json",
+        "accounts/tests/fixtures/accounts.json",
+    ]
+
+    # ----------------------------------------------------------------------------
+
+    def test_flat_serializer_matches_account_serializer(self):
+        accounts = Account.objects.select_related('type').order_by('id')
+        expected = JSONRenderer().render(
+            AccountSerializer(accounts, many=True).data
+        )
+
+        rows = list(AccountHelper.iterate_accounts(None, chunk_size=2))
+
+        self.assertEqual(JSONRenderer().render(rows), expected)
+
+    def test_flat_serializer_matches_projection(self):
+        fields = ("type_name", "email", "password", "date_updated")
+        accounts = Account.objects.select_related('type').order_by('id')
+        expected = JSONRenderer().render(
+            AccountSerializer(accounts, many=True, fields=fields).data
+        )
+
+        rows = AccountHelper.build_projected_accounts(None, fields)
+
+        self.assertEqual(JSONRenderer().render(rows), expected)
+
+    # ----------------------------------------------------------------------------
+
+    def test_type_name_without_join(self):
+        accounts = list(Account.objects.defer('password').order_by('id'))
+        TypeRegistry.get_names()
+
+        with self.assertNumQueries(0, using="account_information"):
+            data = AccountSerializer(accounts, many=True).data
+
+        self.assertEqual(
+            [row["type_name"] for row in data],
+            ["school", None, None, None, "work", "work"]
+        )
+
+    def test_type_names_resolved_once_per_list(self):
+        accounts = list(Account.objects.defer('password').order_by('id'))
+
+        with mock.patch.object(
+            TypeRegistry,
+            "get_registry",
+            wraps=TypeRegistry.get_registry
+        ) as get_registry:
+            AccountSerializer(accounts, many=True).data
+
+        self.assertEqual(get_registry.call_count, 1)
+
+    def test_type_by_name(self):
+        TypeRegistry.get_names()
+        with self.assertNumQueries(0, using="account_information"):
+            serializer = AccountUpdateSerializer(
+                data={"type": "gaming"},
+                partial=True
+            )
+            self.assertTrue(serializer.is_valid())
+        self.assertEqual(serializer.validated_data["type"].id, 3)
+
+        serializer = AccountUpdateSerializer(
+            data={"type": "missing"},
+            partial=True
+        )
+        self.assertFalse(serializer.is_valid())
+        self.assertIn("missing", str(serializer.errors["type"]))
+
+    def test_type_registry_follows_type_writes(self):
+        type_inst = Type.objects.create(name="finance")
+        self.assertEqual(TypeRegistry.get_id("finance"), type_inst.id)
+
+        # A write seen only through the types generation, as in another
+        # process
+        Type.objects.filter(id=type_inst.id).update(name="banking")
+        self.assertEqual(TypeRegistry.get_name(type_inst.id), "finance")
+        Caching.delete_cache_value("types")
+        self.assertEqual(TypeRegistry.get_name(type_inst.id), "banking")
+
+    @override_settings(DEV_CACHE=True, TYPE_REGISTRY_DEV_TIMEOUT=0)
+    def test_type_registry_expires_under_dev_cache(self):
+        type_inst = Type.objects.create(name="finance")
+        self.assertEqual(TypeRegistry.get_id("finance"), type_inst.id)
+
+        # A rename in another worker never moves this process' types
+        # generation under DEV_CACHE
+        Type.objects.filter(id=type_inst.id).update(name="banking")
+        self.assertEqual(TypeRegistry.get_name(type_inst.id), "banking")
+        self.assertIsNone(TypeRegistry.get_registry()["ids"].get("finance"))
+
+    def test_type_registry_reloads_on_miss(self):
+        TypeRegistry.get_names()
+        # No signal, as for a type created in another process before the
+        # types generation is seen to move
+        Type.objects.bulk_create([Type(name="finance")])
+
+        self.assertIsNotNone(TypeRegistry.get_id("finance"))
+        serializer = AccountUpdateSerializer(
+            data={"type": "finance"},
+            partial=True
+        )
+        self.assertTrue(serializer.is_valid())
+
+    def test_type_registry_drops_rolled_back_types(self):
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic(using="account_information"):
+                Type.objects.create(name="ghost")
+                self.assertIsNotNone(TypeRegistry.get_id("ghost"))
+                raise RuntimeError("rollback")
+
+        self.assertIsNone(TypeRegistry.get_id("ghost"))
+        self.assertNotIn("ghost", TypeRegistry.get_names().values())
+
+    # ----------------------------------------------------------------------------
+
+    def test_format_date_fast(self):
+        for date in (
+            datetime.datetime(2023, 10, 3, 18, 8, 42, 123456),
+            datetime.datetime(2023, 1, 2, 3, 4, 5, tzinfo=datetime.timezone.utc),
+            datetime.datetime(999, 1, 1),
+        ):
+            self.assertEqual(
+                Formatting.format_date_fast(date),
+                Formatting.format_date(date)
+            )
+
+    # ----------------------------------------------------------------------------
@@ -3,8 +3,23 @@ from rest_framework import status
 from rest_framework_simplejwt.tokens import RefreshToken
 from django.urls import reverse
 from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connections
+from django.test.utils import CaptureQueriesContext
+import csv
+import datetime
+import gzip
+import io
 import json
+from unittest import mock
+from utils.caching import Caching
 from ..helpers.account_helper import AccountHelper
+from ..helpers.bulk_helper import BulkHelper
+from ..helpers.count_helper import CountHelper
+from ..helpers.sync_helper import SyncHelper
+from ..models import Account
+from ..serializers import MaskedPasswordField
 
 # NOTE: Test command: python manage.py test accounts.tests.test_views
 # NOTE: To run all test modules: python manage.py run_accounts_tests
@@ -18,6 +33,7 @@ class ViewTests(APITestCase):
     ]
 
     def setUp(self):
+        cache.clear()
         self.user = User.objects.create_user(
             username="testuser",
             password="testpassword"
@@ -25,6 +41,7 @@ class ViewTests(APITestCase):
         refresh = RefreshToken.for_user(self.user)
         access_token = str(refresh.access_token)
         self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {access_token}")
+        AccountHelper.assign_owner(self.user.id)
 
     # ----------------------------------------------------------------------------
 
@@ -57,7 +74,7 @@ class ViewTests(APITestCase):
         )
         self.assertEqual(
             response.data["account"]["password"],
-            "test-password"
+            "********"
         )
         self.assertEqual(
             response.data["account"]["company"],
@@ -76,6 +93,12 @@ class ViewTests(APITestCase):
             1
         )
 
+        reveal_response = self.client.get(reverse(
+            "accounts-api:reveal_account_password",
+            kwargs={"account_id": response.data["account"]["id"]}
+        ))
+        self.assertEqual(reveal_response.data["password"], "test-password")
+
     def test_add_account_with_invalid_type(self):
         url = reverse("accounts-api:add_account")
         data = {
@@ -132,7 +155,7 @@ class ViewTests(APITestCase):
         )
         self.assertEqual(
             response.data["account"]["password"],
-            "test-password-updated"
+            MaskedPasswordField.MASK
         )
         self.assertEqual(
             response.data["account"]["company"],
@@ -146,6 +169,56 @@ class ViewTests(APITestCase):
             response.data["account"]["description"],
             "automated test updated"
         )
+        # The plaintext is only sent by RevealAccountPassword
+        self.assertEqual(
+            self.client.get(reverse(
+                "accounts-api:reveal_account_password",
+                kwargs={"account_id": 1}
+            )).data["password"],
+            "test-password-updated"
+        )
+
+    def test_update_account_masks_stored_password(self):
+        response = self.client.patch(
+            reverse("accounts-api:manage_account", kwargs={"id": 1}),
+            {"username": "masked"},
+            format="json"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.data["account"]["password"],
+            MaskedPasswordField.MASK
+        )
+        self.assertNotIn("testpass", json.dumps(response.data))
+
+    def test_add_and_update_account_with_type_name(self):
+        response = self.client.post(
+            reverse("accounts-api:add_account"),
+            {"email": "named@gmail.com", "password": "pw", "type": "gaming"},
+            format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["account"]["type"], 3)
+        self.assertEqual(response.data["account"]["type_name"], "gaming")
+
+        response = self.client.patch(
+            reverse(
+                "accounts-api:manage_account",
+                kwargs={"id": response.data["account"]["id"]}
+            ),
+            {"type": "work"},
+            format="json"
+        )
+        self.assertEqual(response.data["account"]["type"], 1)
+
+        response = self.client.patch(
+            reverse("accounts-api:manage_account", kwargs={"id": 1}),
+            {"type": "missing"},
+            format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('Invalid type name "missing"', response.data["error"])
 
     def test_update_account_with_invalid_type(self):
         url = reverse(
@@ -223,6 +296,889 @@ class ViewTests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(actual_response, expected_response)
 
+    def test_list_accounts_paginated(self):
+        url = reverse("accounts-api:list_accounts")
+        expected_ids = [
+            item["id"] for item in json.loads(self.client.get(url).content)
+        ]
+
+        ids = []
+        cursor = ""
+        while cursor is not None:
+            response = self.client.get(url, {"limit": 4, "cursor": cursor})
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertLessEqual(len(response.data["results"]), 4)
+            ids += [item["id"] for item in response.data["results"]]
+            cursor = response.data["next_cursor"]
+
+        self.assertEqual(ids, expected_ids)
+
+    def test_list_accounts_page_after_write(self):
+        url = reverse("accounts-api:list_accounts")
+        self.client.get(url, {"limit": 2})
+
+        self.client.delete(
+            reverse("accounts-api:manage_account", kwargs={"id": 2})
+        )
+        response = self.client.get(url, {"limit": 2})
+
+        self.assertEqual(
+            [item["id"] for item in response.data["results"]],
+            [1, 3]
+        )
+
+    def test_list_accounts_invalid_page(self):
+        url = reverse("accounts-api:list_accounts")
+
+        response = self.client.get(url, {"limit": 0})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.client.get(url, {"cursor": "not-a-cursor"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data["error"], "invalid cursor")
+
+    def test_list_accounts_stream_json(self):
+        url = reverse("accounts-api:list_accounts")
+        expected = self.client.get(url).content
+
+        response = self.client.get(url, {"stream": "json"})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        self.assertEqual(b"".join(response.streaming_content), expected)
+
+    def test_list_accounts_stream_ndjson(self):
+        url = reverse("accounts-api:list_accounts")
+        expected = json.loads(self.client.get(url).content)
+
+        response = self.client.get(url, {"stream": "ndjson"})
+        lines = b"".join(response.streaming_content).splitlines()
+
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        self.assertEqual([json.loads(line) for line in lines], expected)
+
+    def test_list_accounts_stream_reads_keyset_batches(self):
+        url = reverse("accounts-api:list_accounts")
+        expected = json.loads(
+            self.client.get(url, {"ordering": "-email"}).content
+        )
+
+        with self.settings(ACCOUNTS_STREAM_CHUNK_SIZE=2):
+            response = self.client.get(
+                url,
+                {"stream": "ndjson", "ordering": "-email", "fields": "id"}
+            )
+            with CaptureQueriesContext(
+                connections["account_information"]
+            ) as queries:
+                lines = b"".join(response.streaming_content).splitlines()
+
+        self.assertEqual(
+            [json.loads(line)["id"] for line in lines],
+            [item["id"] for item in expected]
+        )
+        # Three full batches and the empty one ending the stream
+        selects = [
+            query["sql"] for query in queries.captured_queries
+            if "accounts_account" in query["sql"]
+        ]
+        self.assertEqual(len(selects), 4)
+        for sql in selects:
+            self.assertIn("LIMIT 2", sql)
+
+    def test_list_accounts_stream_invalid_format(self):
+        response = self.client.get(
+            reverse("accounts-api:list_accounts"),
+            {"stream": "xml"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_list_accounts_fields(self):
+        url = reverse("accounts-api:list_accounts")
+        expected = json.loads(self.client.get(url).content)
+
+        cache.clear()
+        with CaptureQueriesContext(
+            connections["account_information"]
+        ) as queries:
+            response = self.client.get(
+                url,
+                {"fields": "website,company,type_name"}
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            json.loads(response.content),
+            [
+                {
+                    "type_name": item["type_name"],
+                    "company": item["company"],
+                    "website": item["website"],
+                }
+                for item in expected
+            ]
+        )
+        sql = " ".join(query["sql"] for query in queries.captured_queries)
+        self.assertNotIn("description", sql)
+        self.assertNotIn("password", sql)
+
+    def test_list_accounts_exclude(self):
+        url = reverse("accounts-api:list_accounts")
+        response = self.client.get(url, {"exclude": "password,description"})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        for item in json.loads(response.content):
+            self.assertNotIn("password", item)
+            self.assertNotIn("description", item)
+            self.assertIn("email", item)
+
+    def test_list_accounts_fields_after_write(self):
+        url = reverse("accounts-api:list_accounts")
+        self.client.get(url, {"fields": "id,company"})
+
+        self.client.patch(
+            reverse("accounts-api:manage_account", kwargs={"id": 1}),
+            {"company": "Updated Company"},
+            format="json"
+        )
+        response = self.client.get(url, {"fields": "id,company"})
+
+        self.assertEqual(
+            json.loads(response.content)[0],
+            {"id": 1, "company": "Updated Company"}
+        )
+
+    def test_get_account_by_id_fields(self):
+        url = reverse(
+            "accounts-api:get_account_by_id",
+            kwargs={"account_id": 1}
+        )
+        response = self.client.get(url, {"fields": "id,email"})
+        self.assertEqual(
+            json.loads(response.content),
+            [{"id": 1, "email": "testt@gmail.com"}]
+        )
+
+        # Same projection served from the cached index
+        self.client.get(reverse("accounts-api:list_accounts"))
+        with self.assertNumQueries(0, using="account_information"):
+            cached_response = self.client.get(url, {"fields": "id,email"})
+        self.assertEqual(cached_response.content, response.content)
+
+    def test_list_accounts_unknown_field(self):
+        response = self.client.get(
+            reverse("accounts-api:list_accounts"),
+            {"fields": "email,secret"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data["error"], "unknown fields: secret")
+
+    def test_list_accounts_masks_password(self):
+        with CaptureQueriesContext(
+            connections["account_information"]
+        ) as queries:
+            response = self.client.get(reverse("accounts-api:list_accounts"))
+
+        for item in json.loads(response.content):
+            self.assertEqual(item["password"], "********")
+        sql = " ".join(query["sql"] for query in queries.captured_queries)
+        self.assertNotIn("password", sql)
+
+    def test_reveal_account_password(self):
+        response = self.client.get(reverse(
+            "accounts-api:reveal_account_password",
+            kwargs={"account_id": 1}
+        ))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {"id": 1, "password": "testpass"})
+        self.assertEqual(response["Cache-Control"], "no-store")
+
+    def test_reveal_account_password_not_found(self):
+        response = self.client.get(reverse(
+            "accounts-api:reveal_account_password",
+            kwargs={"account_id": 999}
+        ))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_bulk_create_accounts(self):
+        url = reverse("accounts-api:bulk_accounts")
+        data = [
+            {
+                "email": "bulk1@Bulk.com",
+                "username": "bulk-one",
+                "password": "bulk-password",
+                "type": 1
+            },
+            {"email": "not-an-email", "password": "bulk-password"},
+            {"email": "bulk2@bulk.com", "password": "bulk-password"},
+        ]
+
+        self.client.get(reverse("accounts-api:list_accounts"))
+        cache_key = AccountHelper.get_cache_key(self.user.id)
+        generation = Caching.get_cache_generation(cache_key)
+        with self.settings(ACCOUNTS_BULK_BATCH_SIZE=1):
+            response = self.client.post(url, data, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            [item["index"] for item in response.data["created"]],
+            [0, 2]
+        )
+        self.assertEqual(response.data["errors"][0]["index"], 1)
+        self.assertIn("email", response.data["errors"][0]["errors"])
+        self.assertEqual(
+            Caching.get_cache_generation(cache_key),
+            generation + 1
+        )
+
+        created_id = response.data["created"][0]["id"]
+        response = self.client.get(
+            reverse("accounts-api:list_accounts"),
+            {"email_domain": "bulk.com"}
+        )
+        self.assertEqual(len(response.data), 2)
+        self.assertEqual(response.data[0]["id"], created_id)
+        self.assertEqual(response.data[0]["type_name"], "work")
+
+        response = self.client.get(
+            reverse("accounts-api:search_accounts"),
+            {"q": "bulk one"}
+        )
+        self.assertEqual(response.data["results"][0]["id"], created_id)
+
+    def test_bulk_create_failed_batch_invalidates_cache(self):
+        url = reverse("accounts-api:bulk_accounts")
+        data = [
+            {"email": "first@bulk.com", "password": "bulk-password"},
+            {"email": "second@bulk.com", "password": "bulk-password"},
+        ]
+        insert_accounts = BulkHelper.insert_accounts
+
+        def fail_second_batch(accounts):
+            if accounts[0].email == "second@bulk.com":
+                raise RuntimeError("batch failed")
+            insert_accounts(accounts)
+
+        self.client.get(reverse("accounts-api:list_accounts"))
+        with self.settings(ACCOUNTS_BULK_BATCH_SIZE=1), mock.patch.object(
+            BulkHelper,
+            "insert_accounts",
+            side_effect=fail_second_batch
+        ):
+            response = self.client.post(url, data, format="json")
+
+        self.assertEqual(
+            response.status_code,
+            status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+        self.assertEqual(
+            [
+                item["email"] for item in json.loads(self.client.get(
+                    reverse("accounts-api:list_accounts")
+                ).content)
+                if item["email"].endswith("@bulk.com")
+            ],
+            ["first@bulk.com"]
+        )
+
+    def test_bulk_create_reads_back_interleaved_ids(self):
+        url = reverse("accounts-api:bulk_accounts")
+        data = [
+            {"email": "first@bulk.com", "password": "bulk-password"},
+            {"email": "second@bulk.com", "password": "bulk-password"},
+        ]
+        connection = connections["account_information"]
+
+        def get_first_inserted_id(connection):
+            # As MySQL with innodb_autoinc_lock_mode 2: a concurrent
+            # insert took the id between the two new rows
+            first, second = Account.objects.filter(
+                email__endswith="@bulk.com"
+            ).order_by('id')
+            Account.objects.filter(id=second.id).update(id=second.id + 1)
+            Account.objects.create(
+                id=second.id,
+                owner_id=self.user.id,
+                email="concurrent@bulk.com",
+                password="x"
+            )
+            return first.id
+
+        # The backend feature MySQL lacks
+        with mock.patch.object(
+            type(connection.features),
+            "can_return_rows_from_bulk_insert",
+            new_callable=mock.PropertyMock,
+            return_value=False
+        ), mock.patch.object(
+            BulkHelper,
+            "get_first_inserted_id",
+            side_effect=get_first_inserted_id
+        ):
+            response = self.client.post(url, data, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        for item, expected in zip(response.data["created"], data):
+            self.assertEqual(
+                Account.objects.get(id=item["id"]).email,
+                expected["email"]
+            )
+
+    def test_bulk_update_accounts(self):
+        url = reverse("accounts-api:bulk_accounts")
+        data = [
+            {"id": 1, "company": "Bulk Updated", "password": "bulk-password"},
+            {"id": 2, "email": "bulk@updated.com"},
+            {"id": 999, "company": "Missing"},
+            {"company": "No id"},
+        ]
+
+        response = self.client.patch(url, data, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["updated"], [1, 2])
+        self.assertEqual(
+            [error["index"] for error in response.data["errors"]],
+            [2, 3]
+        )
+
+        rows = {
+            item["id"]: item for item in json.loads(self.client.get(
+                reverse("accounts-api:list_accounts")
+            ).content)
+        }
+        self.assertEqual(rows[1]["company"], "Bulk Updated")
+        self.assertEqual(rows[1]["email"], "testt@gmail.com")
+        self.assertEqual(rows[2]["email"], "bulk@updated.com")
+        self.assertEqual(
+            self.client.get(reverse(
+                "accounts-api:reveal_account_password",
+                kwargs={"account_id": 1}
+            )).data["password"],
+            "bulk-password"
+        )
+        response = self.client.get(
+            reverse("accounts-api:list_accounts"),
+            {"email_domain": "updated.com"}
+        )
+        self.assertEqual([item["id"] for item in response.data], [2])
+
+    def test_bulk_delete_accounts(self):
+        url = reverse("accounts-api:bulk_accounts")
+        cursor = self.client.get(
+            reverse("accounts-api:sync_accounts")
+        ).data["cursor"]
+
+        response = self.client.delete(url, {"ids": [2, 3, 999]}, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["deleted"], [2, 3])
+        self.assertEqual(response.data["not_found"], [999])
+        self.assertEqual(
+            [
+                item["id"] for item in json.loads(self.client.get(
+                    reverse("accounts-api:list_accounts")
+                ).content)
+            ],
+            [1, 4, 5, 6]
+        )
+        self.assertEqual(
+            self.client.get(
+                reverse("accounts-api:sync_accounts"),
+                {"since": cursor}
+            ).data["deleted"],
+            [2, 3]
+        )
+
+    def test_bulk_accounts_invalid_body(self):
+        url = reverse("accounts-api:bulk_accounts")
+
+        response = self.client.post(url, {"email": "x"}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        with self.settings(ACCOUNTS_BULK_MAX_ITEMS=1):
+            response = self.client.delete(url, {"ids": [1, 2]}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_import_accounts_csv(self):
+        url = reverse("accounts-api:import_accounts")
+        upload = SimpleUploadedFile(
+            "export.csv",
+            (
+                "name,url,username,password,notes,folder\n"
+                "Imported Co,https://imported.example.com,imp,pw1,note,work\n"
+                "Bad Url,not a url,imp2,pw2,,work\n"
+                "New Type Co,https://new.example.com,imp3,pw3,,imported\n"
+            ).encode()
+        )
+
+        response = self.client.post(url, {"file": upload})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["imported"], 2)
+        self.assertEqual(response.data["failed"], 1)
+        self.assertEqual(response.data["types_created"], 1)
+        self.assertEqual(response.data["errors"][0]["row"], 2)
+        self.assertIn("website", response.data["errors"][0]["errors"])
+
+        response = self.client.get(
+            reverse("accounts-api:list_accounts"),
+            {"ordering": "-id", "fields": "company,type_name"}
+        )
+        self.assertEqual(
+            response.data[:2],
+            [
+                {"type_name": "imported", "company": "New Type Co"},
+                {"type_name": "work", "company": "Imported Co"},
+            ]
+        )
+
+    def test_import_accounts_json(self):
+        url = reverse("accounts-api:import_accounts")
+        upload = SimpleUploadedFile(
+            "export.json",
+            json.dumps([
+                {"title": "Json Co", "login_password": "pw", "type": "work"},
+                "not an object",
+            ]).encode() + b" trailing"
+        )
+
+        response = self.client.post(url, {"file": upload})
+
+        self.assertEqual(response.data["imported"], 1)
+        self.assertEqual(
+            [error["row"] for error in response.data["errors"]],
+            [2, 3]
+        )
+
+    def test_import_accounts_invalidates_once(self):
+        url = reverse("accounts-api:import_accounts")
+        upload = SimpleUploadedFile(
+            "export.ndjson",
+            b"".join(
+                json.dumps({"title": "Co " + str(index), "password": "pw"})
+                .encode() + b"\n"
+                for index in range(3)
+            )
+        )
+
+        with self.settings(ACCOUNTS_IMPORT_BATCH_SIZE=1), mock.patch.object(
+            AccountHelper,
+            "invalidate_caches",
+            wraps=AccountHelper.invalidate_caches
+        ) as invalidate_caches:
+            response = self.client.post(url, {"file": upload})
+
+        self.assertEqual(response.data["imported"], 3)
+        self.assertEqual(invalidate_caches.call_count, 1)
+
+    def test_import_accounts_json_item_too_long(self):
+        url = reverse("accounts-api:import_accounts")
+        upload = SimpleUploadedFile(
+            "export.json",
+            json.dumps([
+                {"title": "Json Co", "login_password": "pw"},
+                {"title": "Long Co", "notes": "x" * 500},
+            ]).encode()
+        )
+
+        with self.settings(ACCOUNTS_IMPORT_MAX_ITEM_SIZE=200):
+            response = self.client.post(url, {"file": upload})
+
+        self.assertEqual(response.data["imported"], 1)
+        self.assertEqual(response.data["errors"][0]["row"], 2)
+        self.assertIn("longer than 200", str(response.data["errors"][0]))
+
+    def test_import_accounts_invalid_format(self):
+        url = reverse("accounts-api:import_accounts")
+        upload = SimpleUploadedFile("export.xml", b"<accounts/>")
+
+        response = self.client.post(url, {"file": upload})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_export_accounts_csv(self):
+        url = reverse(
+            "accounts-api:export_accounts",
+            kwargs={"export_format": "csv"}
+        )
+
+        with self.settings(ACCOUNTS_EXPORT_CHUNK_SIZE=4):
+            response = self.client.get(url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Cache-Control"], "no-store")
+        self.assertIn("accounts.csv", response["Content-Disposition"])
+
+        rows = list(csv.DictReader(
+            io.StringIO(b"".join(response.streaming_content).decode())
+        ))
+        self.assertEqual([row["id"] for row in rows], ["1", "2", "3", "4", "5", "6"])
+        self.assertEqual(rows[0]["password"], "testpass")
+        self.assertEqual(
+            rows[0]["date_created"],
+            self.client.get(reverse(
+                "accounts-api:get_account_by_id",
+                kwargs={"account_id": 1}
+            )).data[0]["date_created"]
+        )
+
+    def test_export_accounts_ndjson_imports_back(self):
+        url = reverse(
+            "accounts-api:export_accounts",
+            kwargs={"export_format": "ndjson"}
+        )
+        response = self.client.get(url)
+
+        content = b"".join(response.streaming_content)
+        records = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual(len(records), 6)
+        self.assertEqual(records[0]["password"], "testpass")
+
+        response = self.client.post(
+            reverse("accounts-api:import_accounts"),
+            {"file": SimpleUploadedFile("export.ndjson", content)}
+        )
+        self.assertEqual(response.data["imported"], 6)
+        self.assertEqual(response.data["types_created"], 0)
+
+    def test_export_accounts_invalid_format(self):
+        response = self.client.get(reverse(
+            "accounts-api:export_accounts",
+            kwargs={"export_format": "xml"}
+        ))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_list_accounts_filters(self):
+        url = reverse("accounts-api:list_accounts")
+
+        for params, expected_ids in (
+            ({"type": 1}, [5, 6]),
+            ({"company": "Slav-Co", "type": 2}, [1]),
+            ({"email_domain": "GMAIL.com"}, [1, 2, 3, 4, 5, 6]),
+            ({"email_domain": "example.com"}, []),
+            ({"created_after": "2023-10-25"}, [4, 5, 6]),
+            ({"created_before": "2023-10-03T18:10:00Z"}, [1, 2]),
+            ({
+                "updated_after": "2023-10-20",
+                "updated_before": "2023-10-26",
+            }, [1, 4, 6]),
+            ({"ordering": "-date_updated"}, [5, 6, 4, 1, 3, 2]),
+            ({"ordering": "email", "type": 1}, [5, 6]),
+        ):
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(
+                [item["id"] for item in response.data],
+                expected_ids,
+                params
+            )
+
+    def test_list_accounts_filters_with_pagination(self):
+        url = reverse("accounts-api:list_accounts")
+        response = self.client.get(url, {"type": 1, "limit": 1})
+
+        self.assertEqual(
+            [item["id"] for item in response.data["results"]],
+            [5]
+        )
+        response = self.client.get(
+            url,
+            {"type": 1, "limit": 1, "cursor": response.data["next_cursor"]}
+        )
+        self.assertEqual(
+            [item["id"] for item in response.data["results"]],
+            [6]
+        )
+        self.assertIsNone(response.data["next_cursor"])
+
+    def test_list_accounts_filters_after_write(self):
+        url = reverse("accounts-api:list_accounts")
+        self.client.get(url, {"email_domain": "example.com"})
+
+        self.client.patch(
+            reverse("accounts-api:manage_account", kwargs={"id": 2}),
+            {"email": "test1@Example.com"},
+            format="json"
+        )
+        response = self.client.get(url, {"email_domain": "example.com"})
+
+        self.assertEqual([item["id"] for item in response.data], [2])
+        self.assertNotIn("email_domain", response.data[0])
+
+    def test_list_accounts_invalid_filters(self):
+        url = reverse("accounts-api:list_accounts")
+
+        for params in (
+            {"type": "work"},
+            {"created_after": "yesterday"},
+            {"ordering": "password"},
+            {"ordering": "company", "limit": 2},
+        ):
+            response = self.client.get(url, params)
+            self.assertEqual(
+                response.status_code,
+                status.HTTP_400_BAD_REQUEST,
+                params
+            )
+
+    def test_search_accounts(self):
+        url = reverse("accounts-api:search_accounts")
+        response = self.client.get(url, {"q": "testt"})
+
+        # Matched in email and username ranks above username only
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["count"], 2)
+        self.assertEqual(
+            [item["id"] for item in response.data["results"]],
+            [1, 5]
+        )
+        self.assertEqual(
+            response.data["results"][0]["email"],
+            "testt@gmail.com"
+        )
+
+    def test_search_accounts_prefix_and_ranking(self):
+        url = reverse("accounts-api:search_accounts")
+        self.client.patch(
+            reverse("accounts-api:manage_account", kwargs={"id": 3}),
+            {"company": "Searchable", "description": "searchable"},
+            format="json"
+        )
+        self.client.patch(
+            reverse("accounts-api:manage_account", kwargs={"id": 4}),
+            {"description": "searchable things"},
+            format="json"
+        )
+
+        response = self.client.get(url, {"q": "SEARCH"})
+
+        self.assertEqual(
+            [item["id"] for item in response.data["results"]],
+            [3, 4]
+        )
+
+    def test_search_accounts_short_term_matches_whole_token(self):
+        url = reverse("accounts-api:search_accounts")
+        self.client.patch(
+            reverse("accounts-api:manage_account", kwargs={"id": 3}),
+            {"company": "P Team"},
+            format="json"
+        )
+
+        # Every account has "place", only one has "p"
+        response = self.client.get(url, {"q": "p"})
+
+        self.assertEqual(
+            [item["id"] for item in response.data["results"]],
+            [3]
+        )
+
+    def test_search_accounts_after_delete(self):
+        url = reverse("accounts-api:search_accounts")
+        self.client.get(url, {"q": "testt"})
+
+        self.client.delete(
+            reverse("accounts-api:manage_account", kwargs={"id": 1})
+        )
+        response = self.client.get(url, {"q": "testt"})
+
+        self.assertEqual(
+            [item["id"] for item in response.data["results"]],
+            [5]
+        )
+
+    def test_search_accounts_requires_query(self):
+        response = self.client.get(reverse("accounts-api:search_accounts"))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_sync_accounts(self):
+        url = reverse("accounts-api:sync_accounts")
+        response = self.client.get(url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.data["reset"])
+        self.assertEqual(len(response.data["changes"]), 6)
+        self.assertEqual(response.data["deleted"], [])
+
+        self.client.patch(
+            reverse("accounts-api:manage_account", kwargs={"id": 1}),
+            {"company": "Updated Company"},
+            format="json"
+        )
+        self.client.delete(
+            reverse("accounts-api:manage_account", kwargs={"id": 2})
+        )
+        response = self.client.get(url, {"since": response.data["cursor"]})
+
+        self.assertFalse(response.data["reset"])
+        self.assertEqual(
+            [item["id"] for item in response.data["changes"]],
+            [1]
+        )
+        self.assertEqual(
+            response.data["changes"][0]["company"],
+            "Updated Company"
+        )
+        self.assertEqual(response.data["deleted"], [2])
+
+    def test_sync_accounts_type_change(self):
+        url = reverse("accounts-api:sync_accounts")
+        cursor = self.client.get(url).data["cursor"]
+
+        self.client.patch(
+            reverse("accounts-api:type-detail", kwargs={"id": 1}),
+            {"name": "renamed"},
+            format="json"
+        )
+        response = self.client.get(url, {"since": cursor})
+
+        self.assertEqual(
+            [item["id"] for item in response.data["changes"]],
+            [5, 6]
+        )
+        self.assertEqual(response.data["changes"][0]["type_name"], "renamed")
+
+    def test_sync_accounts_expired_cursor(self):
+        url = reverse("accounts-api:sync_accounts")
+        cursor = SyncHelper.encode_cursor(
+            SyncHelper.get_retention_start() - datetime.timedelta(days=1)
+        )
+
+        response = self.client.get(url, {"since": cursor})
+
+        self.assertTrue(response.data["reset"])
+        self.assertEqual(len(response.data["changes"]), 6)
+
+    def test_sync_accounts_invalid_cursor(self):
+        response = self.client.get(
+            reverse("accounts-api:sync_accounts"),
+            {"since": "bad"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    # ----------------------------------------------------------------------------
+
+    def get_stats_counts(self):
+        response = self.client.get(reverse("accounts-api:account_stats"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data["total"], {
+            item["type_name"]: item["count"] for item in response.data["types"]
+        }
+
+    def test_account_stats(self):
+        self.assertEqual(
+            self.get_stats_counts(),
+            (6, {None: 3, "work": 2, "school": 1})
+        )
+
+    def test_account_stats_follow_writes(self):
+        self.client.post(
+            reverse("accounts-api:add_account"),
+            {"email": "stats@gmail.com", "password": "pw", "type": 3},
+            format="json"
+        )
+        self.client.patch(
+            reverse("accounts-api:manage_account", kwargs={"id": 2}),
+            {"type": 3},
+            format="json"
+        )
+        self.client.delete(
+            reverse("accounts-api:manage_account", kwargs={"id": 3})
+        )
+        self.client.post(
+            reverse("accounts-api:bulk_accounts"),
+            [{"password": "pw", "type": 1}, {"password": "pw"}],
+            format="json"
+        )
+        self.client.patch(
+            reverse("accounts-api:bulk_accounts"),
+            [{"id": 1, "type": 1}, {"id": 4, "company": "same type"}],
+            format="json"
+        )
+        self.client.delete(
+            reverse("accounts-api:bulk_accounts"),
+            {"ids": [5]},
+            format="json"
+        )
+        self.client.delete(
+            reverse("accounts-api:type-detail", kwargs={"id": 3})
+        )
+
+        self.assertEqual(
+            self.get_stats_counts(),
+            (7, {None: 4, "work": 3})
+        )
+        # Incremental counts match a recount
+        self.assertEqual(CountHelper.reconcile(), 0)
+
+    def test_list_accounts_gzip(self):
+        url = reverse("accounts-api:list_accounts")
+
+        self.client.get(url)
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING="gzip, deflate")
+        actual_response = json.loads(gzip.decompress(response.content))
+
+        with open(
+            "accounts/tests/test_data/list_accounts_output.json",
+            "r"
+        ) as expected_response_file:
+            expected_response = json.load(expected_response_file)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(actual_response, expected_response)
+
+    def test_list_accounts_not_modified(self):
+        url = reverse("accounts-api:list_accounts")
+        etag = self.client.get(url)["ETag"]
+
+        with self.assertNumQueries(0, using="account_information"):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response["ETag"], etag)
+
+        self.client.delete(
+            reverse("accounts-api:manage_account", kwargs={"id": 2})
+        )
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_list_accounts_after_cached_writes(self):
+        url = reverse("accounts-api:list_accounts")
+        self.client.get(url)
+
+        data = {
+            "email": "test-auto@gmail.com",
+            "password": "test-password",
+            "type": 1
+        }
+        added = self.client.post(
+            reverse("accounts-api:add_account"),
+            data,
+            format="json"
+        ).data["account"]
+        self.client.patch(
+            reverse("accounts-api:manage_account", kwargs={"id": 1}),
+            {"username": "patched"},
+            format="json"
+        )
+        self.client.delete(
+            reverse("accounts-api:manage_account", kwargs={"id": 2})
+        )
+
+        cached_response = json.loads(self.client.get(url).content)
+        cache.clear()
+        db_response = json.loads(self.client.get(url).content)
+
+        self.assertEqual(cached_response, db_response)
+        self.assertIn(added, cached_response)
+        self.assertNotIn(2, [item["id"] for item in cached_response])
+
     # ----------------------------------------------------------------------------
 
     def test_list_accounts_by_email(self):
@@ -243,6 +1199,165 @@ class ViewTests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(actual_response, expected_response)
 
+    def test_list_accounts_by_email_from_cache(self):
+        self.client.get(reverse("accounts-api:list_accounts"))
+        url = reverse(
+            "accounts-api:list_accounts_by_email",
+            kwargs={"email": "testt@gmail.com"}
+        )
+
+        with self.assertNumQueries(0, using="account_information"):
+            response = self.client.get(url)
+            missing_response = self.client.get(reverse(
+                "accounts-api:list_accounts_by_email",
+                kwargs={"email": "missing@gmail.com"}
+            ))
+
+        with open(
+            "accounts/tests/test_data/list_accounts_by_email_output.json",
+            "r"
+        ) as expected_response_file:
+            expected_response = json.load(expected_response_file)
+
+        self.assertEqual(json.loads(response.content), expected_response)
+        self.assertEqual(json.loads(missing_response.content), [])
+
+    def test_list_accounts_by_email_records_miss(self):
+        url = reverse(
+            "accounts-api:list_accounts_by_email",
+            kwargs={"email": "test-auto@gmail.com"}
+        )
+        self.client.get(url)
+
+        with self.assertNumQueries(0, using="account_information"):
+            response = self.client.get(url)
+        self.assertEqual(json.loads(response.content), [])
+
+        self.client.post(
+            reverse("accounts-api:add_account"),
+            {"email": "test-auto@gmail.com", "password": "test-password"},
+            format="json"
+        )
+        response = self.client.get(url)
+
+        self.assertEqual(len(json.loads(response.content)), 1)
+
+    # ----------------------------------------------------------------------------
+
+    def test_get_account_by_id_from_cache(self):
+        self.client.get(reverse("accounts-api:list_accounts"))
+        url = reverse(
+            "accounts-api:get_account_by_id",
+            kwargs={"account_id": 1}
+        )
+
+        with self.assertNumQueries(0, using="account_information"):
+            response = self.client.get(url)
+
+        self.assertEqual(json.loads(response.content)[0]["id"], 1)
+        self.assertEqual(
+            json.loads(response.content)[0]["email"],
+            "testt@gmail.com"
+        )
+
+    def test_get_account_by_id_not_modified(self):
+        url = reverse(
+            "accounts-api:get_account_by_id",
+            kwargs={"account_id": 1}
+        )
+        etag = self.client.get(url)["ETag"]
+        other_etag = self.client.get(reverse(
+            "accounts-api:get_account_by_id",
+            kwargs={"account_id": 2}
+        ))["ETag"]
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertNotEqual(etag, other_etag)
+
+    # ----------------------------------------------------------------------------
+
+    def authenticate_other_user(self):
+        other_user = User.objects.create_user(
+            username="otheruser",
+            password="otherpassword"
+        )
+        refresh = RefreshToken.for_user(other_user)
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {str(refresh.access_token)}"
+        )
+        return other_user
+
+    def test_other_users_accounts_are_hidden(self):
+        self.authenticate_other_user()
+
+        response = self.client.get(reverse("accounts-api:list_accounts"))
+        self.assertEqual(json.loads(response.content), [])
+
+        response = self.client.get(reverse(
+            "accounts-api:get_account_by_id",
+            kwargs={"account_id": 1}
+        ))
+        self.assertEqual(json.loads(response.content), [])
+
+        response = self.client.get(reverse(
+            "accounts-api:reveal_account_password",
+            kwargs={"account_id": 1}
+        ))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        response = self.client.delete(
+            reverse("accounts-api:manage_account", kwargs={"id": 1})
+        )
+        self.assertEqual(
+            response.data["error"],
+            "No Account matches the given query."
+        )
+
+        response = self.client.get(
+            reverse("accounts-api:search_accounts"),
+            {"q": "slav"}
+        )
+        self.assertEqual(response.data["count"], 0)
+
+        response = self.client.get(reverse("accounts-api:sync_accounts"))
+        self.assertEqual(response.data["changes"], [])
+
+        response = self.client.delete(
+            reverse("accounts-api:bulk_accounts"),
+            {"ids": [1, 2]},
+            format="json"
+        )
+        self.assertEqual(response.data["not_found"], [1, 2])
+
+    def test_write_keeps_other_users_cache(self):
+        url = reverse("accounts-api:list_accounts")
+        etag = self.client.get(url)["ETag"]
+
+        self.authenticate_other_user()
+        added = self.client.post(
+            reverse("accounts-api:add_account"),
+            {"email": "other@gmail.com", "password": "other-password"},
+            format="json"
+        ).data["account"]
+        self.assertEqual(
+            [row["id"] for row in json.loads(self.client.get(url).content)],
+            [added["id"]]
+        )
+        self.assertNotIn("owner_id", added)
+
+        self.client.credentials(
+            HTTP_AUTHORIZATION="Bearer "
+            + str(RefreshToken.for_user(self.user).access_token)
+        )
+        with self.assertNumQueries(0, using="account_information"):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            rows = json.loads(self.client.get(url).content)
+
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertNotIn(added["id"], [row["id"] for row in rows])
+
     # ----------------------------------------------------------------------------
 
     def test_add_type(self):
@@ -302,4 +1417,31 @@ class ViewTests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(actual_response, expected_response)
 
+    def test_list_types_not_modified(self):
+        url = reverse("accounts-api:type-list")
+        etag = self.client.get(url)["ETag"]
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        self.client.post(url, {"name": "test"}, format="json")
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    # ----------------------------------------------------------------------------
+
+    def test_cache_stats(self):
+        Caching.get_stats().reset()
+        url = reverse("accounts-api:list_accounts")
+        self.client.get(url)
+        self.client.get(url)
+
+        response = self.client.get(reverse("accounts-api:cache_stats"))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertGreaterEqual(response.data["accounts"]["hits"], 1)
+        self.assertGreaterEqual(response.data["accounts"]["misses"], 1)
+        # The rows and their rendered body
+        self.assertEqual(response.data["accounts"]["rebuilds"], 2)
+
     # ----------------------------------------------------------------------------
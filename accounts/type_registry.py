@@ -0,0 +1,161 @@
+from django.conf import settings
+from django.db import router, transaction
+from utils.caching import Caching
+from .models import Type
+import threading
+import time
+
+
+class TypeRegistry():
+    '''
+    In-memory id -> name and name -> id maps of every Type, so accounts
+    are serialized and validated without joining or querying the type
+    table.
+
+    Each process loads the registry on first use. A Type write drops it
+    in the writing process right away (see signals) and bumps the
+    "types" cache generation on commit, and other processes reload when
+    they see the generation move. Under DEV_CACHE generations are per
+    process, so the registry is also reloaded once it is older than
+    TYPE_REGISTRY_DEV_TIMEOUT. Both maps are shared, callers must not
+    modify them.
+
+    A registry loaded while the loading thread has uncommitted type
+    writes is tagged with them and only used by that thread until they
+    commit or roll back, so rolled back types are never kept.
+    '''
+
+    _registry = None
+    _lock = threading.Lock()
+
+    # Per thread list of (db alias, on_commit callback) of type writes
+    # in open transactions
+    _local = threading.local()
+
+    @staticmethod
+    def get_registry(reload=False):
+        generation = Caching.get_cache_generation("types")
+        pending = TypeRegistry._get_pending()
+        registry = TypeRegistry._registry
+        if not reload and TypeRegistry._is_current(
+            registry,
+            generation,
+            pending
+        ):
+            return registry
+
+        with TypeRegistry._lock:
+            registry = TypeRegistry._registry
+            if reload or not TypeRegistry._is_current(
+                registry,
+                generation,
+                pending
+            ):
+                names = dict(Type.objects.values_list('id', 'name'))
+                registry = {
+                    "generation": generation,
+                    "pending": pending,
+                    "expires_at": TypeRegistry._get_expiry(),
+                    "names": names,
+                    "ids": {name: id for id, name in names.items()},
+                }
+                TypeRegistry._registry = registry
+
+            return registry
+
+    @staticmethod
+    def get_names():
+        '''
+        Returns type id -> name for all types.
+        '''
+
+        return TypeRegistry.get_registry()["names"]
+
+    @staticmethod
+    def get_name(type_id):
+        '''
+        Reloads once on a miss, the type may have been created in
+        another process since the registry was loaded.
+        '''
+
+        if type_id is None:
+            return None
+
+        name = TypeRegistry.get_names().get(type_id)
+        if name is None:
+            name = TypeRegistry.get_registry(reload=True)["names"].get(type_id)
+        return name
+
+    @staticmethod
+    def get_id(name):
+        type_id = TypeRegistry.get_registry()["ids"].get(name)
+        if type_id is None:
+            type_id = TypeRegistry.get_registry(reload=True)["ids"].get(name)
+        return type_id
+
+    @staticmethod
+    def get_instance(type_id):
+        '''
+        Type built from the registry, to assign to Account.type without
+        loading it. None if there is no such type.
+        '''
+
+        name = TypeRegistry.get_name(type_id)
+        if name is None:
+            return None
+        return Type(id=type_id, name=name)
+
+    @staticmethod
+    def clear(using=None):
+        using = using or router.db_for_write(Type)
+        TypeRegistry._registry = None
+
+        def on_commit():
+            TypeRegistry._registry = None
+            Caching.delete_cache_value("types")
+
+        transaction.on_commit(on_commit, using=using)
+        if transaction.get_connection(using).in_atomic_block:
+            if not hasattr(TypeRegistry._local, "pending"):
+                TypeRegistry._local.pending = []
+            TypeRegistry._local.pending.append((using, on_commit))
+
+    # Pending write methods
+
+    @staticmethod
+    def _is_current(registry, generation, pending):
+        return (
+            registry is not None
+            and registry["generation"] == generation
+            and registry["pending"] is pending
+            and (
+                registry["expires_at"] is None
+                or registry["expires_at"] > time.monotonic()
+            )
+        )
+
+    @staticmethod
+    def _get_expiry():
+        if not settings.DEV_CACHE:
+            return None
+        return time.monotonic() + settings.TYPE_REGISTRY_DEV_TIMEOUT
+
+    @staticmethod
+    def _get_pending():
+        '''
+        Latest type write of this thread that is still waiting for its
+        transaction, None if there is none. Writes whose callback left
+        the connection's on_commit queue were committed or rolled back.
+        '''
+
+        pending = getattr(TypeRegistry._local, "pending", None)
+        while pending:
+            using, callback = pending[-1]
+            connection = transaction.get_connection(using)
+            if any(
+                func is callback for sids, func, robust
+                in connection.run_on_commit
+            ):
+                return callback
+            pending.pop()
+        return None
@@ -3,14 +3,15 @@ from django.urls import path, include
 from .views import (
     test_views,
     type_views,
-    account_views
+    account_views,
+    cache_views,
 )
 
 app_name = 'accounts-api'
 
 # Create a routers and register them with viewsets
 router = DefaultRouter()
-router.register(r'types', type_views.TypeViewSet)
+router.register(r'types', type_views.TypeViewSet, basename='type')
 
 # Define url patterns
 urlpatterns = [
@@ -23,6 +24,15 @@ urlpatterns = [
     path(
         'accounts/', account_views.AddAccount.as_view(),
         name='add_account'),
+    path(
+        'accounts/bulk/', account_views.BulkAccounts.as_view(),
+        name='bulk_accounts'),
+    path(
+        'accounts/import/', account_views.ImportAccounts.as_view(),
+        name='import_accounts'),
+    path(
+        'accounts/export/<str:export_format>', account_views.ExportAccounts.as_view(),
+        name='export_accounts'),
     path(
         'accounts/<int:id>/', account_views.ManageAccount.as_view(),
         name='manage_account'),
@@ -38,5 +48,25 @@ urlpatterns = [
         'accounts/by-id/<int:account_id>', account_views.GetAccountByID.as_view(),
         name='get_account_by_id'
     ),
+    path(
+        'accounts/search', account_views.SearchAccounts.as_view(),
+        name='search_accounts'
+    ),
+    path(
+        'accounts/sync', account_views.SyncAccounts.as_view(),
+        name='sync_accounts'
+    ),
+    path(
+        'accounts/stats', account_views.AccountStats.as_view(),
+        name='account_stats'
+    ),
+    path(
+        'accounts/<int:account_id>/password', account_views.RevealAccountPassword.as_view(),
+        name='reveal_account_password'
+    ),
+    path(
+        'cache-stats/', cache_views.GetCacheStats.as_view(),
+        name='cache_stats'
+    ),
     path('', include(router.urls)),
 ]
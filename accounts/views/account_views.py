@@ -6,7 +6,23 @@ from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.exceptions import ValidationError
 from ..helpers.account_helper import AccountHelper
+from ..helpers.bulk_helper import BulkHelper
+from ..helpers.cache_helper import CacheHelper
+from ..helpers.count_helper import CountHelper
+from ..helpers.export_helper import ExportHelper
+from ..helpers.import_helper import ImportHelper
+from ..helpers.search_helper import SearchHelper
+from ..helpers.sync_helper import SyncHelper
+from django.conf import settings
+from django.db import router, transaction
+from django.http import StreamingHttpResponse
 from utils.caching import Caching
+from utils.responses import (
+    ConditionalResponse,
+    RenderedResponse,
+    StreamedResponse,
+)
+from ..models import Account
 from ..serializers import (
     AccountSerializer,
     AccountUpdateSerializer,
@@ -27,9 +43,16 @@ class AddAccount(APIView):
             # Deserialize and validate the incoming data
             serializer = AccountSerializer(data=request.data)
             if serializer.is_valid():
-                serializer.save()
-
-                Caching.delete_cache_value("accounts")
+                serializer.save(owner_id=request.user.id)
+
+                account = dict(serializer.data)
+                Caching.patch_cache_value(
+                    key=AccountHelper.get_cache_key(request.user.id),
+                    patch=lambda index: AccountHelper.upsert_account_data(
+                        index=index,
+                        account=account
+                    )
+                )
 
                 return Response(
                     {
@@ -64,8 +87,12 @@ class ManageAccount(generics.UpdateAPIView, generics.DestroyAPIView):
     lookup_field = 'id'
 
     def get_queryset(self):
+        # Other users' accounts are not found
         account_id = self.kwargs.get('id')
-        return AccountHelper.get_account_qs_by_id(account_id)
+        return AccountHelper.get_account_qs_by_id(
+            self.request.user.id,
+            account_id
+        )
 
     def update(self, request, *args, **kwargs):
         try:
@@ -79,7 +106,14 @@ class ManageAccount(generics.UpdateAPIView, generics.DestroyAPIView):
             serializer.is_valid(raise_exception=True)
             self.perform_update(serializer)
 
-            Caching.delete_cache_value("accounts")
+            account = dict(AccountSerializer(instance).data)
+            Caching.patch_cache_value(
+                key=AccountHelper.get_cache_key(request.user.id),
+                patch=lambda index: AccountHelper.upsert_account_data(
+                    index=index,
+                    account=account
+                )
+            )
 
             return Response(
                 {
@@ -106,10 +140,20 @@ class ManageAccount(generics.UpdateAPIView, generics.DestroyAPIView):
     def destroy(self, request, *args, **kwargs):
         try:
             instance = self.get_object()
+            account_id = instance.id
             account_email = instance.email
-            self.perform_destroy(instance)
-
-            Caching.delete_cache_value("accounts")
+            with transaction.atomic(using=router.db_for_write(Account)):
+                CountHelper.record_deletion(instance)
+                self.perform_destroy(instance)
+                SyncHelper.record_deletion(request.user.id, account_id)
+
+            Caching.patch_cache_value(
+                key=AccountHelper.get_cache_key(request.user.id),
+                patch=lambda index: AccountHelper.remove_account_data(
+                    index=index,
+                    id=account_id
+                )
+            )
 
             return Response(
                 {
@@ -128,37 +172,260 @@ class ManageAccount(generics.UpdateAPIView, generics.DestroyAPIView):
 # -------------------------------------------------------------------------------
 
 
-class ListAccounts(APIView):
+class BulkAccounts(APIView):
     authentication_classes = [JWTAuthentication]
     permission_classes = [IsAuthenticated]
 
-    def get(self, request):
+    def post(self, request):
+        return self.write(
+            request,
+            lambda: BulkHelper.create_accounts(request.user.id, request.data),
+            status.HTTP_201_CREATED
+        )
+
+    def patch(self, request):
+        return self.write(
+            request,
+            lambda: BulkHelper.update_accounts(request.user.id, request.data),
+            status.HTTP_200_OK
+        )
+
+    def delete(self, request):
+        ids = request.data.get("ids") if isinstance(request.data, dict) else None
+        return self.write(
+            request,
+            lambda: BulkHelper.delete_accounts(request.user.id, ids),
+            status.HTTP_200_OK
+        )
+
+    def write(self, request, bulk_write, success_status):
         try:
-            # Check cache
-            cache_key = "accounts"
-            cached_data = Caching.get_cache_value(cache_key)
-            if cached_data is not None:
+            try:
+                result = bulk_write()
+            except ValueError as e:
+                logger.error(str(e))
                 return Response(
-                    cached_data,
-                    status=status.HTTP_200_OK
+                    {"error": str(e)},
+                    status=status.HTTP_400_BAD_REQUEST
                 )
 
-            # If no cache then pull and process from db
-            accounts = AccountHelper.select_related_fields(
-                AccountHelper.get_all_accounts()
+            # BulkHelper invalidates the account cache, also on failure
+            return Response(result, status=success_status)
+
+        except Exception as e:
+            logger.error(str(e))
+            return Response(
+                {"error": str(e)},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
-            serializer = AccountSerializer(
-                accounts,
-                many=True,
+
+# -------------------------------------------------------------------------------
+
+
+class ImportAccounts(APIView):
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        try:
+            upload = request.FILES.get("file")
+            try:
+                if upload is None:
+                    raise ValueError("file is required")
+                format = ImportHelper.get_format(
+                    request.query_params.get("format"),
+                    upload.name
+                )
+            except ValueError as e:
+                logger.error(str(e))
+                return Response(
+                    {"error": str(e)},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+            # Large uploads are spooled to disk and read back in chunks
+            summary = ImportHelper.import_accounts(
+                request.user.id,
+                ImportHelper.read_records(upload.file, format)
+            )
+
+            return Response(summary, status=status.HTTP_200_OK)
+
+        except Exception as e:
+            logger.error(str(e))
+            return Response(
+                {"error": str(e)},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+# -------------------------------------------------------------------------------
+
+
+class ExportAccounts(APIView):
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, export_format):
+        try:
+            try:
+                format = ExportHelper.get_format(export_format)
+            except ValueError as e:
+                logger.error(str(e))
+                return Response(
+                    {"error": str(e)},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+            response = StreamingHttpResponse(
+                ExportHelper.export_accounts(format, request.user.id),
+                content_type=ExportHelper.FORMATS[format]
             )
-            Caching.set_cache_value(
-                key=cache_key,
-                value=serializer.data
+            response["Content-Disposition"] = (
+                'attachment; filename="accounts.' + format + '"'
             )
+            # Keep the plaintext out of browser and proxy caches
+            response["Cache-Control"] = "no-store"
+            return response
 
+        except Exception as e:
+            logger.error(str(e))
             return Response(
-                serializer.data,
-                status=status.HTTP_200_OK
+                {"error": str(e)},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+# -------------------------------------------------------------------------------
+
+
+class ListAccounts(APIView):
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        try:
+            # Answer conditional requests from the cache generation
+            etag = ConditionalResponse.get_etag(
+                request,
+                AccountHelper.get_cache_key(request.user.id)
+            )
+            matched_etag = ConditionalResponse.get_matching_etag(request, etag)
+            if matched_etag is not None:
+                return ConditionalResponse.not_modified(matched_etag)
+
+            # Optional sparse fieldset (?fields= / ?exclude=), filters
+            # and ordering
+            try:
+                fields = AccountHelper.parse_projection(
+                    request.query_params.get("fields"),
+                    request.query_params.get("exclude")
+                )
+                filters = AccountHelper.parse_filters(request.query_params)
+                ordering = AccountHelper.parse_ordering(
+                    request.query_params.get("ordering")
+                )
+            except ValueError as e:
+                logger.error(str(e))
+                return Response(
+                    {"error": str(e)},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+            # Stream straight from the db for full syncs of large tables
+            stream = request.query_params.get("stream")
+            if stream is not None:
+                if stream not in StreamedResponse.FORMATS:
+                    logger.error("Unsupported stream format: " + stream)
+                    return Response(
+                        {"error": "stream must be one of: " + ", ".join(
+                            StreamedResponse.FORMATS
+                        )},
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
+
+                return ConditionalResponse.set_etag(
+                    StreamedResponse.build_response(
+                        AccountHelper.iterate_accounts(
+                            request.user.id,
+                            settings.ACCOUNTS_STREAM_CHUNK_SIZE,
+                            fields,
+                            filters,
+                            ordering
+                        ),
+                        format=stream
+                    ),
+                    etag
+                )
+
+            # Keyset pagination when a page is asked for
+            limit = request.query_params.get("limit")
+            cursor = request.query_params.get("cursor")
+            if limit is not None or cursor is not None:
+                try:
+                    if ordering is not None:
+                        raise ValueError(
+                            "ordering is not supported with pagination"
+                        )
+                    limit = AccountHelper.parse_page_limit(limit)
+                    after_id = AccountHelper.decode_cursor(cursor)
+                except ValueError as e:
+                    logger.error(str(e))
+                    return Response(
+                        {"error": str(e)},
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
+
+                return ConditionalResponse.set_etag(
+                    Response(
+                        CacheHelper.get_accounts_page(
+                            request.user.id,
+                            after_id,
+                            limit,
+                            fields,
+                            filters
+                        ),
+                        status=status.HTTP_200_OK
+                    ),
+                    etag
+                )
+
+            # Filtered lists come from indexed queries, cached per query
+            if filters or ordering is not None:
+                return ConditionalResponse.set_etag(
+                    Response(
+                        CacheHelper.get_filtered_accounts(
+                            request.user.id,
+                            filters,
+                            ordering,
+                            fields
+                        ),
+                        status=status.HTTP_200_OK
+                    ),
+                    etag
+                )
+
+            # Serve pre-rendered body from cache
+            if (
+                settings.CACHE_RENDERED_RESPONSES
+                and RenderedResponse.can_serve(request)
+            ):
+                rendered = CacheHelper.get_rendered_accounts(
+                    request.user.id,
+                    fields
+                )
+                return ConditionalResponse.set_etag(
+                    RenderedResponse.build_response(request, rendered),
+                    etag
+                )
+
+            # Serve from cache, rebuilding from db if missing
+            rows = CacheHelper.get_account_rows(request.user.id, fields)
+
+            return ConditionalResponse.set_etag(
+                Response(
+                    rows,
+                    status=status.HTTP_200_OK
+                ),
+                etag
             )
 
         except Exception as e:
@@ -177,29 +444,78 @@ class ListAccountsByEmail(APIView):
 
     def get(self, request, email):
         try:
+            # Answer conditional requests from the cache generation
+            etag = ConditionalResponse.get_etag(
+                request,
+                AccountHelper.get_cache_key(request.user.id)
+            )
+            matched_etag = ConditionalResponse.get_matching_etag(request, etag)
+            if matched_etag is not None:
+                return ConditionalResponse.not_modified(matched_etag)
+
+            # Optional sparse fieldset (?fields= / ?exclude=)
+            try:
+                fields = AccountHelper.parse_projection(
+                    request.query_params.get("fields"),
+                    request.query_params.get("exclude")
+                )
+            except ValueError as e:
+                logger.error(str(e))
+                return Response(
+                    {"error": str(e)},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
             # Check cache
-            cache_key = "accounts"
+            cache_key = AccountHelper.get_cache_key(request.user.id)
             cached_data = Caching.get_cache_value(cache_key)
+            miss_key = AccountHelper.get_email_miss_cache_key(
+                request.user.id,
+                email
+            )
+            miss_generation = Caching.get_cache_generation(miss_key)
+
             if cached_data is not None:
-                return Response(
+                data = AccountHelper.project_rows(
                     AccountHelper.filter_accounts_by_email(
-                        data=cached_data,
+                        index=cached_data,
                         email=email
                     ),
-                    status=status.HTTP_200_OK
+                    fields
                 )
 
-            accounts = AccountHelper.select_related_fields(
-                AccountHelper.get_account_qs_by_email(email)
-            )
-            serializer = AccountSerializer(
-                accounts,
-                many=True,
-            )
+            # Check for a recorded miss on this email
+            elif Caching.get_cache_value(miss_key, generation=miss_generation):
+                data = []
 
-            return Response(
-                serializer.data,
-                status=status.HTTP_200_OK
+            else:
+                accounts = AccountHelper.apply_projection(
+                    AccountHelper.get_account_qs_by_email(
+                        request.user.id,
+                        email
+                    ),
+                    fields
+                )
+                serializer = AccountSerializer(
+                    accounts,
+                    many=True,
+                    fields=fields,
+                )
+                data = serializer.data
+
+                if not data:
+                    Caching.set_cache_value(
+                        key=miss_key,
+                        value=True,
+                        generation=miss_generation
+                    )
+
+            return ConditionalResponse.set_etag(
+                Response(
+                    data,
+                    status=status.HTTP_200_OK
+                ),
+                etag
             )
 
         except Exception as e:
@@ -218,30 +534,190 @@ class GetAccountByID(APIView):
 
     def get(self, request, account_id):
         try:
+            # Answer conditional requests from the cache generation
+            etag = ConditionalResponse.get_etag(
+                request,
+                AccountHelper.get_cache_key(request.user.id)
+            )
+            matched_etag = ConditionalResponse.get_matching_etag(request, etag)
+            if matched_etag is not None:
+                return ConditionalResponse.not_modified(matched_etag)
+
+            # Optional sparse fieldset (?fields= / ?exclude=)
+            try:
+                fields = AccountHelper.parse_projection(
+                    request.query_params.get("fields"),
+                    request.query_params.get("exclude")
+                )
+            except ValueError as e:
+                logger.error(str(e))
+                return Response(
+                    {"error": str(e)},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
             # Check cache
-            cache_key = "accounts"
+            cache_key = AccountHelper.get_cache_key(request.user.id)
             cached_data = Caching.get_cache_value(cache_key)
             if cached_data is not None:
-                return Response(
+                data = AccountHelper.project_rows(
                     AccountHelper.filter_accounts_by_id(
-                        data=cached_data,
+                        index=cached_data,
                         id=account_id
                     ),
+                    fields
+                )
+
+            else:
+                accounts = AccountHelper.apply_projection(
+                    AccountHelper.get_account_qs_by_id(
+                        request.user.id,
+                        account_id
+                    ),
+                    fields
+                )
+                serializer = AccountSerializer(
+                    accounts,
+                    many=True,
+                    fields=fields,
+                )
+                data = serializer.data
+
+            return ConditionalResponse.set_etag(
+                Response(
+                    data,
                     status=status.HTTP_200_OK
+                ),
+                etag
+            )
+
+        except Exception as e:
+            logger.error(str(e))
+            return Response(
+                {"error": str(e)},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+# -------------------------------------------------------------------------------
+
+
+class SearchAccounts(APIView):
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        try:
+            query = request.query_params.get("q", "")
+            try:
+                if not query.strip():
+                    raise ValueError("q is required")
+                limit = SearchHelper.parse_search_limit(
+                    request.query_params.get("limit")
+                )
+            except ValueError as e:
+                logger.error(str(e))
+                return Response(
+                    {"error": str(e)},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+            return Response(
+                CacheHelper.get_search_results(request.user.id, query, limit),
+                status=status.HTTP_200_OK
+            )
+
+        except Exception as e:
+            logger.error(str(e))
+            return Response(
+                {"error": str(e)},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+# -------------------------------------------------------------------------------
+
+
+class SyncAccounts(APIView):
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        try:
+            try:
+                since = SyncHelper.decode_cursor(
+                    request.query_params.get("since")
+                )
+            except ValueError as e:
+                logger.error(str(e))
+                return Response(
+                    {"error": str(e)},
+                    status=status.HTTP_400_BAD_REQUEST
                 )
 
-            accounts = AccountHelper.select_related_fields(
-                AccountHelper.get_account_qs_by_id(account_id)
+            return Response(
+                SyncHelper.get_changes(request.user.id, since),
+                status=status.HTTP_200_OK
             )
-            serializer = AccountSerializer(
-                accounts,
-                many=True,
+
+        except Exception as e:
+            logger.error(str(e))
+            return Response(
+                {"error": str(e)},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+# -------------------------------------------------------------------------------
+
+
+class AccountStats(APIView):
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        try:
+            # Read from the materialized counts, not the accounts
+            return Response(
+                CountHelper.get_stats(request.user.id),
+                status=status.HTTP_200_OK
+            )
+
+        except Exception as e:
+            logger.error(str(e))
             return Response(
-                serializer.data,
+                {"error": str(e)},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+# -------------------------------------------------------------------------------
+
+
+class RevealAccountPassword(APIView):
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, account_id):
+        try:
+            password = AccountHelper.get_account_password(
+                request.user.id,
+                account_id
+            )
+
+            response = Response(
+                {
+                    "id": account_id,
+                    "password": password
+                },
                 status=status.HTTP_200_OK
             )
+            # Keep the plaintext out of browser and proxy caches
+            response["Cache-Control"] = "no-store"
+            return response
+
+        except Account.DoesNotExist:
+            logger.error("Account not found: " + str(account_id))
+            return Response(
+                {"error": "Account not found"},
+                status=status.HTTP_404_NOT_FOUND
+            )
 
         except Exception as e:
             logger.error(str(e))
@@ -0,0 +1,30 @@
+from rest_framework.views import APIView
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework import status
+from utils.caching import Caching
+import logging
+
+logger = logging.getLogger(__name__)
+
+# -------------------------------------------------------------------------------
+
+
+class GetCacheStats(APIView):
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        try:
+            return Response(
+                Caching.get_stats().get_totals(),
+                status=status.HTTP_200_OK
+            )
+
+        except Exception as e:
+            logger.error(str(e))
+            return Response(
+                {"error": str(e)},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
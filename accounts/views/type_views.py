@@ -3,8 +3,13 @@ from rest_framework_simplejwt.authentication import JWTAuthentication
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
+from ..helpers.account_helper import AccountHelper
 from ..helpers.type_helper import TypeHelper
+from ..helpers.cache_helper import CacheHelper
+from ..helpers.sync_helper import SyncHelper
+from django.conf import settings
 from utils.caching import Caching
+from utils.responses import ConditionalResponse, RenderedResponse
 from ..serializers import (
     TypeSerializer,
 )
@@ -19,31 +24,39 @@ class TypeViewSet(viewsets.ModelViewSet):
     authentication_classes = [JWTAuthentication]
     permission_classes = [IsAuthenticated]
     serializer_class = TypeSerializer
-    queryset = TypeHelper.get_all_types()
     lookup_field = 'id'
 
+    def get_queryset(self):
+        return TypeHelper.get_all_types()
+
     def list(self, request, *args, **kwargs):
         try:
-            # Check cache
-            cache_key = "types"
-            cached_data = Caching.get_cache_value(cache_key)
-            if cached_data is not None:
-                return Response(
-                    cached_data,
-                    status=status.HTTP_200_OK
+            # Answer conditional requests from the cache generation
+            etag = ConditionalResponse.get_etag(request, "types")
+            matched_etag = ConditionalResponse.get_matching_etag(request, etag)
+            if matched_etag is not None:
+                return ConditionalResponse.not_modified(matched_etag)
+
+            # Serve pre-rendered body from cache
+            if (
+                settings.CACHE_RENDERED_RESPONSES
+                and RenderedResponse.can_serve(request)
+            ):
+                rendered = CacheHelper.get_rendered_types()
+                return ConditionalResponse.set_etag(
+                    RenderedResponse.build_response(request, rendered),
+                    etag
                 )
 
-            # If no cache then pull and process from db
-            queryset = TypeHelper.get_all_types()
-            serializer = self.get_serializer(queryset, many=True)
-            Caching.set_cache_value(
-                    key=cache_key,
-                    value=serializer.data
-                )
+            # Serve from cache, rebuilding from db if missing
+            cached_data = CacheHelper.get_types()
 
-            return Response(
-                serializer.data,
-                status=status.HTTP_200_OK
+            return ConditionalResponse.set_etag(
+                Response(
+                    cached_data,
+                    status=status.HTTP_200_OK
+                ),
+                etag
             )
 
         except Exception as e:
@@ -53,6 +66,18 @@ class TypeViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+    def retrieve(self, request, *args, **kwargs):
+        # Answer conditional requests from the cache generation
+        etag = ConditionalResponse.get_etag(request, "types")
+        matched_etag = ConditionalResponse.get_matching_etag(request, etag)
+        if matched_etag is not None:
+            return ConditionalResponse.not_modified(matched_etag)
+
+        return ConditionalResponse.set_etag(
+            super().retrieve(request, *args, **kwargs),
+            etag
+        )
+
     def create(self, request, *args, **kwargs):
         try:
             serializer = self.get_serializer(data=request.data)
@@ -79,6 +104,11 @@ class TypeViewSet(viewsets.ModelViewSet):
             serializer.is_valid(raise_exception=True)
             serializer.save()
             Caching.delete_cache_value("types")
+            # Cached and synced accounts carry the type name
+            SyncHelper.touch_accounts_of_type(instance.id)
+            AccountHelper.invalidate_all_caches(
+                AccountHelper.get_owner_ids(instance.id)
+            )
 
             return Response(
                 serializer.data,
@@ -95,8 +125,13 @@ class TypeViewSet(viewsets.ModelViewSet):
     def destroy(self, request, *args, **kwargs):
         try:
             instance = self.get_object()
+            # Synced accounts of the type are about to be set to null
+            SyncHelper.touch_accounts_of_type(instance.id)
+            owner_ids = AccountHelper.get_owner_ids(instance.id)
             instance.delete()
             Caching.delete_cache_value("types")
+            # Accounts of a deleted type are set to null
+            AccountHelper.invalidate_all_caches(owner_ids)
 
             return Response(status=status.HTTP_204_NO_CONTENT)
 
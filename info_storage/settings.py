@@ -118,16 +118,120 @@ DATABASES = {
 
 CRYPTOGRAPHY_KEY = os.environ.get("CRYPTOGRAPHY_KEY")
 
+# Encryption key rotation (manage.py rotate_encryption_key): comma
+# separated keys being rotated out. Values encrypted with them stay
+# readable, new values are encrypted with CRYPTOGRAPHY_KEY. The
+# checkpoint lets an interrupted rotation resume.
+CRYPTOGRAPHY_OLD_KEYS = [
+    key for key in os.environ.get("CRYPTOGRAPHY_OLD_KEYS", "").split(",") if key
+]
+CRYPTOGRAPHY_ROTATION_BATCH_SIZE = 1000
+CRYPTOGRAPHY_ROTATION_CHECKPOINT = os.path.join(
+    BASE_DIR, 'cache', 'key_rotation.json'
+)
+
+# ListAccounts keyset pagination (?limit=&cursor=)
+ACCOUNTS_PAGE_DEFAULT_LIMIT = 100
+ACCOUNTS_PAGE_MAX_LIMIT = 1000
+
+# ListAccounts streaming mode (?stream=json|ndjson), rows fetched per query
+ACCOUNTS_STREAM_CHUNK_SIZE = 500
+
+# Delta sync (accounts/sync?since=): seconds re-read before a cursor to
+# catch writes committed out of timestamp order, and how long deletions
+# are kept. Older cursors get a full reset.
+ACCOUNTS_SYNC_OVERLAP = 2
+ACCOUNTS_SYNC_TOMBSTONE_RETENTION = 60 * 60 * 24 * 30
+
+# Bulk account writes (accounts/bulk/): items per request and per
+# transaction
+ACCOUNTS_BULK_MAX_ITEMS = 5000
+ACCOUNTS_BULK_BATCH_SIZE = 500
+
+# Account imports (accounts/import/, manage.py import_accounts): records
+# written per batch, errors listed in the summary and the longest JSON
+# array item read, in characters
+ACCOUNTS_IMPORT_BATCH_SIZE = 500
+ACCOUNTS_IMPORT_MAX_ERRORS = 100
+ACCOUNTS_IMPORT_MAX_ITEM_SIZE = 1024 * 1024
+
+# Account exports (accounts/export/<format>, manage.py export_accounts):
+# rows read, decrypted and written per batch
+ACCOUNTS_EXPORT_CHUNK_SIZE = 5000
+
+# Batch decryption of encrypted fields (utils/decryption.py): worker
+# processes (None for one per core, 1 to stay in process), the batch
+# size worth sending to them and values decrypted per worker task. The
+# pool is used by management commands, and by web processes only with
+# DECRYPTION_WEB_POOL
+DECRYPTION_WORKERS = None
+DECRYPTION_PARALLEL_MIN_ROWS = 2000
+DECRYPTION_TASK_SIZE = 500
+DECRYPTION_WEB_POOL = False
+
+# Account search (accounts/search?q=), results returned by default
+ACCOUNTS_SEARCH_DEFAULT_LIMIT = 20
+
 # Disable in production
 DEV_CACHE = True
 
+# Dev cache: cache generations are per process, so each process reloads
+# its type registry once it is this many seconds old to pick up type
+# writes made by other workers
+TYPE_REGISTRY_DEV_TIMEOUT = 5
+
 CACHES = {
     'default': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
         'LOCATION': 'dev-cache'
+    },
+    # Shared by all worker processes when DEV_CACHE is disabled.
+    # Swap for memcached/redis when running on more than one host.
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache'),
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        }
     }
 }
 
+# Prod cache: per-process LRU tier in front of the shared backend
+SHARED_CACHE_ALIAS = 'shared'
+LOCAL_CACHE_MAX_ENTRIES = 256
+LOCAL_CACHE_MAX_BYTES = 1024 * 1024 * 64
+LOCAL_CACHE_TIMEOUT = 60
+
+# Prod cache coherence: workers on this host announce invalidations over
+# sockets in this directory so each can cache generation counters
+# locally. Workers on other hosts pick up changes once their local copy
+# expires. Set to None to read generations from the shared backend on
+# every lookup.
+CACHE_BROADCAST_DIR = os.path.join(BASE_DIR, 'cache', 'broadcast')
+LOCAL_GENERATION_TIMEOUT = 5
+
+# Cache rebuilds: one process rebuilds a missing key while the others
+# wait, then fall back to the superseded value (kept for the stale
+# timeout) or rebuild themselves. Rebuild locks are per generation
+# and expire after the lock timeout instead of being released
+CACHE_STALE_TIMEOUT = 60
+CACHE_REBUILD_LOCK_TIMEOUT = 30
+CACHE_REBUILD_WAIT_TIMEOUT = 10
+CACHE_REBUILD_POLL_INTERVAL = 0.05
+
+# Cache list endpoint bodies as rendered JSON (plus a gzip copy) and
+# serve them without going through DRF rendering
+CACHE_RENDERED_RESPONSES = True
+
+# Per-namespace cache counters, added to totals in the cache backend
+# every flush interval (see manage.py cache_stats)
+CACHE_STATS_ENABLED = True
+CACHE_STATS_FLUSH_INTERVAL = 10
+
+# Warm the account and type caches in each worker before it serves
+# requests (see info_storage/startup.py)
+CACHE_WARMUP_ON_STARTUP = False
+
 # Password validation
 # https://docs.djangoproject.com/en/3.0/ref/settings/#auth-password-validators
 
@@ -0,0 +1,18 @@
+from django.conf import settings
+from django.core.management import call_command
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def run_startup_hooks():
+    '''
+    Runs before a worker starts serving requests. Failures are logged
+    rather than raised so a cold cache never keeps a worker down.
+    '''
+
+    if settings.CACHE_WARMUP_ON_STARTUP:
+        try:
+            call_command('warm_account_caches')
+        except Exception as e:
+            logger.error(str(e))
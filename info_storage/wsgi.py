@@ -11,6 +11,10 @@ import os
 
 from django.core.wsgi import get_wsgi_application
 
+from .startup import run_startup_hooks
+
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'info_storage.settings')
 
 application = get_wsgi_application()
+
+run_startup_hooks()
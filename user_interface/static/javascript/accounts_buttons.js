@@ -81,7 +81,7 @@ export function saveAction(accountId, baseApiUrl, accessToken) {
 
     // Fetch API call with the updated data
     fetch(`${baseApiUrl}accounts-api/accounts/` + accountId + '/', {
-        method: 'PUT',
+        method: 'PATCH',
         headers: {
             'Authorization': 'Bearer ' + accessToken,
             'Content-Type': 'application/json'
@@ -161,6 +161,12 @@ function createAccountJson(row) {
                     accountData['type'] = cell.getAttribute('data-id');
                 }
             }
+            else if (key == 'password') { // Special case for password
+                // Leave the stored password alone unless it was revealed
+                if (cell.textContent.trim() !== constants.maskedPassword) {
+                    accountData[key] = cell.textContent.trim();
+                }
+            }
             else { // Non special case
                 accountData[key] = cell.textContent.trim();
             }
@@ -1,6 +1,12 @@
+import * as constants from './constants.js';
+
+
 export function createInputPopup(baseApiUrl, accessToken, cell, key) {
     if (key === 'type_name') {
         createTypeOptionsPopup(baseApiUrl, accessToken, cell);
+    } else if (key === 'password' &&
+               cell.textContent.trim() === constants.maskedPassword) {
+        createPasswordPopup(baseApiUrl, accessToken, cell);
     } else {
         createEditablePopup(cell);
     }
@@ -8,6 +14,38 @@ export function createInputPopup(baseApiUrl, accessToken, cell, key) {
 
 // -------------------------------------------------------------------
 
+function createPasswordPopup(baseApiUrl, accessToken, cell) {
+    // The id cell always follows the actions column
+    const accountId = cell.parentElement.cells[1].textContent.trim();
+
+    // Fetch the stored password so it can be viewed and edited
+    fetch(`${baseApiUrl}accounts-api/accounts/` + accountId + '/password', {
+        method: 'GET',
+        headers: {
+            'Authorization': 'Bearer ' + accessToken,
+            'Content-Type': 'application/json'
+        },
+        credentials: 'same-origin',
+    })
+    .then(response => {
+        if (response.status === 200) {
+            return response.json();
+        } else {
+            throw new Error('Error revealing password');
+        }
+    })
+    .then(data => {
+        cell.textContent = data.password;
+        createEditablePopup(cell);
+    })
+    .catch(error => {
+        console.error('Error revealing password:', error);
+        alert('Error revealing password for account ID: ' + accountId);
+    });
+}
+
+// -------------------------------------------------------------------
+
 function createTypeOptionsPopup(baseApiUrl, accessToken, cell) {
     // Fetch options from the backend endpoint
     fetch(`${baseApiUrl}accounts-api/types`, {
@@ -21,7 +21,11 @@ const editableAccountFields = [
     'description'
 ]
 
+// Placeholder the API returns instead of stored passwords
+const maskedPassword = '********';
+
 export {
     viewableAccountFields,
-    editableAccountFields
+    editableAccountFields,
+    maskedPassword
 };
\ No newline at end of file
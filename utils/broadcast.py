@@ -0,0 +1,96 @@
+import logging
+import os
+import socket
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class InvalidationBroadcast():
+    '''
+    Fans short messages out to every process on this host. Each process
+    binds a unix datagram socket in a shared directory and a daemon
+    thread hands whatever it receives to on_message. Sockets left behind
+    by dead processes are removed when a send to them is refused.
+    '''
+
+    MAX_MESSAGE_SIZE = 1024
+
+    def __init__(self, directory, on_message, name=None):
+        self.directory = directory
+        self.on_message = on_message
+        self.name = name
+        self._path = None
+        self._pid = None
+        self._send_socket = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def is_supported():
+        return hasattr(socket, "AF_UNIX")
+
+    def start(self):
+        # Also restarts in forked workers, which inherit the parent's
+        # state but not its listener thread
+        if self._pid == os.getpid():
+            return
+
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+
+            os.makedirs(self.directory, exist_ok=True)
+            name = self.name or str(os.getpid())
+            path = os.path.join(self.directory, name + ".sock")
+            if os.path.exists(path):
+                os.unlink(path)
+
+            listen_socket = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            listen_socket.bind(path)
+
+            # Never block a request on a receiver with a full queue
+            send_socket = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            send_socket.setblocking(False)
+
+            self._path = path
+            self._send_socket = send_socket
+            self._pid = os.getpid()
+
+            threading.Thread(
+                target=self._listen,
+                args=(listen_socket,),
+                daemon=True
+            ).start()
+
+    def publish(self, message):
+        self.start()
+        data = message.encode()
+
+        for file_name in os.listdir(self.directory):
+            path = os.path.join(self.directory, file_name)
+            if path == self._path or not file_name.endswith(".sock"):
+                continue
+
+            try:
+                self._send_socket.sendto(data, path)
+            except (ConnectionRefusedError, FileNotFoundError):
+                self._remove_stale_socket(path)
+            except OSError as e:
+                logger.error(
+                    "Invalidation broadcast to " + path + " failed: " + str(e)
+                )
+
+    def _listen(self, listen_socket):
+        while True:
+            try:
+                data = listen_socket.recv(self.MAX_MESSAGE_SIZE)
+                self.on_message(data.decode())
+            except Exception as e:
+                logger.error("Invalidation broadcast receive failed: " + str(e))
+
+    @staticmethod
+    def _remove_stale_socket(path):
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
@@ -0,0 +1,152 @@
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class CacheStats():
+    '''
+    Per-namespace cache counters. Recording only touches an in-process
+    dict; every flush_interval seconds the counts are added to totals in
+    the shared backend so all processes report together.
+
+    Counters: hits, misses, sets, patches, invalidations, rebuilds,
+    rebuild_ms, get_us and local_evictions. bytes_stored is a gauge of
+    the last stored size of each key (prod mode only, dev mode does not
+    pickle values).
+    '''
+
+    COUNTERS = (
+        "hits",
+        "misses",
+        "sets",
+        "patches",
+        "invalidations",
+        "rebuilds",
+        "rebuild_ms",
+        "get_us",
+        "local_evictions",
+    )
+
+    # Bounds bytes_stored tracking for namespaces with per-input keys
+    MAX_SIZED_KEYS = 1000
+
+    def __init__(self, get_backend, flush_interval):
+        self.get_backend = get_backend
+        self.flush_interval = flush_interval
+        self._counts = {}
+        self._sizes = {}
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+
+    def record(self, namespace, counter, amount=1):
+        with self._lock:
+            counts = self._counts.setdefault(namespace, {})
+            counts[counter] = counts.get(counter, 0) + amount
+            due = time.monotonic() - self._last_flush >= self.flush_interval
+
+        if due:
+            self.flush()
+
+    def record_size(self, namespace, key, size):
+        with self._lock:
+            key_sizes = self._sizes.setdefault(namespace, {})
+            if key in key_sizes or len(key_sizes) < self.MAX_SIZED_KEYS:
+                key_sizes[key] = size
+
+    def flush(self):
+        with self._lock:
+            counts, self._counts = self._counts, {}
+            sizes = {
+                namespace: sum(key_sizes.values())
+                for namespace, key_sizes in self._sizes.items()
+            }
+            self._last_flush = time.monotonic()
+
+        if not counts and not sizes:
+            return
+
+        try:
+            backend = self.get_backend()
+            self._register_namespaces(backend, set(counts) | set(sizes))
+
+            for namespace, namespace_counts in counts.items():
+                for counter, amount in namespace_counts.items():
+                    stat_key = self._stat_key(namespace, counter)
+                    if not backend.add(stat_key, amount, None):
+                        backend.incr(stat_key, amount)
+
+            for namespace, size in sizes.items():
+                backend.set(self._stat_key(namespace, "bytes_stored"), size, None)
+
+        except Exception as e:
+            logger.error("Cache stats flush failed: " + str(e))
+
+    def get_totals(self):
+        '''
+        Returns the totals of all processes, including this process's
+        unflushed counts.
+        '''
+
+        self.flush()
+        backend = self.get_backend()
+        namespaces = backend.get(self._namespaces_key(), [])
+
+        totals = {}
+        for namespace in sorted(namespaces):
+            stat_keys = {
+                counter: self._stat_key(namespace, counter)
+                for counter in self.COUNTERS + ("bytes_stored",)
+            }
+            values = backend.get_many(list(stat_keys.values()))
+            stats = {
+                counter: values.get(stat_key, 0)
+                for counter, stat_key in stat_keys.items()
+            }
+
+            lookups = stats["hits"] + stats["misses"]
+            stats["hit_ratio"] = (
+                round(stats["hits"] / lookups, 4) if lookups else None
+            )
+            stats["get_ms_avg"] = (
+                round(stats["get_us"] / lookups / 1000, 4) if lookups else None
+            )
+            stats["rebuild_ms_avg"] = (
+                round(stats["rebuild_ms"] / stats["rebuilds"], 2)
+                if stats["rebuilds"] else None
+            )
+            totals[namespace] = stats
+
+        return totals
+
+    def reset(self):
+        with self._lock:
+            self._counts = {}
+            self._sizes = {}
+
+        backend = self.get_backend()
+        namespaces = backend.get(self._namespaces_key(), [])
+        backend.delete_many([
+            self._stat_key(namespace, counter)
+            for namespace in namespaces
+            for counter in self.COUNTERS + ("bytes_stored",)
+        ])
+        backend.delete(self._namespaces_key())
+
+    def _register_namespaces(self, backend, namespaces):
+        known = backend.get(self._namespaces_key(), [])
+        if not namespaces.issubset(known):
+            backend.set(
+                self._namespaces_key(),
+                sorted(set(known) | namespaces),
+                None
+            )
+
+    @staticmethod
+    def _stat_key(namespace, counter):
+        return "stats:" + namespace + ":" + counter
+
+    @staticmethod
+    def _namespaces_key():
+        return "stats:namespaces"
@@ -1,22 +1,520 @@
+from collections import OrderedDict
 from django.conf import settings
-from django.core.cache import cache
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.cache.backends.memcached import BaseMemcachedCache
+from django.core.cache.backends.redis import RedisCache
+import logging
+import pickle
+import threading
+import time
+from .broadcast import InvalidationBroadcast
+from .cache_stats import CacheStats
+
+logger = logging.getLogger(__name__)
+
+
+class LocalCache():
+    '''
+    Bounded in-process LRU cache used as the first tier in prod mode.
+    Entries expire after their timeout and the least recently used
+    entries are evicted once either the entry or byte limit is hit.
+    '''
+
+    def __init__(self, max_entries, max_bytes, timeout, on_evict=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self.on_evict = on_evict
+        self._entries = OrderedDict()  # key -> (expires_at, size, value)
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            expires_at, size, value = entry
+            if expires_at < time.monotonic():
+                self._remove(key)
+                return None
+
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, size, timeout=None):
+        if size > self.max_bytes:
+            self.delete(key)
+            return False
+
+        if timeout is None or timeout > self.timeout:
+            timeout = self.timeout
+
+        evicted_keys = []
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (time.monotonic() + timeout, size, value)
+            self._size += size
+
+            while (
+                len(self._entries) > self.max_entries
+                or self._size > self.max_bytes
+            ):
+                oldest_key = next(iter(self._entries))
+                self._remove(oldest_key)
+                evicted_keys.append(oldest_key)
+
+        if self.on_evict is not None:
+            for evicted_key in evicted_keys:
+                self.on_evict(evicted_key)
+
+        return True
+
+    def delete(self, key):
+        with self._lock:
+            self._remove(key)
+
+    def delete_prefix(self, prefix):
+        with self._lock:
+            for key in [key for key in self._entries if key.startswith(prefix)]:
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._size -= entry[1]
+
+# -------------------------------------------------------------------------------
 
 
 class Caching():
+    _local_cache = None
+    _local_cache_lock = threading.Lock()
+    _broadcast = None
+    _stats = None
+
+    # Every key belongs to a namespace, the part before the first ":"
+    # ("accounts", "types"). Values live under "<key>:g<generation>",
+    # where the generation is a per-namespace counter kept in the shared
+    # backend, so invalidating every key of a model is one increment
+    # that all processes see. Rebuilds started before a write store
+    # under the old generation and are never read. The superseded copy
+    # of a key is kept for CACHE_STALE_TIMEOUT so it can be served
+    # while a rebuild is in flight.
+    #
+    # A namespace can be partitioned ("accounts@5" for the accounts of
+    # user 5), giving each partition its own generation so writes in one
+    # leave the others cached. Stats are kept per unpartitioned namespace.
+    #
+    # In prod mode processes also cache generations in their local tier
+    # and broadcast invalidations, so the other processes on the host
+    # drop their local copies right away.
+
+    @staticmethod
+    def get_cache_value(key, generation=None):
+        start = time.perf_counter()
+        value = Caching._lookup(key, generation)
+
+        Caching._record(key, "hits" if value is not None else "misses")
+        Caching._record(
+            key,
+            "get_us",
+            int((time.perf_counter() - start) * 1000000)
+        )
+        return value
+
+    @staticmethod
+    def set_cache_value(key, value, timeout=3600, generation=None):
+        '''
+        Pass the generation read before building value to make sure a
+        write that happened in the meantime is not overwritten.
+        '''
+
+        if generation is None:
+            generation = Caching.get_cache_generation(key)
+
+        Caching._record(key, "sets")
+        return Caching._set_generation(key, generation, value, timeout)
+
+    @staticmethod
+    def delete_cache_value(key):
+        '''
+        Invalidates key along with every other key in its namespace.
+        '''
+
+        Caching._record(key, "invalidations")
+        generation = Caching.get_cache_generation(key)
+        Caching._incr_generation(key)
+        return Caching._retire(key, generation)
+
+    @staticmethod
+    def get_or_build_cache_value(key, build, timeout=3600):
+        '''
+        Returns the cached value, calling build() to recompute it on a
+        miss. Only one caller across all processes rebuilds a key at a
+        time; the others wait up to CACHE_REBUILD_WAIT_TIMEOUT for it,
+        are served the superseded value if there is one, and rebuild
+        themselves as a last resort.
+        '''
+
+        generation = Caching.get_cache_generation(key)
+        value = Caching.get_cache_value(key, generation=generation)
+        if value is not None:
+            return value
+
+        locked = Caching._acquire_lock(key, generation)
+        if not locked:
+            deadline = time.monotonic() + settings.CACHE_REBUILD_WAIT_TIMEOUT
+            while time.monotonic() < deadline:
+                time.sleep(settings.CACHE_REBUILD_POLL_INTERVAL)
+                value = Caching._lookup(key)
+                if value is not None:
+                    return value
+
+                locked = Caching._acquire_lock(key, generation)
+                if locked:
+                    break
+
+        if not locked:
+            value = Caching.get_previous_cache_value(key)
+            if value is not None:
+                return value
+
+        # The lock holder before us may have just finished
+        generation = Caching.get_cache_generation(key)
+        value = Caching._lookup(key, generation)
+        if value is None:
+            start = time.perf_counter()
+            value = build()
+            Caching._record(key, "rebuilds")
+            Caching._record(
+                key,
+                "rebuild_ms",
+                int((time.perf_counter() - start) * 1000)
+            )
+
+            Caching.set_cache_value(
+                key,
+                value,
+                timeout,
+                generation=generation
+            )
+
+        return value
+
+    @staticmethod
+    def get_previous_cache_value(key):
+        '''
+        Returns the value superseded by the last invalidation or patch
+        of key, while it is still within CACHE_STALE_TIMEOUT.
+        '''
+
+        previous_generation = Caching._get_counter(Caching._previous_key(key))
+        if previous_generation is None:
+            return None
+
+        return Caching._get(Caching._generation_key(key, previous_generation))
+
+    @staticmethod
+    def patch_cache_value(key, patch, timeout=3600):
+        '''
+        Write-through update of a cached value. patch receives the
+        cached value and returns the updated copy (it must not modify
+        the value in place, other readers may hold it). The rest of the
+        namespace is invalidated.
+
+        Falls back to invalidation when nothing is cached, when another
+        writer bumped the generation in the meantime, or when the shared
+        backend cannot tell (see has_atomic_incr).
+        '''
+
+        if not Caching.has_atomic_incr():
+            Caching.delete_cache_value(key)
+            return False
+
+        generation = Caching.get_cache_generation(key)
+        value = Caching._get(Caching._generation_key(key, generation))
+        new_generation = Caching._incr_generation(key)
+        Caching._retire(key, generation)
+
+        if (
+            value is None
+            or new_generation is None
+            or new_generation != generation + 1
+        ):
+            Caching._record(key, "invalidations")
+            return False
+
+        Caching._record(key, "patches")
+        return Caching._set_generation(
+            key,
+            new_generation,
+            patch(value),
+            timeout
+        )
+
+    @staticmethod
+    def get_cache_generation(key):
+        namespace = Caching.get_namespace(key)
+        counter_key = Caching._generation_counter_key(namespace)
+
+        local_generation = Caching._get_local_generation(namespace)
+        if local_generation is not None:
+            return local_generation
+
+        generation = Caching._get_counter(counter_key)
+        if generation is None:
+            # Seed from the clock so a flushed cache never hands out a
+            # generation that an older entry may still be stored under
+            Caching._add_counter(counter_key, time.time_ns() // 1000)
+            generation = Caching._get_counter(counter_key)
+
+        Caching._set_local_generation(namespace, generation)
+        return generation
+
+    @staticmethod
+    def get_namespace(key):
+        return key.split(":", 1)[0]
+
+    @staticmethod
+    def partition_key(key, partition):
+        '''
+        Moves key into a partition of its namespace, e.g.
+        ("accounts:rows", 5) -> "accounts@5:rows".
+        '''
+
+        namespace, separator, rest = key.partition(":")
+        return namespace + "@" + str(partition) + separator + rest
+
+    @staticmethod
+    def get_stats_namespace(key):
+        return Caching.get_namespace(key).split("@", 1)[0]
+
+    @staticmethod
+    def _lookup(key, generation=None):
+        if generation is None:
+            generation = Caching.get_cache_generation(key)
+
+        return Caching._get(Caching._generation_key(key, generation))
+
+    @staticmethod
+    def _incr_generation(key):
+        namespace = Caching.get_namespace(key)
+        counter_key = Caching._generation_counter_key(namespace)
+
+        Caching._drop_local_generation(namespace)
+        Caching.get_cache_generation(key)
+        generation = Caching._incr_counter(counter_key)
+
+        Caching._set_local_generation(namespace, generation)
+        Caching._publish_invalidation(namespace)
+        return generation
+
+    @staticmethod
+    def _set_generation(key, generation, value, timeout):
+        # Remember which generation holds data so it can be served as
+        # the previous value once superseded
+        try:
+            Caching._direct_cache().set(
+                Caching._previous_key(key),
+                generation,
+                None
+            )
+        except Exception as e:
+            logger.error("Shared cache set failed: " + str(e))
+
+        return Caching._set(
+            Caching._generation_key(key, generation),
+            value,
+            timeout
+        )
+
+    @staticmethod
+    def _retire(key, generation):
+        return Caching._expire(
+            Caching._generation_key(key, generation),
+            settings.CACHE_STALE_TIMEOUT
+        )
+
+    @staticmethod
+    def _acquire_lock(key, generation):
+        '''
+        Rebuild lock of one generation of key. It is never released,
+        only left to expire: once the rebuild is stored nobody asks for
+        it again, and the next generation has a lock of its own. A get
+        then delete could drop a lock that expired and was taken by
+        another process meanwhile.
+        '''
+
+        try:
+            return Caching._direct_cache().add(
+                Caching._lock_key(key, generation),
+                True,
+                settings.CACHE_REBUILD_LOCK_TIMEOUT
+            )
+        except Exception as e:
+            logger.error("Cache lock failed: " + str(e))
+            return False
+
+    @staticmethod
+    def _generation_key(key, generation):
+        return key + ":g" + str(generation)
+
+    @staticmethod
+    def _generation_counter_key(namespace):
+        return "generation:" + namespace
+
+    @staticmethod
+    def _previous_key(key):
+        return key + ":previous"
+
+    @staticmethod
+    def _lock_key(key, generation):
+        return Caching._generation_key(key, generation) + ":lock"
+
+    # Local generations and invalidation broadcast (prod mode only)
+
+    @staticmethod
+    def _get_local_generation(namespace):
+        if not Caching._broadcast_enabled():
+            return None
+
+        try:
+            Caching.get_broadcast().start()
+        except Exception as e:
+            logger.error("Invalidation broadcast listener failed: " + str(e))
+            return None
+
+        return Caching.get_local_cache().get(
+            Caching._generation_counter_key(namespace)
+        )
+
+    @staticmethod
+    def _set_local_generation(namespace, generation):
+        if not Caching._broadcast_enabled() or generation is None:
+            return
+
+        Caching.get_local_cache().set(
+            Caching._generation_counter_key(namespace),
+            generation,
+            size=0,
+            timeout=settings.LOCAL_GENERATION_TIMEOUT
+        )
+
+    @staticmethod
+    def _drop_local_generation(namespace):
+        if Caching._broadcast_enabled():
+            Caching.get_local_cache().delete(
+                Caching._generation_counter_key(namespace)
+            )
+
+    @staticmethod
+    def _publish_invalidation(namespace):
+        if not Caching._broadcast_enabled():
+            return
+
+        try:
+            Caching.get_broadcast().publish(namespace)
+        except Exception as e:
+            logger.error("Invalidation broadcast failed: " + str(e))
+
+    @staticmethod
+    def _receive_invalidation(namespace):
+        local_cache = Caching.get_local_cache()
+        local_cache.delete(Caching._generation_counter_key(namespace))
+        local_cache.delete_prefix(namespace + ":")
+
+    @staticmethod
+    def _broadcast_enabled():
+        return (
+            not settings.DEV_CACHE
+            and settings.CACHE_BROADCAST_DIR is not None
+            and InvalidationBroadcast.is_supported()
+        )
+
+    @staticmethod
+    def get_broadcast():
+        if Caching._broadcast is None:
+            with Caching._local_cache_lock:
+                if Caching._broadcast is None:
+                    Caching._broadcast = InvalidationBroadcast(
+                        directory=settings.CACHE_BROADCAST_DIR,
+                        on_message=Caching._receive_invalidation
+                    )
+
+        return Caching._broadcast
+
+    # Instrumentation
+
+    @staticmethod
+    def get_stats():
+        if Caching._stats is None:
+            with Caching._local_cache_lock:
+                if Caching._stats is None:
+                    Caching._stats = CacheStats(
+                        get_backend=Caching._direct_cache,
+                        flush_interval=settings.CACHE_STATS_FLUSH_INTERVAL
+                    )
+
+        return Caching._stats
+
+    @staticmethod
+    def _record(key, counter, amount=1):
+        if settings.CACHE_STATS_ENABLED:
+            Caching.get_stats().record(
+                Caching.get_stats_namespace(key),
+                counter,
+                amount
+            )
+
+    @staticmethod
+    def _record_size(stored_key, size):
+        if settings.CACHE_STATS_ENABLED:
+            # Track by key without the generation suffix
+            key = stored_key.rsplit(":g", 1)[0]
+            Caching.get_stats().record_size(
+                Caching.get_stats_namespace(key),
+                key,
+                size
+            )
+
+    # Storage primitives
 
     @staticmethod
-    def get_cache_value(key):
+    def _get(key):
         # Dev mode
         if settings.DEV_CACHE:
             return cache.get(key)
 
         # Prod mode
         else:
-            # Production logic
-            return None
+            local_cache = Caching.get_local_cache()
+            value = local_cache.get(key)
+            if value is not None:
+                return value
+
+            try:
+                payload = Caching.get_shared_cache().get(key)
+            except Exception as e:
+                logger.error("Shared cache read failed: " + str(e))
+                return None
+
+            if payload is None:
+                return None
+
+            value = pickle.loads(payload)
+            local_cache.set(key, value, len(payload))
+            return value
 
     @staticmethod
-    def set_cache_value(key, value, timeout=3600):
+    def _set(key, value, timeout):
         # Dev mode
         if settings.DEV_CACHE:
             cache.set(
@@ -29,11 +527,22 @@ class Caching():
 
         # Prod mode
         else:
-            # Production logic
-            return False
+            # Pickle once so the shared tier stores bytes and the
+            # local tier can be sized without a second pass
+            payload = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+            Caching.get_local_cache().set(key, value, len(payload), timeout)
+            Caching._record_size(key, len(payload))
+
+            try:
+                Caching.get_shared_cache().set(key, payload, timeout)
+            except Exception as e:
+                logger.error("Shared cache write failed: " + str(e))
+                return False
+
+            return True
 
     @staticmethod
-    def delete_cache_value(key):
+    def _delete(key):
         # Dev mode
         if settings.DEV_CACHE:
             cache.delete(key)
@@ -41,5 +550,114 @@ class Caching():
 
         # Prod mode
         else:
-            # Production logic
+            Caching.get_local_cache().delete(key)
+
+            try:
+                Caching.get_shared_cache().delete(key)
+            except Exception as e:
+                logger.error("Shared cache delete failed: " + str(e))
+                return False
+
+            return True
+
+    @staticmethod
+    def _expire(key, timeout):
+        # Dev mode
+        if settings.DEV_CACHE:
+            return cache.touch(key, timeout)
+
+        # Prod mode
+        else:
+            Caching.get_local_cache().delete(key)
+
+            try:
+                return Caching.get_shared_cache().touch(key, timeout)
+            except Exception as e:
+                logger.error("Shared cache touch failed: " + str(e))
+                return False
+
+    # Counters and locks always go to the backend directly since the
+    # local tier would hide other processes' updates
+
+    @staticmethod
+    def _direct_cache():
+        if settings.DEV_CACHE:
+            return cache
+        return Caching.get_shared_cache()
+
+    @staticmethod
+    def _get_counter(key):
+        try:
+            return Caching._direct_cache().get(key)
+        except Exception as e:
+            logger.error("Cache counter read failed: " + str(e))
+            return None
+
+    @staticmethod
+    def _add_counter(key, value):
+        try:
+            return Caching._direct_cache().add(key, value, None)
+        except Exception as e:
+            logger.error("Cache counter write failed: " + str(e))
             return False
+
+    @staticmethod
+    def has_atomic_incr():
+        '''
+        Whether incr on the shared backend is atomic across writers.
+        The file and database backends get and then set, so two writers
+        may both see the same new generation.
+        '''
+
+        return isinstance(
+            Caching._direct_cache(),
+            (RedisCache, BaseMemcachedCache, LocMemCache)
+        )
+
+    @staticmethod
+    def _incr_counter(key):
+        # Atomic only where has_atomic_incr(), best effort elsewhere
+        try:
+            try:
+                return Caching._direct_cache().incr(key)
+            except ValueError:
+                Caching._add_counter(key, 0)
+                return Caching._direct_cache().incr(key)
+        except Exception as e:
+            logger.error("Cache counter increment failed: " + str(e))
+            return None
+
+    # Prod mode tiers
+
+    @staticmethod
+    def get_local_cache():
+        if Caching._local_cache is None:
+            with Caching._local_cache_lock:
+                if Caching._local_cache is None:
+                    Caching._local_cache = LocalCache(
+                        max_entries=settings.LOCAL_CACHE_MAX_ENTRIES,
+                        max_bytes=settings.LOCAL_CACHE_MAX_BYTES,
+                        timeout=settings.LOCAL_CACHE_TIMEOUT,
+                        on_evict=lambda key: Caching._record(
+                            key,
+                            "local_evictions"
+                        )
+                    )
+
+        return Caching._local_cache
+
+    @staticmethod
+    def reset_local_cache():
+        '''
+        Drops the in-process tier, broadcast listener and unflushed
+        stats so they are rebuilt from settings on next use.
+        '''
+
+        with Caching._local_cache_lock:
+            Caching._local_cache = None
+            Caching._broadcast = None
+            Caching._stats = None
+
+    @staticmethod
+    def get_shared_cache():
+        return caches[settings.SHARED_CACHE_ALIAS]
@@ -0,0 +1,166 @@
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from django.apps import apps
+from django.conf import settings
+from itertools import repeat
+import logging
+import multiprocessing
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def init_worker():
+    # Workers start bare from the fork server or spawn
+    if not apps.ready:
+        import django
+        django.setup()
+
+
+def _decrypt_chunk(field_path, ciphertexts):
+    app_label, model_name, field_name = field_path
+    field = apps.get_model(app_label, model_name)._meta.get_field(field_name)
+    return Decryption.decrypt_serial(field, ciphertexts)
+
+
+def _get_worker_pid(delay):
+    # Held long enough for the other workers to pick up tasks too
+    time.sleep(delay)
+    return os.getpid()
+
+
+class Decryption():
+    '''
+    Batch decryption of encrypted field values read as raw ciphertext,
+    e.g. through ExpressionWrapper(F(name), output_field=BinaryField()).
+
+    Batches of DECRYPTION_PARALLEL_MIN_ROWS values or more are split in
+    tasks of DECRYPTION_TASK_SIZE across a pool of DECRYPTION_WORKERS
+    processes. Smaller batches, single core hosts and fields with a ttl
+    (whose Expired marker does not survive pickling) decrypt in process.
+    The pool starts on first use and lives as long as the process.
+
+    Only processes that call allow_pool(), i.e. management commands, use
+    the pool. Web processes decrypt in process unless DECRYPTION_WEB_POOL
+    is set. Workers are started from a fork server (spawned where there
+    is none) instead of forking the caller, whose threads and open
+    connections must not be copied.
+    '''
+
+    _executor = None
+    _executor_workers = None
+    _pool_allowed = False
+    _lock = threading.Lock()
+
+    @staticmethod
+    def get_workers():
+        workers = settings.DECRYPTION_WORKERS
+        if workers is None:
+            workers = os.cpu_count() or 1
+        return workers
+
+    @staticmethod
+    def allow_pool():
+        Decryption._pool_allowed = True
+
+    @staticmethod
+    def pool_enabled():
+        return Decryption._pool_allowed or settings.DECRYPTION_WEB_POOL
+
+    @staticmethod
+    def decrypt_serial(field, ciphertexts):
+        return [field.from_db_value(value) for value in ciphertexts]
+
+    @staticmethod
+    def decrypt_values(field, ciphertexts, workers=None, min_rows=None):
+        '''
+        Returns the decrypted values of field for ciphertexts, in order.
+        '''
+
+        if workers is None:
+            workers = Decryption.get_workers()
+        if min_rows is None:
+            min_rows = settings.DECRYPTION_PARALLEL_MIN_ROWS
+
+        if (
+            workers < 2
+            or not Decryption.pool_enabled()
+            or len(ciphertexts) < min_rows
+            or getattr(field, 'ttl', None) is not None
+        ):
+            return Decryption.decrypt_serial(field, ciphertexts)
+
+        field_path = (
+            field.model._meta.app_label,
+            field.model._meta.model_name,
+            field.name,
+        )
+        # Some backends return memoryviews, which do not pickle
+        ciphertexts = [
+            value if value is None or isinstance(value, bytes) else bytes(value)
+            for value in ciphertexts
+        ]
+        task_size = settings.DECRYPTION_TASK_SIZE
+        chunks = [
+            ciphertexts[start:start + task_size]
+            for start in range(0, len(ciphertexts), task_size)
+        ]
+
+        try:
+            results = Decryption.get_executor(workers).map(
+                _decrypt_chunk,
+                repeat(field_path),
+                chunks
+            )
+            return [value for chunk in results for value in chunk]
+
+        except BrokenProcessPool as e:
+            logger.error("Decryption pool failed, decrypting serially: " + str(e))
+            Decryption.shutdown()
+            return Decryption.decrypt_serial(field, ciphertexts)
+
+    # Pool
+
+    @staticmethod
+    def get_executor(workers):
+        with Decryption._lock:
+            if Decryption._executor_workers != workers:
+                if Decryption._executor is not None:
+                    Decryption._executor.shutdown()
+                Decryption._executor = ProcessPoolExecutor(
+                    max_workers=workers,
+                    mp_context=Decryption.get_mp_context(),
+                    initializer=init_worker
+                )
+                Decryption._executor_workers = workers
+
+            return Decryption._executor
+
+    @staticmethod
+    def start_workers(workers):
+        '''
+        Starts and sets up every worker of the pool now. Workers are
+        otherwise started as tasks arrive, so the first large batch
+        would also time their start up (see benchmark_decryption).
+        '''
+
+        executor = Decryption.get_executor(workers)
+        pids = set()
+        while len(pids) < workers:
+            pids.update(executor.map(_get_worker_pid, repeat(0.05, workers)))
+
+    @staticmethod
+    def get_mp_context():
+        if "forkserver" in multiprocessing.get_all_start_methods():
+            return multiprocessing.get_context("forkserver")
+        return multiprocessing.get_context("spawn")
+
+    @staticmethod
+    def shutdown():
+        with Decryption._lock:
+            if Decryption._executor is not None:
+                Decryption._executor.shutdown()
+            Decryption._executor = None
+            Decryption._executor_workers = None
@@ -3,3 +3,15 @@ class Formatting():
     @staticmethod
     def format_date(date):
         return date.strftime('%Y-%m-%d %H:%M:%S')
+
+    @staticmethod
+    def format_date_fast(date):
+        '''
+        Same output as format_date at about a third of the cost. Years
+        before 1000 go through strftime, whose padding of them differs
+        between platforms.
+        '''
+
+        if date.year < 1000:
+            return Formatting.format_date(date)
+        return date.isoformat(" ", "seconds")[:19]
@@ -0,0 +1,128 @@
+from django.conf import settings
+from django.utils.encoding import force_bytes
+from django_cryptography.utils.crypto import (
+    FernetBytes,
+    InvalidToken,
+    pbkdf2,
+    settings as crypto_settings,
+)
+import hashlib
+import io
+import pickle
+
+
+class AmbiguousToken(InvalidToken):
+    '''
+    More than one key decrypts a token to a valid value, so which one
+    it was encrypted with is unknown.
+    '''
+
+
+class ValueUnpickler(pickle.Unpickler):
+    # Plaintext of a wrong key is random, never let it import anything
+    def find_class(self, module, name):
+        raise pickle.UnpicklingError("global " + module + "." + name)
+
+
+class KeyRing():
+    '''
+    Encryption over several keys for key rotation: encrypts with the
+    first key and decrypts with whichever key a value was encrypted
+    with. CRYPTOGRAPHY_OLD_KEYS are raw key values, derived the same way
+    django_cryptography derives its own.
+
+    Tokens are signed with SECRET_KEY rather than the encryption key, so
+    a wrong key is only caught by the PKCS7 padding and by the plaintext
+    not unpickling to a str (django_cryptography pickles field values,
+    and only CharFields are encrypted). Every key is tried, a token more
+    than one key reads raises AmbiguousToken.
+    '''
+
+    # As in django_cryptography.conf.CryptographyConf.configure
+    KDF_ITERATIONS = 30000
+
+    def __init__(self, keys):
+        # Derived keys, the current one first
+        self.fernets = [FernetBytes(key) for key in keys]
+
+    @classmethod
+    def from_keys(cls, keys):
+        return cls([KeyRing.derive_key(key) for key in keys])
+
+    @classmethod
+    def from_settings(cls):
+        return cls(
+            [KeyRing.get_current_key()]
+            + [KeyRing.derive_key(key) for key in settings.CRYPTOGRAPHY_OLD_KEYS]
+        )
+
+    @staticmethod
+    def get_current_key():
+        # django_cryptography replaces settings.CRYPTOGRAPHY_KEY with its
+        # derived form when it loads
+        return crypto_settings.CRYPTOGRAPHY_KEY
+
+    @staticmethod
+    def derive_key(key):
+        return pbkdf2(
+            force_bytes(key or settings.SECRET_KEY),
+            crypto_settings.CRYPTOGRAPHY_SALT,
+            KeyRing.KDF_ITERATIONS
+        )
+
+    @staticmethod
+    def get_fingerprint(derived_key):
+        '''
+        Identifies a key without revealing it.
+        '''
+
+        return hashlib.sha256(derived_key).hexdigest()[:16]
+
+    @staticmethod
+    def install(field):
+        '''
+        Makes an encrypted model field read values encrypted with any
+        configured key while CRYPTOGRAPHY_OLD_KEYS is set.
+        '''
+
+        if settings.CRYPTOGRAPHY_OLD_KEYS and field.key is None:
+            field._fernet = KeyRing.from_settings()
+
+    # Fernet interface
+
+    def encrypt(self, data):
+        return self.fernets[0].encrypt(data)
+
+    def decrypt(self, data, ttl=None):
+        return self.decrypt_with_index(data, ttl)[1]
+
+    def decrypt_with_index(self, data, ttl=None):
+        '''
+        Returns the index of the key that decrypts data and the
+        plaintext.
+        '''
+
+        found = None
+        for index, fernet in enumerate(self.fernets):
+            try:
+                plaintext = fernet.decrypt(data, ttl)
+            except InvalidToken:
+                continue
+            if not KeyRing.is_field_value(plaintext):
+                continue
+            if found is not None:
+                raise AmbiguousToken
+            found = (index, plaintext)
+
+        if found is None:
+            raise InvalidToken
+        return found
+
+    @staticmethod
+    def is_field_value(plaintext):
+        stream = io.BytesIO(plaintext)
+        try:
+            value = ValueUnpickler(stream).load()
+        except Exception:
+            return False
+        return isinstance(value, str) and stream.tell() == len(plaintext)
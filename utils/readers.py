@@ -0,0 +1,116 @@
+import csv
+import io
+import json
+
+
+class Readers():
+    '''
+    Incremental record readers for uploaded or on-disk files. Each one
+    yields records as it reads, holding at most one read chunk and one
+    record in memory.
+    '''
+
+    CHUNK_SIZE = 1024 * 64
+    MAX_ITEM_SIZE = 1024 * 1024
+
+    @staticmethod
+    def text_stream(binary_stream):
+        # utf-8-sig drops the byte order mark some exporters write
+        return io.TextIOWrapper(binary_stream, encoding="utf-8-sig", newline="")
+
+    @staticmethod
+    def iter_csv(binary_stream):
+        '''
+        Yields a dict per data row, keyed by the header row.
+        '''
+
+        yield from csv.DictReader(Readers.text_stream(binary_stream))
+
+    @staticmethod
+    def iter_ndjson(binary_stream):
+        for line in Readers.text_stream(binary_stream):
+            if line.strip():
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError as e:
+                    raise ValueError("invalid JSON: " + str(e))
+
+    @staticmethod
+    def iter_json_array(
+        binary_stream,
+        chunk_size=CHUNK_SIZE,
+        max_item_size=MAX_ITEM_SIZE
+    ):
+        '''
+        Yields the items of a top-level JSON array. An item is decoded
+        again from its start after every chunk read until it is whole,
+        so items longer than max_item_size characters are refused
+        instead of being read into memory.
+        '''
+
+        stream = Readers.text_stream(binary_stream)
+        decoder = json.JSONDecoder()
+        buffer = ""
+        eof = False
+
+        def fill():
+            nonlocal buffer, eof
+            chunk = stream.read(chunk_size)
+            eof = not chunk
+            buffer += chunk
+
+        def peek():
+            # First non-whitespace character, None at the end of input
+            nonlocal buffer
+            while True:
+                buffer = buffer.lstrip()
+                if buffer:
+                    return buffer[0]
+                if eof:
+                    return None
+                fill()
+
+        if peek() != "[":
+            raise ValueError("invalid JSON: expected an array")
+        buffer = buffer[1:]
+        if peek() == "]":
+            return
+
+        while True:
+            if peek() is None:
+                raise ValueError("invalid JSON: unexpected end of input")
+
+            while True:
+                try:
+                    item, end = decoder.raw_decode(buffer)
+                    # Only trust an item once the separator after it is
+                    # read, a number cut by the chunk end still decodes
+                    if eof or buffer[end:].lstrip()[:1] in (",", "]"):
+                        break
+                except json.JSONDecodeError as e:
+                    if eof:
+                        raise ValueError("invalid JSON: " + str(e))
+                    end = len(buffer)
+
+                if end > max_item_size:
+                    break
+                fill()
+
+            if end > max_item_size:
+                raise ValueError(
+                    "invalid JSON: item longer than "
+                    + str(max_item_size) + " characters"
+                )
+
+            buffer = buffer[end:]
+            yield item
+
+            separator = peek()
+            if separator == "]":
+                buffer = buffer[1:]
+                if peek() is not None:
+                    raise ValueError("invalid JSON: data after the array")
+                return
+            if separator != ",":
+                raise ValueError("invalid JSON: expected , or ]")
+            buffer = buffer[1:]
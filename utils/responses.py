@@ -0,0 +1,173 @@
+from django.http import (
+    HttpResponse,
+    HttpResponseNotModified,
+    StreamingHttpResponse,
+)
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import parse_etags
+from rest_framework.renderers import JSONRenderer
+from .caching import Caching
+import gzip
+import hashlib
+import re
+
+# Same check as django.middleware.gzip.GZipMiddleware
+re_accepts_gzip = re.compile(r"\bgzip\b")
+
+
+class RenderedResponse():
+    '''
+    Pre-rendered JSON bodies for caching. A rendered body holds the
+    exact bytes JSONRenderer produces plus a gzip-compressed copy, so
+    serving it is a memory copy instead of a serialize + encode.
+    '''
+
+    @staticmethod
+    def render(data):
+        content = JSONRenderer().render(data)
+        return {
+            "content": content,
+            "gzip": gzip.compress(content, compresslevel=6),
+        }
+
+    @staticmethod
+    def can_serve(request):
+        # Only stand in for DRF when it negotiated plain JSON
+        return request.accepted_renderer.format == "json"
+
+    @staticmethod
+    def accepts_gzip(request):
+        return bool(
+            re_accepts_gzip.search(request.META.get("HTTP_ACCEPT_ENCODING", ""))
+        )
+
+    @staticmethod
+    def build_response(request, rendered, status=200):
+        if RenderedResponse.accepts_gzip(request):
+            response = HttpResponse(
+                rendered["gzip"],
+                content_type="application/json",
+                status=status
+            )
+            response["Content-Encoding"] = "gzip"
+        else:
+            response = HttpResponse(
+                rendered["content"],
+                content_type="application/json",
+                status=status
+            )
+
+        patch_vary_headers(response, ("Accept-Encoding",))
+        return response
+
+# -------------------------------------------------------------------------------
+
+
+class StreamedResponse():
+    '''
+    Chunked JSON bodies built from an iterator of rows, so a response
+    never holds more than one rendered row in memory. A JSON array is
+    byte-identical to what JSONRenderer produces for the whole list;
+    NDJSON puts one row per line.
+    '''
+
+    FORMATS = {
+        "json": "application/json",
+        "ndjson": "application/x-ndjson",
+    }
+
+    @staticmethod
+    def json_array(rows):
+        renderer = JSONRenderer()
+        separator = b"["
+        for row in rows:
+            yield separator + renderer.render(row)
+            separator = b","
+
+        yield b"[]" if separator == b"[" else b"]"
+
+    @staticmethod
+    def ndjson(rows):
+        renderer = JSONRenderer()
+        for row in rows:
+            yield renderer.render(row) + b"\n"
+
+    @staticmethod
+    def build_response(rows, format="json"):
+        if format == "ndjson":
+            content = StreamedResponse.ndjson(rows)
+        else:
+            content = StreamedResponse.json_array(rows)
+
+        return StreamingHttpResponse(
+            content,
+            content_type=StreamedResponse.FORMATS[format]
+        )
+
+# -------------------------------------------------------------------------------
+
+
+class ConditionalResponse():
+    '''
+    Strong ETags derived from the cache generation of a key's namespace
+    and the request path, so checking If-None-Match needs neither the
+    database nor a serializer. Any write through Caching bumps the
+    generation and with it every ETag of the namespace.
+    '''
+
+    @staticmethod
+    def get_etag(request, key):
+        generation = Caching.get_cache_generation(key)
+        source = key + ":" + str(generation) + ":" + request.get_full_path()
+        return '"' + hashlib.sha1(source.encode()).hexdigest() + '"'
+
+    @staticmethod
+    def get_matching_etag(request, etag):
+        '''
+        Returns the variant of etag the client already has according to
+        If-None-Match, or None if the response must be sent in full.
+        '''
+
+        if_none_match = request.META.get("HTTP_IF_NONE_MATCH")
+        if not if_none_match:
+            return None
+
+        client_etags = parse_etags(if_none_match)
+        if "*" in client_etags or etag in client_etags:
+            return etag
+
+        gzip_etag = ConditionalResponse._gzip_etag(etag)
+        if gzip_etag in client_etags:
+            return gzip_etag
+
+        return None
+
+    @staticmethod
+    def not_modified(etag):
+        response = HttpResponseNotModified()
+        response["ETag"] = etag
+        ConditionalResponse._patch_headers(response)
+        return response
+
+    @staticmethod
+    def set_etag(response, etag):
+        if response.status_code != 200:
+            return response
+
+        # Encodings of the same resource need distinct strong ETags
+        if response.get("Content-Encoding") == "gzip":
+            etag = ConditionalResponse._gzip_etag(etag)
+
+        response["ETag"] = etag
+        ConditionalResponse._patch_headers(response)
+        return response
+
+    @staticmethod
+    def _gzip_etag(etag):
+        return etag[:-1] + '-gzip"'
+
+    @staticmethod
+    def _patch_headers(response):
+        # Let browsers keep the body but revalidate it on every request
+        patch_cache_control(response, private=True, no_cache=True)
+        patch_vary_headers(response, ("Authorization",))
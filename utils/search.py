@@ -0,0 +1,59 @@
+import re
+
+# Runs of letters and digits, in any script
+re_token = re.compile(r"[^\W_]+")
+
+
+class Search():
+    '''
+    Tokenizing and ranking for token index search. Tokens are the
+    lowercased runs of letters and digits of a text, so
+    "jane.doe@example.com" gives jane, doe, example and com.
+    '''
+
+    MAX_TOKEN_LENGTH = 64
+
+    @staticmethod
+    def tokenize(text):
+        if not text:
+            return []
+
+        return [
+            token[:Search.MAX_TOKEN_LENGTH]
+            for token in re_token.findall(text.lower())
+        ]
+
+    @staticmethod
+    def get_weighted_tokens(values, weights):
+        '''
+        values: field -> text
+        weights: field -> weight of a token found in that field
+        Returns token -> summed weight of the fields containing it.
+        '''
+
+        token_weights = {}
+        for field_name, weight in weights.items():
+            for token in set(Search.tokenize(values.get(field_name))):
+                token_weights[token] = token_weights.get(token, 0) + weight
+
+        return token_weights
+
+    @staticmethod
+    def rank(term_matches):
+        '''
+        term_matches: one dict per query term of id -> score of that term
+        Returns the ids matching every term, best total score first and
+        ties in id order.
+        '''
+
+        if not term_matches:
+            return []
+
+        ids = set(term_matches[0])
+        for matches in term_matches[1:]:
+            ids &= set(matches)
+
+        return sorted(
+            ids,
+            key=lambda id: (-sum(matches[id] for matches in term_matches), id)
+        )
@@ -0,0 +1,49 @@
+import csv
+import io
+import json
+
+
+class Writers():
+    '''
+    Incremental record writers, the counterpart of Readers. Each one
+    takes an iterator of row tuples and yields utf-8 encoded chunks of
+    rows_per_chunk rows, holding at most one chunk in memory.
+    '''
+
+    ROWS_PER_CHUNK = 500
+
+    @staticmethod
+    def iter_csv(rows, columns, rows_per_chunk=ROWS_PER_CHUNK):
+        '''
+        Yields a header row of columns, then a line per row.
+        '''
+
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(columns)
+
+        for count, row in enumerate(rows, start=1):
+            writer.writerow(row)
+            if count % rows_per_chunk == 0:
+                yield buffer.getvalue().encode()
+                buffer.seek(0)
+                buffer.truncate()
+
+        if buffer.tell():
+            yield buffer.getvalue().encode()
+
+    @staticmethod
+    def iter_ndjson(rows, columns, rows_per_chunk=ROWS_PER_CHUNK):
+        '''
+        Yields a JSON object per row, keyed by columns.
+        '''
+
+        lines = []
+        for row in rows:
+            lines.append(json.dumps(dict(zip(columns, row))) + "\n")
+            if len(lines) >= rows_per_chunk:
+                yield "".join(lines).encode()
+                lines = []
+
+        if lines:
+            yield "".join(lines).encode()